@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+dom_search.py - streaming matcher for dom-saves HTML
+Scans a chat export through mmap in fixed-size windows, so a
+multi-hundred-MB save is never decoded into a str or lowercased as a
+whole. Memory stays bounded by CHUNK_BYTES; every hit is reported with
+its own context window. On first search each save is stripped into a
+plaintext sidecar (dom_text) that is scanned instead of the markup, and
+gets a Bloom sidecar (stamp_bloom); saves it rules out are skipped unread.
+
+Usage:
+  python3 dom_search.py QUERY [DIR]        search a dom-saves directory
+  python3 dom_search.py --bench [MB] [DIR] synthetic benchmark (default 2048 MB)
+"""
+
+import mmap
+import re
+import sys
+import time
+from pathlib import Path
+
+import dom_archive
+import dom_text
+import stamp_bloom
+
+CONTEXT_CHARS = 60
+# A UTF-8 char is at most 4 bytes, so this many bytes always covers the window.
+CONTEXT_BYTES = CONTEXT_CHARS * 4
+CHUNK_BYTES = 8 << 20
+
+
+def query_pattern(query):
+    """Bytes regex matching query case-insensitively, including non-ASCII."""
+    parts = []
+    for ch in query:
+        variants = {ch, ch.lower(), ch.upper()}
+        enc = sorted(re.escape(v.encode('utf-8')) for v in variants if len(v) == 1)
+        parts.append(enc[0] if len(enc) == 1 else b"(?:" + b"|".join(enc) + b")")
+    return re.compile(b"".join(parts))
+
+
+def matcher(query):
+    """Return (find, overlap): find(window) yields (start, end) byte spans.
+
+    ASCII queries lowercase one bounded window at a time and use bytes.find,
+    which runs near memory bandwidth; anything else goes through the
+    case-folding regex so non-ASCII text still matches case-insensitively.
+    """
+    needle = query.encode('utf-8')
+    if needle.isascii():
+        needle = needle.lower()
+
+        def find(window):
+            low = window.lower()
+            i = low.find(needle)
+            while i != -1:
+                yield i, i + len(needle)
+                i = low.find(needle, i + 1)
+        return find, len(needle) - 1
+    pattern = query_pattern(query)
+    return (lambda window: (m.span() for m in pattern.finditer(window))), len(needle) * 4
+
+
+def _context(buf, start, end):
+    pre = buf[max(0, start - CONTEXT_BYTES):start].decode('utf-8', 'ignore')[-CONTEXT_CHARS:]
+    hit = buf[start:end].decode('utf-8', 'ignore')
+    post = buf[end:end + CONTEXT_BYTES].decode('utf-8', 'ignore')[:CONTEXT_CHARS]
+    return f"...{pre}{hit}{post}...".replace('\n', ' ')
+
+
+def scan_file(path, query, max_hits=None, chunk=CHUNK_BYTES, cancel=None):
+    """Yield (byte_offset, context) for every hit of query in path.
+
+    cancel is an optional threading.Event checked between windows.
+    """
+    if not query:
+        return
+    find, overlap = matcher(query)
+    with open(path, 'rb') as f:
+        try:
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            return  # empty file
+        with buf:
+            n = 0
+            for pos in range(0, len(buf), chunk):
+                if cancel is not None and cancel.is_set():
+                    return
+                window = buf[pos:pos + chunk + overlap]
+                for start, end in find(window):
+                    if start >= chunk:
+                        break  # belongs to the next window
+                    yield pos + start, _context(buf, pos + start, pos + end)
+                    n += 1
+                    if max_hits is not None and n >= max_hits:
+                        return
+
+
+def dom_result(hf, query, max_hits=None, cancel=None, bloom=True, text=True):
+    """search_stamps result for one save, or None if it has no hits.
+
+    With text, the save's plaintext sidecar (dom_text) is scanned instead
+    of the HTML; offsets still point into the HTML and contexts are real
+    text. With bloom, a save whose filter rules the query out is not read.
+    Archived saves (dom_archive) are searched block by block.
+    """
+    if str(hf).endswith(dom_archive.SUFFIX):
+        return dom_archive.archive_result(hf, query, max_hits, cancel, bloom, text)
+    src = dom_text.ensure(hf) if text else hf
+    grams = stamp_bloom.query_grams(query) if bloom else None
+    if grams and not stamp_bloom.may_contain(src, query, grams=grams):
+        return None
+    hits = [{'offset': off, 'context': ctx}
+            for off, ctx in scan_file(src, query, max_hits, cancel=cancel)]
+    if not hits:
+        if grams and not (cancel is not None and cancel.is_set()):
+            stamp_bloom.STATS.add(false_positives=1)
+        return None
+    if text:
+        tmap = dom_text.load_map(hf)
+        for h in hits:
+            h['text_offset'], h['offset'] = h['offset'], tmap.to_html(h['offset'])
+    return {'file': str(hf), 'context': hits[0]['context'], 'hits': hits, 'type': 'dom'}
+
+
+def save_files(dom_dir):
+    """Plain and archived saves in dom_dir."""
+    dom_dir = Path(dom_dir)
+    return sorted([*dom_dir.glob("*.html"), *dom_dir.glob("*.html" + dom_archive.SUFFIX)])
+
+
+def search_dom_saves(query, dom_dir, max_hits=None, bloom=True, text=True):
+    """One result per matching save, each carrying all of its hits."""
+    results = (dom_result(hf, query, max_hits, bloom=bloom, text=text) for hf in save_files(dom_dir))
+    return [r for r in results if r]
+
+
+# ============================================================
+# BENCHMARK
+# ============================================================
+
+def _make_saves(dom_dir, total_mb, file_mb=64, needle="JPEG kills blue"):
+    dom_dir.mkdir(parents=True, exist_ok=True)
+    block = (
+        '<div class="msg" style="padding:4px;color:#ccc">'
+        '<p>Branch progress on the olo-guard project, nothing to see here.</p>'
+        '<script>window.__state={"k":1}</script></div>\n'
+    ).encode()
+    hit = f'<div class="msg"><p>Finding: {needle} at 4:2:0</p></div>\n'.encode()
+    chunk = block * ((1 << 20) // len(block)) + hit
+    per_file = min(file_mb, total_mb)
+    files = max(1, total_mb // per_file)
+    for i in range(files):
+        path = dom_dir / f"save-{i:04d}.html"
+        if path.exists() and path.stat().st_size == per_file * len(chunk):
+            continue
+        with open(path, 'wb') as f:
+            for _ in range(per_file):
+                f.write(chunk)
+    return files
+
+
+def _baseline(query, dom_dir):
+    hits = 0
+    for hf in dom_dir.glob("*.html"):
+        content = hf.read_text()
+        if query.lower() in content.lower():
+            hits += 1
+    return hits
+
+
+def bench(total_mb=2048, dom_dir=None):
+    import tempfile
+    import tracemalloc
+    tmp = None
+    if dom_dir is None:
+        tmp = tempfile.TemporaryDirectory()
+        dom_dir = Path(tmp.name) / "dom-saves"
+    dom_dir = Path(dom_dir)
+    print(f"Generating {total_mb} MB of synthetic saves in {dom_dir} ...")
+    files = _make_saves(dom_dir, total_mb)
+    t0 = time.perf_counter()
+    text_mb = 0
+    for hf in dom_dir.glob("*.html"):
+        txt = dom_text.ensure(hf)
+        stamp_bloom.load(txt)
+        text_mb += txt.stat().st_size / 2**20
+    print(f"  sidecars         {time.perf_counter() - t0:8.2f}s  ({text_mb:.0f} MB text; one-off, "
+          f"reused until the save changes)")
+    query = "jpeg KILLS blue"
+    for label, fn in [("read_text+lower", lambda: _baseline(query, dom_dir)),
+                      ("mmap stream html", lambda: search_dom_saves(query, dom_dir, bloom=False, text=False)),
+                      ("text sidecars", lambda: search_dom_saves(query, dom_dir))]:
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        out = fn()
+        dt = time.perf_counter() - t0
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        found = out if isinstance(out, int) else sum(len(r['hits']) for r in out)
+        print(f"  {label:16s} {dt:8.2f}s  {total_mb / dt:8.1f} MB/s  "
+              f"peak {peak / 2**20:8.1f} MB  ({found} {'files' if isinstance(out, int) else 'hits'}, {files} files)")
+    miss = "rainbow unicorn"
+    for label, bloom in [("miss, no bloom", False), ("miss, bloom", True)]:
+        stamp_bloom.STATS.reset()
+        t0 = time.perf_counter()
+        search_dom_saves(miss, dom_dir, bloom=bloom)
+        dt = time.perf_counter() - t0
+        s = stamp_bloom.STATS
+        print(f"  {label:16s} {dt:8.3f}s  skipped {s.files_skipped}/{files} files, "
+              f"{s.bytes_skipped / 2**20:.0f} MB, observed FPR {s.fpr():.3f}")
+    if tmp:
+        tmp.cleanup()
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if args and args[0] == "--bench":
+        mb = int(args[1]) if len(args) > 1 else 2048
+        bench(mb, args[2] if len(args) > 2 else None)
+    elif args:
+        base = Path(args[1]) if len(args) > 1 else Path.home() / "gentlyos" / "sessions" / "dom-saves"
+        for r in search_dom_saves(args[0], base):
+            print(f"{r['file']}: {len(r['hits'])} hits")
+            for h in r['hits'][:5]:
+                print(f"  @{h['offset']}: {h['context']}")
+    else:
+        print(__doc__)
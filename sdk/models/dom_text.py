@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+dom_text.py - plaintext sidecars for dom-saves
+A chat export is mostly markup, inline styles and scripts that no query
+can ever be about. Each save is stripped once into
+
+  <save>.html.txt   normalized text: entities decoded, whitespace runs
+                    collapsed to one space, block tags as newlines,
+                    <script>/<style>/comments dropped
+  <save>.html.map   b"OLTX" | u64 html size | u64 html mtime_ns, then
+                    (u64 text offset, u64 html offset) per text run
+
+so dom_search scans only the text and maps hits back to the HTML. A
+run whose text was copied verbatim maps byte-exact; one that was
+rewritten (entities, whitespace) maps to the start of the run (high bit
+of the html offset set).
+
+Usage:
+  python3 dom_text.py SAVE.html...      (re)extract and print sizes
+"""
+
+import bisect
+import html
+import os
+import re
+import struct
+import sys
+import threading
+from array import array
+from pathlib import Path
+
+MAGIC = b"OLTX"
+HEADER = struct.Struct('<4sQQ')
+CHUNK_BYTES = 8 << 20
+MAX_CARRY = CHUNK_BYTES     # unparsed bytes carried into the next window, at most
+INEXACT = 1 << 63
+BLOCK_TAGS = frozenset(b"address article aside blockquote br dd div dl dt figcaption figure footer "
+                       b"form h1 h2 h3 h4 h5 h6 header hr li main nav ol p pre section table td th "
+                       b"tr ul".split())
+_TOKEN_RE = re.compile(
+    rb"<(script|style)\b[^>]*>.*?</\1\s*>"   # raw block, dropped
+    rb"|<!--.*?-->"                          # comment, dropped
+    rb"|<(/?)([a-zA-Z][\w:-]*)[^>]*>?"       # tag
+    rb"|<[!?/][^>]*>?"                       # doctype / PI / odd tag
+    rb"|([^<]+)|<",                          # text
+    re.S | re.I)
+_RAW_END = {b"script": re.compile(rb"</script\s*>", re.I), b"style": re.compile(rb"</style\s*>", re.I),
+            b"!--": re.compile(rb"-->")}
+_WS_RE = re.compile(r"\s+")
+_PLAIN_RE = re.compile(rb"[&\t\n\r\f\v\x1c-\x1f\x85]|  |[^\x00-\x7f]")
+
+
+def sidecars(html_path):
+    html_path = Path(html_path)
+    return html_path.with_name(html_path.name + ".txt"), html_path.with_name(html_path.name + ".map")
+
+
+class _Writer:
+    def __init__(self, out):
+        self.out = out
+        self.pos = 0
+        self.last = b"\n"
+        self.map = array('Q')
+
+    def text(self, raw, html_off):
+        if _PLAIN_RE.search(raw) is None:
+            enc = raw[1:] if raw[:1] == b" " and self.last in b" \n" else raw
+        else:
+            s = _WS_RE.sub(" ", html.unescape(raw.decode('utf-8', 'replace')))
+            if self.last in b" \n" and s.startswith(" "):
+                s = s[1:]
+            enc = s.encode('utf-8')
+        if not enc:
+            return
+        if enc != raw:
+            if raw[:1].isspace() and enc == raw[1:]:
+                html_off += 1
+            else:
+                html_off |= INEXACT
+        self.map.extend((self.pos, html_off))
+        self.out.write(enc)
+        self.pos += len(enc)
+        self.last = enc[-1:]
+
+    def newline(self):
+        if self.last != b"\n":
+            if self.last == b" ":
+                self.out.seek(self.pos - 1)
+                self.pos -= 1
+            self.out.write(b"\n")
+            self.pos += 1
+            self.last = b"\n"
+
+
+def _tokens(w, window, start, end, base, force=False):
+    """Feed the tokens of window[start:end] to w; returns (cut, skip). A raw
+    block or comment still open stops the scan there (cut at its start),
+    unless force: then the rest is inside it, and skip is the regex of
+    its end marker to drop input up to."""
+    for m in _TOKEN_RE.finditer(window, start, end):
+        tok, slash, name, text = m.group(0, 2, 3, 4)
+        if text is not None:
+            w.text(text, base + m.start())
+        elif name is not None:
+            name = name.lower()
+            if name in BLOCK_TAGS:
+                w.newline()
+            elif not slash and name in _RAW_END:
+                return (end, _RAW_END[name]) if force else (m.start(), None)
+        elif tok.startswith(b"<!--") and not tok.endswith(b"-->"):
+            return (end, _RAW_END[b"!--"]) if force else (m.start(), None)
+    return end, None
+
+
+def _safe_end(window, lo):
+    """A cut near the end of window that splits no UTF-8 sequence or entity."""
+    end = len(window)
+    while end > lo and window[end - 1] & 0xC0 == 0x80:
+        end -= 1
+    if end > lo and window[end - 1] >= 0xC0:
+        end -= 1
+    amp = window.rfind(b"&", max(lo, end - 32), end)
+    if amp > lo and b";" not in window[amp:end]:
+        end = amp
+    return end
+
+
+def extract(html_path):
+    """Write the .txt/.map sidecars for html_path; returns the text size."""
+    html_path = Path(html_path)
+    txt, mp = sidecars(html_path)
+    st = html_path.stat()
+    tag = f".{os.getpid()}-{threading.get_ident()}.tmp"
+    tmp_txt, tmp_map = txt.with_name(txt.name + tag), mp.with_name(mp.name + tag)
+    with open(html_path, 'rb') as f, open(tmp_txt, 'wb') as out:
+        w = _Writer(out)
+        base, carry, skip = 0, b"", None
+        while True:
+            chunk = f.read(CHUNK_BYTES)
+            window = carry + chunk
+            start = 0
+            if skip is not None:
+                # Inside an overlong raw block or comment: drop it up to its end.
+                m = skip.search(window)
+                if m is None:
+                    start = max(0, len(window) - 16) if chunk else len(window)  # the marker may straddle
+                    if not chunk:
+                        break
+                    carry = window[start:]
+                    base += start
+                    continue
+                start, skip = m.end(), None
+            # Cut before the last "<" so no tag or text run is split; a raw
+            # block or comment still open at the cut is carried as well.
+            cut = max(window.rfind(b"<"), start) if chunk else len(window)
+            cut, _ = _tokens(w, window, start, cut, base)
+            if chunk and len(window) - cut > MAX_CARRY:
+                # No "<" for a long stretch, or a raw block that does not end:
+                # cut at the window end rather than carry it all forward.
+                cut, skip = _tokens(w, window, cut, _safe_end(window, cut), base, force=True)
+            if not chunk:
+                break
+            carry = window[cut:]
+            base += cut
+        out.truncate(w.pos)
+    with open(tmp_map, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, st.st_size, st.st_mtime_ns))
+        w.map.tofile(f)
+    os.replace(tmp_txt, txt)
+    os.replace(tmp_map, mp)
+    return w.pos
+
+
+class TextMap:
+    """Text offset -> HTML offset for one save."""
+
+    def __init__(self, entries):
+        self.starts = entries[0::2]
+        self.html = entries[1::2]
+
+    def to_html(self, text_off):
+        i = bisect.bisect_right(self.starts, text_off) - 1
+        if i < 0:
+            return 0
+        h = self.html[i]
+        return h & ~INEXACT if h & INEXACT else h + text_off - self.starts[i]
+
+
+def _fresh(mp, st):
+    try:
+        with open(mp, 'rb') as f:
+            head = f.read(HEADER.size)
+    except OSError:
+        return False
+    return len(head) == HEADER.size and HEADER.unpack(head) == (MAGIC, st.st_size, st.st_mtime_ns)
+
+
+def ensure(html_path):
+    """Path of an up-to-date text sidecar, extracting it if missing or stale."""
+    txt, mp = sidecars(html_path)
+    if not (txt.exists() and _fresh(mp, Path(html_path).stat())):
+        extract(html_path)
+    return txt
+
+
+def load_map(html_path):
+    _, mp = sidecars(html_path)
+    entries = array('Q')
+    with open(mp, 'rb') as f:
+        f.seek(HEADER.size)
+        entries.frombytes(f.read())
+    return TextMap(entries)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(0)
+    for name in sys.argv[1:]:
+        size = extract(name)
+        print(f"{name}: {Path(name).stat().st_size:,} B html -> {size:,} B text")
@@ -30,13 +30,35 @@ FLOW:
   9. From bucket, INJECT artifact back into master (LEFT)
   10. Master now has the branch's conclusion without the journey
   11. Master stamp updates: gate closes, pin changes, depth advances
+
+PERSISTENCE (Gently.open(root)):
+  root/catalog.json   id → name, color, plus the active project
+  root/projects/<id>.json
+                      one project (id %-escaped); loaded on first use,
+                      written back when it falls out of the max_hydrated
+                      most recently used
+  root/blobs.pack     artifact bodies, deduplicated by content hash
+                      (projects hold handles; bodies are mmapped on read)
 """
 
-from dataclasses import dataclass, field
+from dataclasses import InitVar, dataclass, field, replace
 from datetime import datetime
 from typing import Optional
 from enum import Enum
+import difflib
+import hashlib
+import itertools
 import json
+import mmap
+import os
+import re
+import struct
+import sys
+import threading
+import time
+import warnings
+import weakref
+from pathlib import Path
 
 # ═══════════════════════════════════════
 # ENUMS
@@ -70,26 +92,479 @@ class ArtifactStatus(Enum):
     INJECTED  = "injected"    # Already sent to master
     EDITED    = "edited"      # Modified in bucket before inject
 
+# ═══════════════════════════════════════
+# REGISTRY
+# ═══════════════════════════════════════
+
+class Registry:
+    """Insertion-ordered id → object map with secondary indexes.
+
+    Iterates, len()s, indexes, slices and append()s like the list it
+    replaces (reg[i] is the i-th item, O(n) but for the ends), while
+    get(id) and by(field, value) are O(1). Items that carry an `_owners` list
+    (Artifact) report writes to indexed fields, so indexes stay correct
+    even when callers assign e.g. art.status directly.
+    """
+
+    def __init__(self, items=(), index_on=()):
+        self._items = {}
+        self._index = {f: {} for f in index_on}
+        for item in items:
+            self.append(item)
+
+    def append(self, item):
+        if item.id in self._items:
+            raise KeyError(f"duplicate id {item.id!r}")
+        self._items[item.id] = item
+        for f, values in self._index.items():
+            values.setdefault(getattr(item, f), {})[item.id] = item
+        owners = getattr(item, '_owners', None)
+        if owners is not None:
+            owners.append(self)
+        return item
+
+    def remove(self, id):
+        item = self._items.pop(id)
+        for f, values in self._index.items():
+            del values[getattr(item, f)][id]
+        owners = getattr(item, '_owners', None)
+        if owners is not None:
+            owners.remove(self)
+        return item
+
+    def get(self, id, default=None):
+        return self._items.get(id, default)
+
+    def by(self, field, value):
+        """Items whose indexed field equals value, in insertion order."""
+        return list(self._index[field].get(value, {}).values())
+
+    def count(self, field, value):
+        return len(self._index[field].get(value, ()))
+
+    def touch(self, id):
+        """Move id to the end (most recently used)."""
+        self._items[id] = self._items.pop(id)
+
+    def _moved(self, item, field, old, new):
+        values = self._index.get(field)
+        if values is not None and item.id in self._items:
+            values[old].pop(item.id, None)
+            values.setdefault(new, {})[item.id] = item
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return list(self._items.values())[i]
+        n = len(self._items)
+        if i < 0:
+            i += n
+        if not 0 <= i < n:
+            raise IndexError("Registry index out of range")
+        if i == n - 1:
+            return next(reversed(self._items.values()))
+        return next(itertools.islice(self._items.values(), i, None))
+
+    def __contains__(self, id):
+        return id in self._items
+
+    def __iter__(self):
+        return iter(self._items.values())
+
+    def __len__(self):
+        return len(self._items)
+
+    def __repr__(self):
+        return f"Registry({list(self._items)!r})"
+
+
+# ═══════════════════════════════════════
+# BLOB STORE
+# ═══════════════════════════════════════
+
+class BlobStore:
+    """Content-addressed text bodies: digest → UTF-8 bytes, each stored once.
+
+    In memory until attach(path); from then on bodies are appended to a
+    pack file (u32 length | 16-byte digest | bytes per record) and read
+    back as memoryviews of an mmap, so only the index stays resident.
+    Handles are digests, so they stay valid across attach().
+    """
+
+    RECORD = struct.Struct('<I16s')
+
+    def __init__(self):
+        self._mem = {}       # digest → bytes (memory mode)
+        self._at = {}        # digest → (offset, length) (pack mode)
+        self.path = None
+        self._pack = None
+        self._map = None
+
+    @staticmethod
+    def digest(data):
+        return hashlib.blake2b(data, digest_size=16).digest()
+
+    def attach(self, path):
+        """Back the store with a pack file, moving in-memory bodies into it."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        at, off = {}, 0
+        with open(path, 'a+b') as f:    # read record headers only, seeking past bodies
+            size = f.seek(0, 2)
+            while off + self.RECORD.size <= size:
+                f.seek(off)
+                n, d = self.RECORD.unpack(f.read(self.RECORD.size))
+                if off + self.RECORD.size + n > size:
+                    break  # torn last record
+                at[d] = (off + self.RECORD.size, n)
+                off += self.RECORD.size + n
+        if off < size:
+            os.truncate(path, off)
+        if self._pack:
+            self._pack.close()
+        self.path, self._at, self._map = path, at, None
+        self._pack = open(path, 'ab')
+        mem, self._mem = self._mem, {}
+        for d, body in mem.items():
+            self._append(d, body)
+        self._pack.flush()
+
+    def _append(self, d, body):
+        if d not in self._at:
+            off = self._pack.seek(0, 2)
+            self._pack.write(self.RECORD.pack(len(body), d) + body)
+            self._at[d] = (off + self.RECORD.size, len(body))
+
+    def put(self, text):
+        """Store text (str or bytes); returns its handle (hex digest)."""
+        body = text.encode('utf-8') if isinstance(text, str) else bytes(text)
+        d = self.digest(body)
+        if self._pack is None:
+            self._mem.setdefault(d, body)
+        elif d not in self._at:
+            self._append(d, body)
+            self._pack.flush()
+        return d.hex()
+
+    def view(self, handle):
+        """Zero-copy memoryview of the body."""
+        d = bytes.fromhex(handle)
+        if self._pack is None:
+            return memoryview(self._mem[d])
+        off, n = self._at[d]
+        if self._map is None or off + n > len(self._map):
+            # Grown since mapped; views of the old map keep it alive until released.
+            with open(self.path, 'rb') as f:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return memoryview(self._map)[off:off + n]
+
+    def get(self, handle):
+        return str(self.view(handle), 'utf-8')
+
+    def __contains__(self, handle):
+        d = bytes.fromhex(handle)
+        return d in self._mem or d in self._at
+
+    def __len__(self):
+        return len(self._mem) + len(self._at)
+
+    def nbytes(self):
+        """Unique body bytes stored."""
+        return sum(map(len, self._mem.values())) + sum(n for _, n in self._at.values())
+
+
+# ═══════════════════════════════════════
+# EDIT HISTORY
+# ═══════════════════════════════════════
+
+class EditHistory:
+    """Every revision of an artifact body, as a chain of line deltas.
+
+    entries[0] is the original content. An entry is either a snapshot (a
+    handle in blobs), hunks [[start, end, "new lines"], ...] replacing
+    lines of the revision before it, or None where the edits were cleared
+    (the body is entries[0] again). A snapshot is taken only once the
+    deltas since the last one add up to the text's own size, or the chain
+    reaches MAX_CHAIN, so storage follows edit size and rebuilding any
+    revision applies at most MAX_CHAIN deltas.
+    """
+
+    MAX_CHAIN = 512
+
+    def __init__(self, base_ref, entries=None, blobs=None):
+        self.entries = entries if entries is not None else [base_ref]
+        self.blobs = BlobStore() if blobs is None else blobs
+        self._cache = None    # (rev, lines) of the last revision rebuilt
+
+    def __len__(self):
+        return len(self.entries)
+
+    @property
+    def cleared(self):
+        """True if the latest revision dropped the edits."""
+        return self.entries[-1] is None
+
+    def _lines(self, rev):
+        start = rev
+        while isinstance(self.entries[start], list):
+            start -= 1
+        if self._cache is not None and start <= self._cache[0] <= rev:
+            start, lines = self._cache[0], list(self._cache[1])
+        else:
+            lines = self.blobs.get(self.entries[start] or self.entries[0]).splitlines(True)
+        for entry in self.entries[start + 1:rev + 1]:
+            for a0, a1, text in reversed(entry):
+                lines[a0:a1] = text.splitlines(True)
+        self._cache = (rev, lines)
+        return lines
+
+    def text(self, rev=-1):
+        """Body at revision rev (negative counts from the latest)."""
+        if rev < 0:
+            rev += len(self.entries)
+        return "".join(self._lines(rev))
+
+    def append(self, text):
+        old = list(self._lines(len(self.entries) - 1))
+        new = text.splitlines(True)
+        lo, hi = 0, min(len(old), len(new))
+        while lo < hi and old[lo] == new[lo]:
+            lo += 1
+        oe, ne = len(old), len(new)
+        while oe > lo and ne > lo and old[oe - 1] == new[ne - 1]:
+            oe, ne = oe - 1, ne - 1
+        matcher = difflib.SequenceMatcher(None, old[lo:oe], new[lo:ne], autojunk=False)
+        hunks = [[lo + i1, lo + i2, "".join(new[lo + j1:lo + j2])]
+                 for tag, i1, i2, j1, j2 in matcher.get_opcodes() if tag != 'equal']
+        chain, pending = 0, sum(len(h[2]) + 16 for h in hunks)
+        for entry in reversed(self.entries):
+            if not isinstance(entry, list):
+                break
+            chain += 1
+            pending += sum(len(h[2]) + 16 for h in entry)
+        if chain >= self.MAX_CHAIN or pending >= len(text):
+            self.entries.append(self.blobs.put(text))
+        else:
+            self.entries.append(hunks)
+        self._cache = (len(self.entries) - 1, new)
+
+    def clear(self):
+        """Record a revision that drops the edits, back to the original."""
+        self.entries.append(None)
+        self._cache = None
+
+    def nbytes(self):
+        """(delta bytes, snapshot bytes) held by this history."""
+        deltas = sum(len(h[2]) + 16 for e in self.entries if isinstance(e, list) for h in e)
+        snaps = sum(len(self.blobs.view(e)) for e in self.entries[1:] if isinstance(e, str))
+        return deltas, snaps
+
+
 # ═══════════════════════════════════════
 # CORE ENTITIES
 # ═══════════════════════════════════════
 
-@dataclass
+@dataclass(frozen=True)
 class Gate:
-    """A decision point tracked across master and branches."""
+    """A decision point tracked across master and branches.
+
+    Immutable: a change is a new Gate in a new GateLog version, so every
+    stamp keeps the gates it was made with. To cycle a project gate in
+    place use proj.gates[i].cycle(); on a Gate, cycled() (and the old
+    cycle()) only returns the next one.
+    """
     letter: str              # A, B, C...
     question: str            # What's being decided
     state: GateState = GateState.OPEN
 
-    def cycle(self):
+    def cycled(self):
+        """The gate with its next state (OPEN → HALF → YES → NO)."""
         order = [GateState.OPEN, GateState.HALF, GateState.YES, GateState.NO]
-        if self.state in order:
-            idx = order.index(self.state)
-            self.state = order[(idx + 1) % len(order)]
+        if self.state not in order:
+            return self
+        return replace(self, state=order[(order.index(self.state) + 1) % len(order)])
+
+    def cycle(self):
+        """Deprecated: a Gate can no longer change in place; returns cycled()."""
+        warnings.warn("Gate.cycle() returns the next gate instead of changing this one; "
+                      "use Gate.cycled(), or proj.gates[i].cycle() to cycle a project gate",
+                      DeprecationWarning, stacklevel=2)
+        return self.cycled()
 
     def symbol(self):
         return f"{self.letter}{self.state.value}"
 
+    def to_dict(self):
+        return {'letter': self.letter, 'question': self.question, 'state': self.state.value}
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(d['letter'], d['question'], GateState(d['state']))
+
+
+class GateLog:
+    """Every version of a project's gate vector (MVCC).
+
+    versions[v] is a tuple of Gates and is never modified; changing one
+    gate appends a new tuple that reuses every other Gate object. A
+    version id is therefore a complete, stable snapshot that stamps and
+    artifacts can hold instead of a copy.
+    """
+
+    def __init__(self, versions=None):
+        self.versions = versions if versions is not None else [()]
+
+    @property
+    def head(self):
+        return len(self.versions) - 1
+
+    def at(self, version=None):
+        return self.versions[self.head if version is None else version]
+
+    def commit(self, gates):
+        """Make gates the new head (no new version if nothing changed)."""
+        gates = tuple(map(_unwrap, gates))
+        if gates != self.versions[-1]:
+            self.versions.append(gates)
+        return self.head
+
+    def set(self, i, gate):
+        gate = _unwrap(gate)
+        cur = self.versions[-1]
+        if cur[i] != gate:
+            self.versions.append(cur[:i] + (gate,) + cur[i + 1:])
+        return self.head
+
+    def to_dict(self):
+        """Versions as indexes into one table of distinct gates."""
+        table, ids = [], {}
+        versions = []
+        for gates in self.versions:
+            row = []
+            for g in gates:
+                if g not in ids:
+                    ids[g] = len(table)
+                    table.append(g.to_dict())
+                row.append(ids[g])
+            versions.append(row)
+        return {'table': table, 'versions': versions}
+
+    @classmethod
+    def from_dict(cls, d):
+        table = [Gate.from_dict(g) for g in d['table']]
+        return cls([tuple(table[i] for i in row) for row in d['versions']])
+
+    def __repr__(self):
+        return f"GateLog(head={self.head}, {self.versions[-1]!r})"
+
+
+class LiveGate:
+    """proj.gates[i]: reads the head version; assigning a field or
+    cycle() commits a new version.
+
+    Compares equal to the Gate it currently reads, which changes as the
+    gates do, so it is unhashable like a list; key dicts and sets on
+    proj.gates_at(version)[i] instead.
+    """
+    __slots__ = ('_log', '_i')
+    __hash__ = None
+
+    def __init__(self, log, i):
+        object.__setattr__(self, '_log', log)
+        object.__setattr__(self, '_i', i)
+
+    def __getattr__(self, name):
+        return getattr(self._log.at()[self._i], name)
+
+    def __setattr__(self, name, value):
+        self._log.set(self._i, replace(self._log.at()[self._i], **{name: value}))
+
+    def cycle(self):
+        self._log.set(self._i, self._log.at()[self._i].cycled())
+
+    def __eq__(self, other):
+        return self._log.at()[self._i] == (other._log.at()[other._i] if isinstance(other, LiveGate) else other)
+
+    def __repr__(self):
+        return repr(self._log.at()[self._i])
+
+
+def _unwrap(gate):
+    """The Gate a LiveGate currently reads, so stored versions never hold proxies."""
+    return gate._log.at()[gate._i] if isinstance(gate, LiveGate) else gate
+
+
+class GateVector:
+    """proj.gates: a live list-like view of the head gates. Every change
+    (item or slice assignment, del, append, extend, insert, pop, remove,
+    clear) commits one new version; a slice is a plain list of Gates."""
+
+    def __init__(self, log):
+        self.log = log
+
+    def __len__(self):
+        return len(self.log.at())
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return list(self.log.at()[i])
+        return LiveGate(self.log, range(len(self))[i])
+
+    def __setitem__(self, i, gate):
+        if isinstance(i, slice):
+            self._edit(lambda gates: gates.__setitem__(i, map(_unwrap, gate)))
+        else:
+            self.log.set(range(len(self))[i], gate)
+
+    def __delitem__(self, i):
+        self._edit(lambda gates: gates.__delitem__(i))
+
+    def __iter__(self):
+        return (LiveGate(self.log, i) for i in range(len(self)))
+
+    def __contains__(self, gate):
+        return _unwrap(gate) in self.log.at()
+
+    def _edit(self, change):
+        gates = list(self.log.at())
+        result = change(gates)
+        self.log.commit(gates)
+        return result
+
+    def append(self, gate):
+        self.log.commit(self.log.at() + (_unwrap(gate),))
+
+    def extend(self, gates):
+        self.log.commit(self.log.at() + tuple(map(_unwrap, gates)))
+
+    def insert(self, i, gate):
+        self._edit(lambda gates: gates.insert(i, _unwrap(gate)))
+
+    def pop(self, i=-1):
+        """Remove and return the Gate at i (the last by default)."""
+        return self._edit(lambda gates: gates.pop(i))
+
+    def remove(self, gate):
+        self._edit(lambda gates: gates.remove(_unwrap(gate)))
+
+    def clear(self):
+        self.log.commit(())
+
+    def index(self, gate):
+        return self.log.at().index(_unwrap(gate))
+
+    def __eq__(self, other):
+        return list(self.log.at()) == list(other)
+
+    def __repr__(self):
+        return repr(list(self.log.at()))
+
+
+def _gate_snapshot(gates):
+    """(version id, immutable gates) for a GateVector or a plain sequence."""
+    if isinstance(gates, GateVector):
+        return gates.log.head, gates.log.at()
+    return None, tuple(map(_unwrap, gates))
+
 
 @dataclass
 class Stamp:
@@ -99,11 +574,12 @@ class Stamp:
     depth: int
     max_depth: int
     conv_state: ConvState
-    gates: list                # list[Gate]
+    gates: tuple               # tuple[Gate], one GateLog version (shared, not copied)
     pin: str                   # Last key finding
     parent_id: Optional[str]   # What this forked from
     fork_type: Optional[ForkType]
     timestamp: str = ""
+    gate_version: Optional[int] = None   # GateLog version of gates
 
     def compact(self):
         ts = datetime.now().strftime("%m%dT%H%M")
@@ -129,6 +605,10 @@ class Stamp:
 @dataclass
 class Artifact:
     """A collected output from a branch, living in the keyboard bucket."""
+    # Where the bodies live: its project's store, or (if None) a store of
+    # its own made on first use. Declared first so it is set before
+    # __init__ assigns content.
+    blobs: Optional[BlobStore] = field(default=None, kw_only=True, repr=False, compare=False)
     id: str
     name: str
     content: str              # The actual text/code/finding
@@ -138,10 +618,137 @@ class Artifact:
     fork_type: Optional[ForkType] = None  # Inherits from source branch
     stamp_at_capture: str = ""  # The stamp when this was collected
     edited_content: Optional[str] = None  # If modified in bucket
+    gate_version: Optional[int] = None    # Project GateLog version at capture
+    # content and edited_content are properties over blobs (below the class);
+    # the artifact itself holds only content_ref / edited_ref handles.
+    history: Optional[EditHistory] = field(default=None, init=False, repr=False, compare=False)  # Bucket edits
+    _owners: list = field(default_factory=list, init=False, repr=False, compare=False)  # Registries holding this
+
+    def __setattr__(self, name, value):
+        owners = self.__dict__.get('_owners')
+        if owners:
+            old = self.__dict__.get(name)
+            if old != value:
+                for reg in owners:
+                    reg._moved(self, name, old, value)
+        object.__setattr__(self, name, value)
 
     def display_content(self):
         return self.edited_content if self.edited_content else self.content
 
+    def display_view(self):
+        """display_content as a memoryview of UTF-8 bytes (zero-copy unless edited)."""
+        if self.history is not None and not self.history.cleared:
+            return memoryview(self.history.text().encode('utf-8'))
+        return _blobs(self).view(self.edited_ref or self.content_ref)
+
+    def revision(self, rev):
+        """Body at edit revision rev; 0 is the content as collected, and a
+        revision that cleared the edits shows that content again."""
+        if self.history is None:
+            return ([self.content] + ([self.edited_content] if self.edited_ref else []))[rev]
+        return self.history.text(rev)
+
+    def revisions(self):
+        return len(self.history) if self.history is not None else 1 + (self.edited_ref is not None)
+
+    def to_dict(self):
+        """Bodies are stored by handle; they live in the artifact's blobs."""
+        return {
+            'id': self.id, 'name': self.name, 'content_ref': self.content_ref,
+            'source_branch': self.source_branch, 'source_depth': self.source_depth,
+            'status': self.status.value,
+            'fork_type': self.fork_type.value if self.fork_type else None,
+            'stamp_at_capture': self.stamp_at_capture, 'edited_ref': self.edited_ref,
+            'gate_version': self.gate_version,
+            'history': self.history.entries if self.history is not None else None,
+        }
+
+    @classmethod
+    def from_dict(cls, d, blobs=None):
+        """Accepts handles (content_ref, edited_ref) into blobs, or inline content."""
+        art = cls(
+            blobs=blobs, id=d['id'], name=d['name'], content=d.get('content', ""),
+            source_branch=d['source_branch'], source_depth=d['source_depth'],
+            status=ArtifactStatus(d['status']),
+            fork_type=ForkType(d['fork_type']) if d.get('fork_type') else None,
+            stamp_at_capture=d.get('stamp_at_capture', ""), edited_content=d.get('edited_content'),
+            gate_version=d.get('gate_version'),
+        )
+        if 'content_ref' in d:
+            art.content_ref, art.edited_ref = d['content_ref'], d.get('edited_ref')
+        if d.get('history'):
+            art.history = EditHistory(d['history'][0], d['history'], _blobs(art))
+        return art
+
+
+def _blobs(art):
+    blobs = art.__dict__.get('blobs')
+    if blobs is None:
+        blobs = art.__dict__['blobs'] = BlobStore()
+    return blobs
+
+
+def _rebind(art, blobs):
+    """Copy art's bodies into blobs and keep them there from now on."""
+    d = art.__dict__
+    src = d.get('blobs')
+    if src is blobs:
+        return
+    history = d.get('history')
+    refs = [d.get('content_ref'), d.get('edited_ref')]
+    if history is not None:
+        refs += [e for e in history.entries if isinstance(e, str)]
+    for ref in refs:
+        if ref is not None and ref not in blobs:
+            blobs.put(src.view(ref))
+    d['blobs'] = blobs
+    if history is not None:
+        history.blobs = blobs
+
+
+def _body(ref_name):
+    def fget(self):
+        ref = self.__dict__.get(ref_name)
+        return None if ref is None else _blobs(self).get(ref)
+
+    def fset(self, text):
+        self.__dict__[ref_name] = None if text is None else _blobs(self).put(text)
+    return property(fget, fset)
+
+
+def _get_edited(self):
+    history = self.__dict__.get('history')
+    if history is not None:
+        return None if history.cleared else history.text()
+    ref = self.__dict__.get('edited_ref')
+    return None if ref is None else _blobs(self).get(ref)
+
+
+def _set_edited(self, text):
+    d = self.__dict__
+    if '_owners' not in d:    # still in __init__
+        d['edited_ref'] = None if text is None else _blobs(self).put(text)
+        d['history'] = None
+        return
+    if text is None and d.get('history') is None and d.get('edited_ref') is None:
+        return    # nothing edited, nothing to clear
+    if d.get('history') is None:
+        d['history'] = EditHistory(self.content_ref, blobs=_blobs(self))
+        if d.get('edited_ref') is not None:   # edit made before history was kept
+            d['history'].append(_blobs(self).get(d['edited_ref']))
+        d['edited_ref'] = None
+    if text is None:
+        if not d['history'].cleared:
+            d['history'].clear()
+    else:
+        d['history'].append(text)
+
+
+# Set after @dataclass so __init__ keeps content=/edited_content= arguments.
+Artifact.content = _body('content_ref')
+Artifact.edited_content = property(_get_edited, _set_edited)
+
 
 @dataclass
 class Branch:
@@ -158,6 +765,7 @@ class Branch:
     order: int = 0            # Position in right pane progress list
 
     def make_stamp(self, project_id, gates):
+        version, gates = _gate_snapshot(gates)
         return Stamp(
             project_id=project_id,
             branch_id=self.id,
@@ -168,6 +776,27 @@ class Branch:
             pin=self.pin,
             parent_id="master",
             fork_type=self.fork_type,
+            gate_version=version,
+        )
+
+    def to_dict(self):
+        """Artifacts are stored by id; the project's bucket owns them."""
+        return {
+            'id': self.id, 'name': self.name, 'fork_type': self.fork_type.value,
+            'forked_at_depth': self.forked_at_depth, 'stamp_at_fork': self.stamp_at_fork,
+            'depth': self.depth, 'conv_state': self.conv_state.value, 'pin': self.pin,
+            'artifacts': [a.id for a in self.artifacts], 'order': self.order,
+        }
+
+    @classmethod
+    def from_dict(cls, d, artifacts):
+        """artifacts: id → Artifact, to re-link the branch's collected outputs."""
+        return cls(
+            id=d['id'], name=d['name'], fork_type=ForkType(d['fork_type']),
+            forked_at_depth=d['forked_at_depth'], stamp_at_fork=d['stamp_at_fork'],
+            depth=d.get('depth', 0), conv_state=ConvState(d.get('conv_state', "OPEN")),
+            pin=d.get('pin', ""), order=d.get('order', 0),
+            artifacts=[artifacts[a] for a in d.get('artifacts', []) if a in artifacts],
         )
 
 
@@ -180,6 +809,7 @@ class MasterChat:
     pin: str = ""
 
     def make_stamp(self, project_id, gates):
+        version, gates = _gate_snapshot(gates)
         return Stamp(
             project_id=project_id,
             branch_id=None,  # None = master
@@ -190,8 +820,21 @@ class MasterChat:
             pin=self.pin,
             parent_id=None,
             fork_type=None,
+            gate_version=version,
         )
 
+    def to_dict(self):
+        return {'depth': self.depth, 'max_depth': self.max_depth,
+                'conv_state': self.conv_state.value, 'pin': self.pin}
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(depth=d.get('depth', 0), max_depth=d.get('max_depth', 0),
+                   conv_state=ConvState(d.get('conv_state', "OPEN")), pin=d.get('pin', ""))
+
+
+BUCKET_INDEXES = ('status', 'source_branch')
+
 
 @dataclass
 class Project:
@@ -200,15 +843,33 @@ class Project:
     name: str
     color: str
     master: MasterChat = field(default_factory=MasterChat)
-    branches: list = field(default_factory=list)    # list[Branch]
-    gates: list = field(default_factory=list)        # list[Gate] - shared across all
-    bucket: list = field(default_factory=list)       # list[Artifact] - keyboard bucket
+    branches: Registry = field(default_factory=Registry)   # Branch by id (a list is converted)
+    gate_log: GateLog = field(default_factory=GateLog)   # Gate versions; proj.gates is the head
+    bucket: Registry = field(default_factory=lambda: Registry(index_on=BUCKET_INDEXES))  # keyboard bucket (a list is converted)
+    artifact_seq: int = 0    # Next artifact number; ids stay unique after removals
+    blobs: Optional[BlobStore] = field(default=None, repr=False, compare=False)  # Artifact bodies (own store if None)
+    gates: InitVar[Optional[list]] = None   # Initial gates, committed as the first GateLog version
+
+    def __post_init__(self, gates):
+        if not isinstance(self.branches, Registry):
+            self.branches = Registry(self.branches)
+        if not isinstance(self.bucket, Registry):
+            self.bucket = Registry(self.bucket, index_on=BUCKET_INDEXES)
+        if self.blobs is None:
+            self.blobs = BlobStore()   # in memory until a ProjectStore adopts the project
+        if gates is not None:
+            self.gate_log.commit(gates)
 
     def branch_from_master(self, name, fork_type):
-        """Fork a new branch from the current master state."""
+        """Fork a new branch from the current master state. Forking the same
+        name again gets a numbered id (<project>-<name>-2, -3, ...)."""
         stamp = self.master.make_stamp(self.id, self.gates)
+        branch_id, n = f"{self.id}-{name}", 1
+        while branch_id in self.branches:
+            n += 1
+            branch_id = f"{self.id}-{name}-{n}"
         branch = Branch(
-            id=f"{self.id}-{name}",
+            id=branch_id,
             name=name,
             fork_type=fork_type,
             forked_at_depth=self.master.depth,
@@ -220,26 +881,30 @@ class Project:
 
     def collect_from_branch(self, branch_id, name, content):
         """Collect an artifact from a branch into the bucket."""
-        branch = next((b for b in self.branches if b.id == branch_id), None)
+        branch = self.branches.get(branch_id)
         if not branch:
             return None
 
+        stamp = branch.make_stamp(self.id, self.gates)
         art = Artifact(
-            id=f"art-{len(self.bucket)}",
+            blobs=self.blobs,
+            id=f"art-{self.artifact_seq}",
             name=name,
             content=content,
             source_branch=branch_id,
             source_depth=branch.depth,
             fork_type=branch.fork_type,
-            stamp_at_capture=branch.make_stamp(self.id, self.gates).compact(),
+            stamp_at_capture=stamp.compact(),
+            gate_version=stamp.gate_version,
         )
+        self.artifact_seq += 1
         branch.artifacts.append(art)
         self.bucket.append(art)
         return art
 
     def inject_to_master(self, artifact_id):
         """Inject a bucket artifact into the master chat."""
-        art = next((a for a in self.bucket if a.id == artifact_id), None)
+        art = self.bucket.get(artifact_id)
         if not art:
             return None
 
@@ -251,47 +916,447 @@ class Project:
 
     def stage_artifact(self, artifact_id):
         """Move artifact to staged (ready to inject)."""
-        art = next((a for a in self.bucket if a.id == artifact_id), None)
+        art = self.bucket.get(artifact_id)
         if art:
             art.status = ArtifactStatus.STAGED
         return art
 
+    def to_dict(self):
+        return {
+            'id': self.id, 'name': self.name, 'color': self.color,
+            'master': self.master.to_dict(),
+            'branches': [b.to_dict() for b in self.branches],
+            'gates': self.gate_log.to_dict(),
+            'bucket': [a.to_dict() for a in self.bucket],
+            'artifact_seq': self.artifact_seq,
+        }
+
+    @classmethod
+    def from_dict(cls, d, blobs=None):
+        bucket = [Artifact.from_dict(a, blobs) for a in d.get('bucket', [])]
+        by_id = {a.id: a for a in bucket}
+        gates = d.get('gates', [])
+        if isinstance(gates, dict):
+            log = GateLog.from_dict(gates)
+        else:    # a plain list of the current gates
+            log = GateLog()
+            log.commit(Gate.from_dict(g) for g in gates)
+        proj = cls(id=d['id'], name=d['name'], color=d['color'],
+                   master=MasterChat.from_dict(d.get('master', {})),
+                   gate_log=log, artifact_seq=d.get('artifact_seq', len(bucket)), blobs=blobs)
+        for b in d.get('branches', []):
+            proj.branches.append(Branch.from_dict(b, by_id))
+        for a in bucket:
+            proj.bucket.append(a)
+        return proj
+
+    def gates_at(self, version):
+        """The gates as they were at a GateLog version (e.g. art.gate_version)."""
+        return self.gate_log.at(version)
+
+    def artifacts_with(self, status=None, source_branch=None):
+        """Bucket artifacts filtered by status and/or source branch (indexed)."""
+        if status is None and source_branch is None:
+            return list(self.bucket)
+        if status is None:
+            return self.bucket.by('source_branch', source_branch)
+        arts = self.bucket.by('status', status)
+        return arts if source_branch is None else [a for a in arts if a.source_branch == source_branch]
+
     def edit_artifact(self, artifact_id, new_content):
-        """Edit artifact content in the bucket before injecting."""
-        art = next((a for a in self.bucket if a.id == artifact_id), None)
+        """Edit artifact content in the bucket before injecting.
+        Earlier edits stay readable through art.revision(n)."""
+        art = self.bucket.get(artifact_id)
         if art:
             art.edited_content = new_content
             art.status = ArtifactStatus.EDITED
         return art
 
 
+def _get_gates(self):
+    """The current gates, shared across master and all branches. Setting
+    a gate's state, cycling it or assigning a new list commits a version."""
+    return GateVector(self.gate_log)
+
+
+def _set_gates(self, gates):
+    self.gate_log.commit(gates)
+
+
+# Set after @dataclass so __init__ keeps the gates= argument.
+Project.gates = property(_get_gates, _set_gates)
+
+
+class ProjectStore:
+    """One JSON file per project, plus a small catalog (id → name, color,
+    and the active project) so the app can list every project without
+    reading any of them. Artifact bodies of its projects go to its own
+    BlobStore, backed by root/blobs.pack; save() first adopts a project
+    that still keeps its bodies elsewhere."""
+
+    CATALOG = "catalog.json"
+    PROJECTS = "projects"
+
+    def __init__(self, root):
+        self.root = Path(root)
+        (self.root / self.PROJECTS).mkdir(parents=True, exist_ok=True)
+        cat = self.root / self.CATALOG
+        data = json.loads(cat.read_text()) if cat.exists() else {}
+        self.catalog = data.get('projects', {})
+        self.active = data.get('active')
+        self.blobs = BlobStore()
+        self.blobs.attach(self.root / "blobs.pack")
+        self._saved = {}     # id → digest of the JSON last read or written
+
+    def _path(self, id):
+        # Every byte outside [A-Za-z0-9_-] becomes %XX, so distinct ids never share a file
+        name = re.sub(r"[^A-Za-z0-9_-]", lambda m: "".join(f"%{b:02X}" for b in m.group().encode()), id)
+        if len(name) > 200:
+            name = name[:183] + "~" + hashlib.sha1(id.encode()).hexdigest()[:16]
+        return self.root / self.PROJECTS / (name + ".json")
+
+    @staticmethod
+    def _write(path, text):
+        tmp = path.with_name(f"{path.name}.{os.getpid()}-{threading.get_ident()}.tmp")
+        tmp.write_text(text)
+        os.replace(tmp, path)
+
+    def write_catalog(self):
+        self._write(self.root / self.CATALOG, json.dumps(
+            {'active': self.active, 'projects': self.catalog}, ensure_ascii=False, indent=1))
+
+    def adopt(self, project):
+        """Copy the bodies of project's artifacts into this store's pack
+        and bind the project to it, so saved handles always resolve."""
+        for art in project.bucket:
+            _rebind(art, self.blobs)
+        project.blobs = self.blobs
+
+    def save(self, project):
+        """Write project back; a project unchanged since it was last read
+        or written is skipped. Returns whether it was written."""
+        self.adopt(project)
+        text = json.dumps(project.to_dict(), ensure_ascii=False)
+        digest = hashlib.blake2b(text.encode('utf-8'), digest_size=16).digest()
+        entry = {'name': project.name, 'color': project.color}
+        if self.catalog.get(project.id) != entry:
+            self.catalog[project.id] = entry
+            self.write_catalog()
+        if self._saved.get(project.id) == digest:
+            return False
+        self._write(self._path(project.id), text)
+        self._saved[project.id] = digest
+        return True
+
+    def load(self, id):
+        text = self._path(id).read_text()
+        self._saved[id] = hashlib.blake2b(text.encode('utf-8'), digest_size=16).digest()
+        return Project.from_dict(json.loads(text), self.blobs)
+
+    def __contains__(self, id):
+        return id in self.catalog
+
+
 @dataclass
 class Gently:
-    """The outer app. Contains all projects."""
-    projects: list = field(default_factory=list)     # list[Project]
+    """The outer app. Contains all projects.
+
+    With a store, projects live on disk and only the max_hydrated most
+    recently used stay in `projects`; the rest are written back (if they
+    changed) and dropped. The active project, the one add_project() or
+    project() just returned, and any project the caller still holds a
+    reference to are never evicted, so edits made through a held Project
+    are never lost to a detached copy.
+    """
+    projects: Registry = field(default_factory=Registry)  # Project by id (hydrated only, LRU order; a list is converted)
     active_project_id: Optional[str] = None
+    store: Optional[ProjectStore] = None
+    max_hydrated: int = 8
     # Many:1 — multiple projects can reference each other's branches
 
+    def __post_init__(self):
+        if not isinstance(self.projects, Registry):
+            self.projects = Registry(self.projects)
+
+    @classmethod
+    def open(cls, root, max_hydrated=8):
+        """App backed by root/; reads only the catalog."""
+        store = ProjectStore(root)
+        return cls(active_project_id=store.active, store=store, max_hydrated=max_hydrated)
+
     def add_project(self, id, name, color="#00e5a0"):
-        proj = Project(id=id, name=name, color=color)
+        if id in self.projects or (self.store and id in self.store):
+            raise ValueError(f"project {id!r} already exists")
+        proj = Project(id=id, name=name, color=color, blobs=self.store.blobs if self.store else None)
         self.projects.append(proj)
         if not self.active_project_id:
             self.active_project_id = id
+        if self.store:
+            self.store.active = self.active_project_id
+            self.store.save(proj)
+            self._evict(keep=id)
+        return proj
+
+    def project_ids(self):
+        """Every project, hydrated or not."""
+        ids = list(self.store.catalog) if self.store else []
+        return ids + [p.id for p in self.projects if p.id not in ids]
+
+    def project(self, id):
+        """The project with this id, loading it from the store if needed."""
+        proj = self.projects.get(id)
+        if proj is not None:
+            self.projects.touch(id)
+        elif self.store and id in self.store:
+            proj = self.projects.append(self.store.load(id))
+            self._evict(keep=id)
         return proj
 
     def active_project(self):
-        return next((p for p in self.projects if p.id == self.active_project_id), None)
+        return self.project(self.active_project_id)
 
     def switch_project(self, id):
         """Switch active project. LEFT pane changes to new master."""
         self.active_project_id = id
+        if self.store:
+            self.store.active = id
+            self.project(id)
+
+    def _evict(self, keep=None):
+        """Write back and drop the least recently used projects beyond
+        max_hydrated, never the active one or keep (the one just handed out)."""
+        for id in [p.id for p in self.projects]:
+            if len(self.projects) <= self.max_hydrated:
+                break
+            if id not in (self.active_project_id, keep):
+                self._release(id)
+
+    def _release(self, id):
+        """Drop one project, written back first. A project still referenced
+        outside the app is in use: it goes back in as most recently used."""
+        self.store.save(self.projects.get(id))
+        held = weakref.ref(self.projects.remove(id))
+        if held() is not None:
+            self.projects.append(held())
+
+    def flush(self):
+        """Write every hydrated project, and which one is active, back to the store."""
+        for proj in self.projects:
+            self.store.save(proj)
+        self.store.write_catalog()
+
+
+# ═══════════════════════════════════════
+# BENCHMARK — bucket scaling
+# ═══════════════════════════════════════
+
+def bench(sizes=(1000, 10000, 100000), ops=2000):
+    """Per-action cost of bucket lookups vs the old linear scans."""
+    import random
+    print(f"  {'artifacts':>10s} {'indexed µs/op':>14s} {'linear µs/op':>13s} {'by status':>10s}")
+    for n in sizes:
+        proj = Project(id="bench", name="bench", color="#fff")
+        branches = [proj.branch_from_master(f"b{i}", ForkType.EXPLORE) for i in range(max(1, n // 100))]
+        for i in range(n):
+            proj.collect_from_branch(branches[i % len(branches)].id, f"a{i}", "finding")
+        rng = random.Random(n)
+        ids = [f"art-{rng.randrange(n)}" for _ in range(ops)]
+        t0 = time.perf_counter()
+        for k, aid in enumerate(ids):
+            (proj.stage_artifact, lambda a: proj.edit_artifact(a, "edit"), proj.inject_to_master)[k % 3](aid)
+        indexed = (time.perf_counter() - t0) / ops * 1e6
+        flat = list(proj.bucket)
+        probe = ids[:max(10, ops * 1000 // n)]   # linear scans get slow; sample fewer
+        t0 = time.perf_counter()
+        for aid in probe:
+            next((a for a in flat if a.id == aid), None)
+        linear = (time.perf_counter() - t0) / len(probe) * 1e6
+        t0 = time.perf_counter()
+        staged = len(proj.artifacts_with(status=ArtifactStatus.STAGED))
+        by_status = (time.perf_counter() - t0) * 1e6
+        assert staged == sum(a.status == ArtifactStatus.STAGED for a in flat)
+        print(f"  {n:10,d} {indexed:14.2f} {linear:13.1f} {by_status:8.0f}µs")
+
+
+def bench_projects(n=500, artifacts=200, max_hydrated=8, switches=2000):
+    """Startup, switch cost and resident size for a store of n projects."""
+    import random
+    import tempfile
+    import tracemalloc
+    with tempfile.TemporaryDirectory() as tmp:
+        app = Gently.open(tmp, max_hydrated)
+        t0 = time.perf_counter()
+        for i in range(n):
+            proj = app.add_project(f"p{i}", f"Project {i}")
+            proj.gates = [Gate(c, f"Question {c}?") for c in "ABCD"]
+            b = proj.branch_from_master("explore", ForkType.EXPLORE)
+            for k in range(artifacts):
+                proj.collect_from_branch(b.id, f"a{k}", f"finding {k} " * 20)
+            app.store.save(proj)
+        print(f"  wrote {n} projects x {artifacts} artifacts in {time.perf_counter() - t0:.2f}s")
+
+        t0 = time.perf_counter()
+        app = Gently.open(tmp, max_hydrated)
+        startup = (time.perf_counter() - t0) * 1000
+        print(f"  startup      {startup:8.2f} ms  ({len(app.project_ids())} projects listed, "
+              f"{len(app.projects)} hydrated)")
+        rng = random.Random(3)
+        hot = [f"p{i}" for i in range(max_hydrated // 2)]
+        order = [rng.choice(hot) if rng.random() < 0.8 else f"p{rng.randrange(n)}" for _ in range(switches)]
+        cold_t, warm_t = [], []
+        for pid in order:
+            loaded = app.projects.get(pid) is not None
+            t0 = time.perf_counter()
+            app.switch_project(pid)
+            (warm_t if loaded else cold_t).append(time.perf_counter() - t0)
+        for label, ts in (("warm switch", warm_t), ("cold switch", cold_t)):
+            if ts:
+                print(f"  {label}  {sum(ts) / len(ts) * 1e6:8.1f} µs  ({len(ts)} switches)")
+        tracemalloc.start()
+        app = Gently.open(tmp, max_hydrated)
+        for pid in order:
+            app.switch_project(pid)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"  peak memory  {peak / 2**20:8.1f} MB  ({len(app.projects)}/{n} hydrated)")
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        eager = Gently.open(tmp, max_hydrated=n)
+        for pid in eager.project_ids():
+            eager.project(pid)
+        dt = time.perf_counter() - t0
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"  load all     {dt * 1000:8.0f} ms  {peak / 2**20:6.1f} MB  (every project hydrated)")
+
+
+def bench_blobs(n=100000, unique=1000, size=2000):
+    """Resident body memory: one str per artifact vs deduplicated handles."""
+    import random
+    import tempfile
+    import tracemalloc
+    rng = random.Random(5)
+    findings = [f"finding {i}: " + "".join(rng.choice("abcdefgh ") for _ in range(size)) for i in range(unique)]
+    picks = [rng.randrange(unique) for _ in range(n)]
+
+    def measure(make):
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        kept = make()
+        dt = time.perf_counter() - t0
+        mem = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        return kept, dt, mem
+
+    # Fresh str per artifact, as after parsing saved projects or copying findings.
+    _, dt, mem = measure(lambda: [findings[i].encode().decode() for i in picks])
+    print(f"  {n:,} artifacts over {unique:,} unique {size / 1000:.0f} KB bodies")
+    print(f"  str per artifact   {mem / 2**20:7.1f} MB  {dt * 1000:6.0f} ms")
+    store = BlobStore()
+    refs, dt, mem = measure(lambda: [store.put(findings[i].encode().decode()) for i in picks])
+    print(f"  blob store (mem)   {mem / 2**20:7.1f} MB  {dt * 1000:6.0f} ms  "
+          f"({len(store):,} blobs, {store.nbytes() / 2**20:.1f} MB unique)")
+    with tempfile.TemporaryDirectory() as tmp:
+        store = BlobStore()
+        store.attach(Path(tmp) / "blobs.pack")
+        refs, dt, mem = measure(lambda: [store.put(findings[i].encode().decode()) for i in picks])
+        print(f"  blob store (pack)  {mem / 2**20:7.1f} MB  {dt * 1000:6.0f} ms  "
+              f"(bodies on disk, {store.path.stat().st_size / 2**20:.1f} MB)")
+        t0 = time.perf_counter()
+        for r in refs[:10000]:
+            store.get(r)
+        print(f"  lazy read          {(time.perf_counter() - t0) / 10000 * 1e6:7.2f} µs per body (mmap)")
+        store._map = None  # release before the directory goes
+
+
+def bench_history(lines=4000, edits=2000):
+    """Edit-history storage and rebuild cost for one long artifact."""
+    import random
+    rng = random.Random(9)
+    body = [f"{i:5d} " + "".join(rng.choice("abcdefgh ") for _ in range(44)) + "\n" for i in range(lines)]
+    proj = Project(id="bench", name="bench", color="#fff")
+    branch = proj.branch_from_master("b", ForkType.EXPLORE)
+    art = proj.collect_from_branch(branch.id, "long", "".join(body))
+    full = 0
+    t0 = time.perf_counter()
+    for _ in range(edits):
+        for _ in range(rng.randint(1, 3)):
+            i = rng.randrange(len(body))
+            (body.insert, body.__setitem__)[rng.random() < 0.7](i, f"edited {rng.random()}\n")
+        text = "".join(body)
+        full += len(text)
+        proj.edit_artifact(art.id, text)
+    dt = time.perf_counter() - t0
+    deltas, snaps = art.history.nbytes()
+    print(f"  {edits:,} edits to a {len(text) / 1000:.0f} KB artifact: {dt / edits * 1000:.2f} ms per edit")
+    print(f"  full copies  {full / 2**20:8.1f} MB")
+    print(f"  delta chain  {(deltas + snaps) / 2**20:8.2f} MB  ({deltas / 1000:.0f} KB deltas, "
+          f"{sum(isinstance(e, str) for e in art.history.entries[1:])} snapshots)")
+    for label, revs in (("latest", [-1] * 200), ("random", [rng.randrange(edits) for _ in range(200)])):
+        t0 = time.perf_counter()
+        for r in revs:
+            art.history._cache = None
+            art.revision(r)
+        print(f"  rebuild {label:7s} {(time.perf_counter() - t0) / len(revs) * 1000:6.2f} ms (uncached)")
+
+
+def bench_gates(n_gates=26, steps=100000):
+    """Historical stamps: deep-copied gate lists vs GateLog version ids."""
+    import copy
+    import random
+    import tracemalloc
+    rng = random.Random(4)
+    states = list(GateState)
+    branch = Branch(id="b", name="b", fork_type=ForkType.EXPLORE, forked_at_depth=0, stamp_at_fork="")
+
+    def run(versioned):
+        proj = Project(id="bench", name="bench", color="#fff")
+        proj.gates = [Gate(chr(65 + i), f"Question {i}?") for i in range(n_gates)]
+        plain = list(proj.gates_at(None))
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        stamps = []
+        for _ in range(steps):
+            i, state = rng.randrange(n_gates), rng.choice(states)
+            if versioned:
+                proj.gates[i].state = state
+                stamps.append(branch.make_stamp(proj.id, proj.gates))
+            else:
+                plain[i] = replace(plain[i], state=state)
+                stamps.append(branch.make_stamp(proj.id, copy.deepcopy(plain)))
+        dt = time.perf_counter() - t0
+        mem = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        return stamps, proj, dt, mem
+
+    rng.seed(4)
+    copied, _, dt_c, mem_c = run(False)
+    rng.seed(4)
+    versioned, proj, dt_v, mem_v = run(True)
+    same = all([g.symbol() for g in a.gates] == [g.symbol() for g in b.gates]
+               for a, b in zip(copied[::97], versioned[::97]))
+    print(f"  {steps:,} gate changes + stamps over {n_gates} gates "
+          f"(history {'matches' if same else 'DIFFERS'})")
+    print(f"  deep copy per stamp  {mem_c / 2**20:7.1f} MB  {dt_c / steps * 1e6:6.1f} µs/step")
+    print(f"  GateLog versions     {mem_v / 2**20:7.1f} MB  {dt_v / steps * 1e6:6.1f} µs/step  "
+          f"({proj.gate_log.head:,} versions)")
 
 
 # ═══════════════════════════════════════
 # DEMO — Full workflow
 # ═══════════════════════════════════════
 
-if __name__ == "__main__":
+if __name__ == "__main__" and sys.argv[1:2] == ["--bench"]:
+    bench()
+elif __name__ == "__main__" and sys.argv[1:2] == ["--bench-projects"]:
+    bench_projects()
+elif __name__ == "__main__" and sys.argv[1:2] == ["--bench-blobs"]:
+    bench_blobs()
+elif __name__ == "__main__" and sys.argv[1:2] == ["--bench-history"]:
+    bench_history()
+elif __name__ == "__main__" and sys.argv[1:2] == ["--bench-gates"]:
+    bench_gates()
+elif __name__ == "__main__":
     print("=" * 60)
     print("  GENTLY — Data Model Demo")
     print("=" * 60)
@@ -346,6 +1411,8 @@ if __name__ == "__main__":
     print("CHALLENGE BRANCH STAMP:")
     challenge_stamp = png_branch.make_stamp(proj.id, proj.gates)
     print(f"  {challenge_stamp.compact()}")
+    print(f"  (jpeg stamp still holds gate version {branch_stamp.gate_version}: "
+          f"{''.join(g.symbol() for g in branch_stamp.gates)})")
     print()
 
     # 7. Collect artifact from JPEG branch
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+stamp_fuzzy.py - trigram fuzzy search over pins, looks and findings
+Pins are slugged in compact stamps ("blue-dies-in-JPEG") and free text
+in rehydrate findings, so exact substring search misses typos and
+slug/space variants. Text is normalized (lowercase, -/_/punctuation to
+spaces) and split into trigrams; a query ranks texts by the share of its
+trigrams they contain, then by Jaccard similarity.
+
+Distinct texts are indexed once and map to every stamp ref that carries
+them, so a history of 1M stamps with repeated pins stays small.
+
+  index = FuzzyIndex(base_dir / ".stamp-trigrams.jsonl")
+  index.attach()                 # index every Stamp.save from now on
+  index.add_findings(findings)   # rehydrate findings {branch: text}
+  index.search("jpg kils blu")   # [(score, ref, kind, text), ...]
+
+Each (ref, kind) holds one text: saving a stamp with a new pin retracts
+its old pin, and a text nobody holds any more drops out of the index.
+
+The .jsonl file is an append-only log of (ref, kind, text) entries
+(text "" retracts) and is replayed on open; once it holds more than
+twice the live entries it is rewritten with just those.
+
+  python3 stamp_fuzzy.py --backfill [DIR]   index existing stamps
+  python3 stamp_fuzzy.py QUERY [DIR]
+"""
+
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+import stamp as stamp_mod
+
+FUZZY_NAME = ".stamp-trigrams.jsonl"
+MIN_SCORE = 0.5
+LOG_COMPACT_MIN = 1000
+_NORM_RE = re.compile(r"[\W_]+")
+
+
+def normalize(text):
+    return _NORM_RE.sub(" ", text.lower()).strip()
+
+
+def trigrams(text):
+    padded = f"  {normalize(text)} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class FuzzyIndex:
+    def __init__(self, path=None):
+        self.path = Path(path) if path else None
+        self.texts = []          # text id -> normalized text (None once retracted)
+        self.sizes = []          # text id -> trigram count
+        self.owners = []         # text id -> {(ref, kind): None}, in insertion order
+        self.ids = {}            # normalized text -> text id
+        self.grams = {}          # trigram -> [text id, ...]
+        self.current = {}        # (ref, kind) -> text id
+        self.dead = 0            # retracted text ids still in the postings
+        self.lines = 0           # entries in the log
+        if self.path and self.path.exists():
+            with self.path.open(encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        ref, kind, text = json.loads(line)
+                    except ValueError:
+                        continue  # torn last line
+                    self._add(ref, kind, text)
+                    self.lines += 1
+
+    def _add(self, ref, kind, text):
+        """Make text the one text of (ref, kind), retracting the previous
+        one; empty text just retracts. False if nothing changed."""
+        norm = normalize(text) if text else ""
+        key = (ref, kind)
+        old = self.current.get(key)
+        tid = self.ids.get(norm) if norm else None
+        if old is None and not norm or old is not None and old == tid:
+            return False
+        if old is not None:
+            self._retract(key, old)
+        if norm:
+            if tid is None:
+                tid = self.ids[norm] = len(self.texts)
+                grams = trigrams(norm)
+                self.texts.append(norm)
+                self.sizes.append(len(grams))
+                self.owners.append({})
+                for g in grams:
+                    self.grams.setdefault(g, []).append(tid)
+            self.owners[tid][key] = None
+            self.current[key] = tid
+        if self.dead > len(self.texts) // 2:
+            self._compact()
+        return True
+
+    def _retract(self, key, tid):
+        owners = self.owners[tid]
+        del owners[key]
+        del self.current[key]
+        if not owners:
+            del self.ids[self.texts[tid]]
+            self.texts[tid] = None
+            self.dead += 1
+
+    def _compact(self):
+        """Renumber live texts and drop retracted ids from the postings."""
+        remap = {}
+        texts, sizes, owners = [], [], []
+        for tid, text in enumerate(self.texts):
+            if text is not None:
+                remap[tid] = len(texts)
+                texts.append(text)
+                sizes.append(self.sizes[tid])
+                owners.append(self.owners[tid])
+        self.texts, self.sizes, self.owners = texts, sizes, owners
+        self.ids = {text: tid for tid, text in enumerate(texts)}
+        self.current = {key: remap[tid] for key, tid in self.current.items()}
+        grams = {}
+        for g, ids in self.grams.items():
+            ids = [remap[tid] for tid in ids if tid in remap]
+            if ids:
+                grams[g] = ids
+        self.grams = grams
+        self.dead = 0
+
+    def add(self, ref, kind, text):
+        """Index text as (ref, kind); returns whether anything changed."""
+        if not self._add(ref, kind, text):
+            return False
+        if self.path:
+            if self.lines >= max(LOG_COMPACT_MIN, 2 * len(self.current)):
+                self._rewrite_log()
+            else:
+                with self.path.open('a', encoding='utf-8') as f:
+                    f.write(json.dumps([ref, kind, text or ""], ensure_ascii=False) + "\n")
+                self.lines += 1
+        return True
+
+    def _rewrite_log(self):
+        tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}-{threading.get_ident()}.tmp")
+        with tmp.open('w', encoding='utf-8') as f:
+            for (ref, kind), tid in self.current.items():
+                f.write(json.dumps([ref, kind, self.texts[tid]], ensure_ascii=False) + "\n")
+        os.replace(tmp, self.path)
+        self.lines = len(self.current)
+
+    def add_stamp(self, ref, stamp):
+        self.add(ref, 'pin', stamp.pin)
+        self.add(ref, 'look', stamp.look)
+
+    def add_findings(self, findings):
+        for bname, finding in findings.items():
+            self.add(f"finding:{bname}", 'finding', finding)
+
+    def backfill(self, base_dir):
+        """Index every stamp file and journal record under base_dir, and
+        retract stamp files under it that are gone; safe to run again, and
+        after attach(). Returns the number of entries changed."""
+        from stamp_journal import StampJournal
+        base_dir = Path(base_dir)
+        changed = 0
+        seen = set()
+        for sf in base_dir.rglob("*.stamp.json"):
+            try:
+                d = json.loads(sf.read_text())
+            except (OSError, ValueError):
+                continue
+            seen.add(str(sf))
+            changed += self.add(str(sf), 'pin', d.get('pin', ''))
+            changed += self.add(str(sf), 'look', d.get('look', ''))
+        journal = base_dir / "journal"
+        if journal.exists():
+            for ref, _, d in StampJournal(journal, read_only=True).records():
+                changed += self.add(ref, 'pin', d.get('pin', ''))
+                changed += self.add(ref, 'look', d.get('look', ''))
+        root = str(base_dir) + os.sep
+        for ref, kind in list(self.current):
+            if ref.startswith(root) and ref.endswith(".stamp.json") and ref not in seen:
+                changed += self.add(ref, kind, "")
+        return changed
+
+    def move(self, moves):
+        """Re-point entries of moved stamps, moves {old ref: new ref}."""
+        for ref, kind in [key for key in self.current if key[0] in moves]:
+            text = self.texts[self.current[ref, kind]]
+            self.add(ref, kind, "")
+            self.add(moves[ref], kind, text)
+
+    def attach(self):
+        """Index every subsequent Stamp.save, and follow moved stamps."""
+        if self.add_stamp not in stamp_mod.SAVE_HOOKS:
+            stamp_mod.SAVE_HOOKS.append(self.add_stamp)
+            stamp_mod.MOVE_HOOKS.append(self.move)
+
+    def detach(self):
+        if self.add_stamp in stamp_mod.SAVE_HOOKS:
+            stamp_mod.SAVE_HOOKS.remove(self.add_stamp)
+            stamp_mod.MOVE_HOOKS.remove(self.move)
+
+    def search(self, query, limit=20, min_score=MIN_SCORE, kinds=None):
+        """Ranked (score, ref, kind, text) for texts similar to query."""
+        q = trigrams(query)
+        if not q:
+            return []
+        counts = Counter()
+        for g in q:
+            ids = self.grams.get(g)
+            if ids:
+                counts.update(ids)
+        need = len(q) * min_score
+        ranked = sorted(
+            ((c / len(q), c / (len(q) + self.sizes[tid] - c), tid)
+             for tid, c in counts.items() if c >= need and self.texts[tid] is not None),
+            reverse=True)
+        out = []
+        for score, _, tid in ranked:
+            for ref, kind in reversed(self.owners[tid]):
+                if kinds is None or kind in kinds:
+                    out.append((round(score, 3), ref, kind, self.texts[tid]))
+                    if len(out) >= limit:
+                        return out
+        return out
+
+
+def bench(n=1000000, distinct=50000):
+    words = ["blue", "channel", "jpeg", "kills", "png", "preserves", "webp", "size", "temporal",
+             "fragment", "gematria", "hidden", "visible", "subsampling", "loss", "verified"]
+    idx = FuzzyIndex()
+    t0 = time.perf_counter()
+    for i in range(n):
+        k = i % distinct
+        pin = "-".join(words[(k * 7 + j * 3) % len(words)] for j in range(4)) + f"-{k}"
+        idx._add(f"s{i}", 'pin', pin)
+    print(f"  indexed {n:,} stamps ({len(idx.texts):,} distinct pins) in {time.perf_counter() - t0:.1f}s")
+    for q in ["jpg kils blu", "preserves png", "gematria hiden 4211", "subsampling-loss"]:
+        t0 = time.perf_counter()
+        hits = idx.search(q, limit=10)
+        dt = (time.perf_counter() - t0) * 1000
+        top = hits[0] if hits else None
+        print(f"  {q!r:24s} {dt:7.1f} ms  top: {top}")
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--bench"]:
+        bench(int(sys.argv[2]) if len(sys.argv) > 2 else 1000000)
+    elif sys.argv[1:2] == ["--backfill"]:
+        base = Path(sys.argv[2]) if len(sys.argv) > 2 else Path.home() / "gentlyos" / "sessions"
+        print(f"Indexed {FuzzyIndex(base / FUZZY_NAME).backfill(base)} pin/look changes")
+    elif len(sys.argv) > 1:
+        base = Path(sys.argv[2]) if len(sys.argv) > 2 else Path.home() / "gentlyos" / "sessions"
+        for hit in FuzzyIndex(base / FUZZY_NAME).search(sys.argv[1]):
+            print(hit)
+    else:
+        print(__doc__)
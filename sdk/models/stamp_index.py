@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+stamp_index.py - persistent inverted index for search_stamps
+Maps lowercased word terms to the stamp files that contain them, so a
+query only reads the files that can possibly match instead of every
+*.stamp.json under the sessions tree.
+
+LAYOUT (base_dir/.stamp-index.json):
+  docs:  [[relpath, mtime_ns, size], ...]   doc id = list position
+  terms: {term: [doc id, ...]}
+  dirs:  {reldir: [mtime_ns, [subdir, ...], [stamp file, ...]]}
+
+Refresh is incremental: a directory whose mtime is unchanged is not
+listed again, but every stamp file is stat'ed, since a file rewritten
+in place leaves its directory's mtime alone; only files whose
+(mtime_ns, size) changed are re-read and re-tokenized. Lookups return
+candidates; the caller still verifies the substring match, so results
+are identical to a full scan. refresh(skip=...) leaves whole subtrees
+(e.g. shards/ for a scoped search) unwalked and their entries as they were.
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from pathlib import Path
+
+INDEX_NAME = ".stamp-index.json"
+INDEX_VERSION = 2
+TERM_RE = re.compile(r"\w+")
+SUFFIX = ".stamp.json"
+# A directory modified this recently may change again within the same
+# mtime tick, so it is listed again on the next refresh.
+RACY_NS = 2 * 10**9
+_SAVE_LOCK = threading.Lock()
+
+
+def terms_of(text):
+    return set(TERM_RE.findall(text.lower()))
+
+
+def _under(rel, dirs):
+    return any(rel == d or rel.startswith(d + '/') for d in dirs)
+
+
+class StampIndex:
+    def __init__(self, base_dir, path=None):
+        self.base_dir = Path(base_dir)
+        self.path = Path(path) if path else self.base_dir / INDEX_NAME
+        self.docs = []
+        self.terms = {}
+        self._by_path = {}
+        self.dirs = {}
+        self._dirty = False
+        self._load()
+
+    def _load(self):
+        if not self.path.exists():
+            return
+        try:
+            data = json.loads(self.path.read_text())
+        except (OSError, ValueError):
+            return
+        if data.get('version') != INDEX_VERSION:
+            return
+        self.docs = [tuple(d) if d else None for d in data.get('docs', [])]
+        self.terms = {t: set(ids) for t, ids in data.get('terms', {}).items()}
+        self._by_path = {d[0]: i for i, d in enumerate(self.docs) if d}
+        self.dirs = data.get('dirs', {})
+
+    def save(self):
+        if not self._dirty:
+            return
+        data = {
+            'version': INDEX_VERSION,
+            'docs': [list(d) if d else None for d in self.docs],
+            'terms': {t: sorted(ids) for t, ids in self.terms.items() if ids},
+            'dirs': self.dirs,
+        }
+        tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}-{threading.get_ident()}.tmp")
+        with _SAVE_LOCK:
+            tmp.write_text(json.dumps(data, ensure_ascii=False, separators=(',', ':')))
+            os.replace(tmp, self.path)
+        self._dirty = False
+
+    def _drop(self, doc_ids):
+        for t in list(self.terms):
+            ids = self.terms[t]
+            ids -= doc_ids
+            if not ids:
+                del self.terms[t]
+        for doc_id in doc_ids:
+            self._by_path.pop(self.docs[doc_id][0], None)
+            self.docs[doc_id] = None
+
+    def _add(self, rel, st, text):
+        doc_id = len(self.docs)
+        self.docs.append((rel, st.st_mtime_ns, st.st_size))
+        self._by_path[rel] = doc_id
+        for t in terms_of(text):
+            self.terms.setdefault(t, set()).add(doc_id)
+
+    def _walk(self, skip=()):
+        """Yield (relpath, directory path str) for every stamp file; only
+        directories whose mtime changed since the last walk are listed.
+        Directories in skip (relpaths) are not entered."""
+        now = time.time_ns()
+        dirs = {rel: entry for rel, entry in self.dirs.items() if _under(rel, skip)}
+        stack = ['']
+        while stack:
+            rel = stack.pop()
+            path = self.base_dir / rel if rel else self.base_dir
+            try:
+                mtime = path.stat().st_mtime_ns
+            except OSError:
+                continue
+            cached = self.dirs.get(rel)
+            listed = not cached or cached[0] != mtime
+            if listed:
+                subdirs, names = [], []
+                try:
+                    with os.scandir(path) as it:
+                        for e in it:
+                            if e.is_dir(follow_symlinks=False):
+                                subdirs.append(e.name)
+                            elif e.name.endswith(SUFFIX):
+                                names.append(e.name)
+                except OSError:
+                    continue
+            else:
+                subdirs, names = cached[1], cached[2]
+            dirs[rel] = [mtime if now - mtime > RACY_NS else -1, subdirs, names]
+            prefix = rel + '/' if rel else ''
+            dir_str = str(path) + os.sep
+            for name in names:
+                yield prefix + name, dir_str + name
+            stack.extend(prefix + d for d in subdirs if prefix + d not in skip)
+        # An mtime alone is not worth a save (saving the index touches the
+        # root); a directory that only looks changed is just listed again.
+        if any(self.dirs.get(rel, [None])[1:] != entry[1:] for rel, entry in dirs.items()) \
+                or len(dirs) != len(self.dirs):
+            self._dirty = True
+        self.dirs = dirs
+
+    def refresh(self, skip=()):
+        """Bring the index up to date; returns the number of files re-read.
+        Stamp files under the relpaths in skip are neither checked nor dropped."""
+        if not self.base_dir.is_dir():
+            return 0
+        seen = set()
+        stale = []
+        dropped = set()
+        for rel, full in self._walk(skip):
+            seen.add(rel)
+            doc_id = self._by_path.get(rel)
+            try:
+                st = os.stat(full)
+            except OSError:
+                continue
+            if doc_id is not None:
+                _, mtime_ns, size = self.docs[doc_id]
+                if mtime_ns == st.st_mtime_ns and size == st.st_size:
+                    continue
+                dropped.add(doc_id)
+            stale.append((rel, Path(full), st))
+        dropped.update(i for r, i in self._by_path.items() if r not in seen and not _under(r, skip))
+        if dropped:
+            self._drop(dropped)
+            self._dirty = True
+        for rel, sf, st in stale:
+            try:
+                text = sf.read_text()
+            except OSError:
+                continue
+            self._add(rel, st, text)
+            self._dirty = True
+        if self._dirty and self.docs.count(None) > len(self.docs) // 2:
+            self._compact()
+        self.save()
+        return len(stale)
+
+    def _compact(self):
+        remap = {}
+        docs = []
+        for i, d in enumerate(self.docs):
+            if d:
+                remap[i] = len(docs)
+                docs.append(d)
+        self.docs = docs
+        self.terms = {t: {remap[i] for i in ids} for t, ids in self.terms.items()}
+        self._by_path = {d[0]: i for i, d in enumerate(self.docs)}
+
+    def _matching_terms(self, token, left_open, right_open):
+        if not left_open and not right_open:
+            return [token] if token in self.terms else []
+        if left_open and right_open:
+            return [t for t in self.terms if token in t]
+        if left_open:
+            return [t for t in self.terms if t.endswith(token)]
+        return [t for t in self.terms if t.startswith(token)]
+
+    def candidates(self, query):
+        q = query.lower()
+        ids = None
+        for m in TERM_RE.finditer(q):
+            hit = set()
+            for t in self._matching_terms(m.group(), m.start() == 0, m.end() == len(q)):
+                hit |= self.terms[t]
+            ids = hit if ids is None else ids & hit
+            if not ids:
+                return []
+        if ids is None:
+            ids = (i for i, d in enumerate(self.docs) if d)
+        return [self.base_dir / self.docs[i][0] for i in sorted(ids)]
+
+
+if __name__ == "__main__":
+    import sys
+    base = Path(sys.argv[1]) if len(sys.argv) > 1 else Path.home() / "gentlyos" / "sessions"
+    idx = StampIndex(base)
+    changed = idx.refresh()
+    live = sum(1 for d in idx.docs if d)
+    print(f"Indexed {live} stamps ({changed} re-read), {len(idx.terms)} terms -> {idx.path}")
+    for q in sys.argv[2:]:
+        print(f"  {q!r}: {len(idx.candidates(q))} candidates")
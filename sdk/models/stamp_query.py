@@ -0,0 +1,394 @@
+#!/usr/bin/env python3
+"""
+stamp_query.py - structured queries over a columnar stamp index
+Answers questions like
+
+  gate.B = revisit and depth > 5 and time > -7d
+  branch ~ blue and not state = DONE
+  (pin ~ jpeg or look ~ jpeg) and max_depth >= 10
+
+without parsing every saved stamp. Each column keeps one row bitmap
+(a Python int) per distinct value, so a filter ORs/ANDs whole bitmaps
+and its cost grows with the number of distinct values, not stamps.
+Timestamps are bucketed by hour; only rows in the two edge buckets of a
+range are checked one by one.
+
+GRAMMAR:
+  expr  := term ('or' term)*          term := factor ('and' factor)*
+  factor:= 'not' factor | '(' expr ')' | field op value
+  field := branch parent state pin look chain depth max_depth
+           parent_depth time gate.<LETTER>
+  op    := = != < <= > >= ~           (~ is case-insensitive substring)
+  value := word | "quoted" | number | ISO date | -7d / -12h / -30m
+  Gate values are symbols (↺) or names (revisit, yes, open, ...).
+
+The index is saved as .stamp-columns.json in the sessions dir. New
+stamp files and journal records are appended as rows on the next load;
+it is only rebuilt when an indexed file or segment changed or vanished.
+"""
+
+import json
+import os
+import re
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+from stamp import GATE_STATES, Stamp
+from stamp_index import StampIndex
+from stamp_journal import StampJournal
+
+COLUMNS_NAME = ".stamp-columns.json"
+COLUMNS_VERSION = 2
+STR_COLS = ('branch', 'parent', 'state', 'pin', 'look', 'chain')
+INT_COLS = ('depth', 'max_depth', 'parent_depth')
+HOUR = 3600
+
+
+def _bitmap(rows):
+    bits = bytearray((max(rows) >> 3) + 1) if rows else bytearray()
+    for r in rows:
+        bits[r >> 3] |= 1 << (r & 7)
+    return int.from_bytes(bits, 'little')
+
+
+def _rows(bitmap):
+    rows = []
+    raw = bitmap.to_bytes((bitmap.bit_length() + 7) // 8, 'little')
+    for i, byte in enumerate(raw):
+        if byte:
+            rows.extend(i * 8 + b for b in range(8) if byte >> b & 1)
+    return rows
+
+
+def _epoch(ts):
+    try:
+        return int(datetime.fromisoformat(ts).timestamp())
+    except (TypeError, ValueError):
+        return -1
+
+
+class StampColumns:
+    def __init__(self):
+        self.refs = []
+        self.times = []
+        self.postings = {c: {} for c in STR_COLS + INT_COLS + ('gate', 'hour')}
+        self.files = {}       # relpath -> [mtime_ns, size] of indexed stamp files
+        self.segments = {}    # journal segment -> end of its last indexed record
+        self._changed = False
+        self._bitmaps = {}
+
+    def add(self, ref, d):
+        row = len(self.refs)
+        self.refs.append(ref)
+        for c in STR_COLS:
+            self.postings[c].setdefault(str(d.get(c, '')), []).append(row)
+        for c in INT_COLS:
+            self.postings[c].setdefault(str(int(d.get(c, 0))), []).append(row)
+        for g in d.get('gates', []):
+            self.postings['gate'].setdefault(g['letter'] + g['state'], []).append(row)
+        t = _epoch(d.get('timestamp', ''))
+        self.times.append(t)
+        if t >= 0:
+            self.postings['hour'].setdefault(str(t // HOUR), []).append(row)
+        self._bitmaps.clear()
+
+    # -- persistence -------------------------------------------------
+
+    @staticmethod
+    def _files(base_dir):
+        """{relpath: [mtime_ns, size]} for every stamp file, via StampIndex."""
+        index = StampIndex(base_dir)
+        index.refresh()
+        return {d[0]: [d[1], d[2]] for d in index.docs if d}
+
+    def _add_files(self, base_dir, rels):
+        for rel in sorted(rels):
+            sf = base_dir / rel
+            self.add(str(sf), json.loads(sf.read_text()))
+
+    def _add_journal(self, base_dir, ends):
+        journal = base_dir / "journal"
+        if journal.exists():
+            for ref, _, d in StampJournal(journal, read_only=True).records_after(ends):
+                self.add(str(journal / ref), d)
+
+    @classmethod
+    def build(cls, base_dir, files=None):
+        base_dir = Path(base_dir)
+        cols = cls()
+        cols.files = cls._files(base_dir) if files is None else files
+        cols._add_files(base_dir, cols.files)
+        cols._add_journal(base_dir, cols.segments)
+        return cols
+
+    def _update(self, base_dir, files):
+        """Append rows for new stamp files and new journal records; False if
+        a file or segment changed or went away and the index must be rebuilt."""
+        for rel, st in self.files.items():
+            if files.get(rel) != st:
+                return False
+        journal = base_dir / "journal"
+        names = {p.name: p.stat().st_size for p in journal.glob("seg-*.log")} if journal.exists() else {}
+        if any(names.get(name, -1) < end for name, end in self.segments.items()):
+            return False
+        new = files.keys() - self.files.keys()
+        grown = [n for n, size in names.items() if size != self.segments.get(n)]
+        if not new and not grown:
+            return True
+        rows = len(self.refs)
+        self._add_files(base_dir, new)
+        self.files = files
+        self._add_journal(base_dir, self.segments)
+        self._changed = len(self.refs) != rows
+        return True
+
+    @classmethod
+    def load_or_build(cls, base_dir):
+        """Load the saved index, appending rows for stamps saved since; a full
+        rebuild only happens when a stamp file or segment changed or vanished."""
+        base_dir = Path(base_dir)
+        path = base_dir / COLUMNS_NAME
+        files = cls._files(base_dir)
+        cols = None
+        if path.exists():
+            try:
+                data = json.loads(path.read_text())
+            except ValueError:
+                data = {}
+            if data.get('version') == COLUMNS_VERSION:
+                cols = cls()
+                cols.refs, cols.times, cols.postings = data['refs'], data['times'], data['postings']
+                cols.files, cols.segments = data['files'], data['segments']
+                if not cols._update(base_dir, files):
+                    cols = None
+        if cols is None:
+            cols = cls.build(base_dir, files)
+            cols._changed = True
+        if cols._changed:
+            cols.save(path)
+        return cols
+
+    @classmethod
+    def relocate(cls, base_dir, moves):
+        """Re-point the saved index at moved stamp files, moves {old path:
+        new path} under base_dir, so the next load need not rebuild it."""
+        base_dir = Path(base_dir)
+        path = base_dir / COLUMNS_NAME
+        try:
+            data = json.loads(path.read_text())
+        except (OSError, ValueError):
+            return
+        if data.get('version') != COLUMNS_VERSION:
+            return
+        rels = {os.path.relpath(old, base_dir).replace(os.sep, '/'): os.path.relpath(new, base_dir).replace(os.sep, '/')
+                for old, new in moves.items()}
+        refs = {str(base_dir / old): str(base_dir / new) for old, new in rels.items()}
+        cols = cls()
+        cols.times, cols.postings, cols.segments = data['times'], data['postings'], data['segments']
+        cols.refs = [refs.get(r, r) for r in data['refs']]
+        cols.files = {rels.get(rel, rel): st for rel, st in data['files'].items()}
+        cols.save(path)
+
+    def save(self, path):
+        tmp = path.with_name(f"{path.name}.{os.getpid()}-{threading.get_ident()}.tmp")
+        tmp.write_text(json.dumps({'version': COLUMNS_VERSION, 'files': self.files, 'segments': self.segments,
+                                   'refs': self.refs, 'times': self.times, 'postings': self.postings},
+                                  ensure_ascii=False, separators=(',', ':')))
+        os.replace(tmp, path)
+        self._changed = False
+
+    # -- filters -----------------------------------------------------
+
+    def all(self):
+        return (1 << len(self.refs)) - 1
+
+    def bitmap(self, col, value):
+        key = (col, value)
+        bm = self._bitmaps.get(key)
+        if bm is None:
+            bm = self._bitmaps[key] = _bitmap(self.postings[col].get(value, ()))
+        return bm
+
+    def where(self, col, pred):
+        """OR of the bitmaps of every distinct value of col that satisfies pred."""
+        out = 0
+        for value in self.postings[col]:
+            if pred(value):
+                out |= self.bitmap(col, value)
+        return out
+
+    def time_range(self, lo=None, hi=None):
+        """Rows with lo < time < hi (bounds exclusive; pass +-1 for inclusive)."""
+        lo_h = lo // HOUR if lo is not None else None
+        hi_h = hi // HOUR if hi is not None else None
+        out = 0
+        for hour in self.postings['hour']:
+            h = int(hour)
+            if (lo_h is not None and h < lo_h) or (hi_h is not None and h > hi_h):
+                continue
+            if h == lo_h or h == hi_h:
+                rows = [r for r in self.postings['hour'][hour]
+                        if (lo is None or self.times[r] > lo) and (hi is None or self.times[r] < hi)]
+                out |= _bitmap(rows)
+            else:
+                out |= self.bitmap('hour', hour)
+        return out
+
+
+# ============================================================
+# QUERY LANGUAGE
+# ============================================================
+
+TOKEN_RE = re.compile(r'\s*(?:(\()|(\))|(!=|<=|>=|[=<>~])|"([^"]*)"|([^\s()=<>~!"]+))')
+_NUM_OPS = {
+    '=': lambda a, b: a == b, '!=': lambda a, b: a != b,
+    '<': lambda a, b: a < b, '<=': lambda a, b: a <= b,
+    '>': lambda a, b: a > b, '>=': lambda a, b: a >= b,
+}
+
+
+def tokenize(text):
+    pos, out = 0, []
+    text = text.strip()
+    while pos < len(text):
+        m = TOKEN_RE.match(text, pos)
+        if not m or m.end() == pos:
+            raise ValueError(f"bad query near {text[pos:]!r}")
+        lp, rp, op, quoted, word = m.groups()
+        out.append(('(', lp) if lp else (')', rp) if rp else ('op', op) if op
+                   else ('val', quoted) if quoted is not None else ('word', word))
+        pos = m.end()
+    return out
+
+
+def _time_value(v):
+    m = re.fullmatch(r'-(\d+)([dhm])', v)
+    if m:
+        return int(time.time()) - int(m.group(1)) * {'d': 86400, 'h': 3600, 'm': 60}[m.group(2)]
+    return _epoch(v)
+
+
+class Query:
+    def __init__(self, text):
+        self.text = text
+        self.tokens = tokenize(text)
+        self.pos = 0
+
+    def _peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else (None, None)
+
+    def _next(self):
+        tok = self._peek()
+        self.pos += 1
+        return tok
+
+    def _kw(self, word):
+        kind, v = self._peek()
+        if kind == 'word' and v.lower() == word:
+            self.pos += 1
+            return True
+        return False
+
+    def run(self, cols):
+        self.pos = 0
+        bm = self._expr(cols)
+        if self.pos != len(self.tokens):
+            raise ValueError(f"unexpected {self._peek()[1]!r} in query")
+        return bm
+
+    def _expr(self, cols):
+        bm = self._term(cols)
+        while self._kw('or'):
+            bm |= self._term(cols)
+        return bm
+
+    def _term(self, cols):
+        bm = self._factor(cols)
+        while self._kw('and'):
+            bm &= self._factor(cols)
+        return bm
+
+    def _factor(self, cols):
+        if self._kw('not'):
+            return cols.all() & ~self._factor(cols)
+        kind, v = self._peek()
+        if kind == '(':
+            self.pos += 1
+            bm = self._expr(cols)
+            if self._next()[0] != ')':
+                raise ValueError("missing ')'")
+            return bm
+        return self._cond(cols)
+
+    def _cond(self, cols):
+        kind, field = self._next()
+        if kind != 'word':
+            raise ValueError(f"expected a field, got {field!r}")
+        kind, op = self._next()
+        if kind != 'op':
+            raise ValueError(f"expected an operator after {field!r}")
+        kind, value = self._next()
+        if kind not in ('word', 'val'):
+            raise ValueError(f"expected a value after {field} {op}")
+        field = field.lower()
+
+        if field.startswith('gate.'):
+            if op not in ('=', '!='):
+                raise ValueError("gates support = and != only")
+            symbol = GATE_STATES.get(value.lower(), value)
+            bm = cols.bitmap('gate', field[5:].upper() + symbol)
+            return bm if op == '=' else cols.all() & ~bm
+        if field == 'time':
+            t = _time_value(value)
+            if t < 0:
+                raise ValueError(f"bad time {value!r}")
+            if op == '>':
+                return cols.time_range(lo=t)
+            if op == '>=':
+                return cols.time_range(lo=t - 1)
+            if op == '<':
+                return cols.time_range(hi=t)
+            if op == '<=':
+                return cols.time_range(hi=t + 1)
+            raise ValueError("time supports < <= > >= only")
+        if field in INT_COLS:
+            n = int(value)
+            if op not in _NUM_OPS:
+                raise ValueError(f"{field} does not support {op}")
+            return cols.where(field, lambda v: _NUM_OPS[op](int(v), n))
+        if field in STR_COLS:
+            if field == 'state':
+                value = value.upper()
+            if op == '~':
+                low = value.lower()
+                return cols.where(field, lambda v: low in v.lower())
+            if op in ('=', '!='):
+                bm = cols.bitmap(field, value)
+                return bm if op == '=' else cols.all() & ~bm
+            raise ValueError(f"{field} supports = != ~ only")
+        raise ValueError(f"unknown field {field!r}")
+
+
+def query_stamps(text, base_dir=None):
+    """Run a structured query; results match search_stamps' stamp entries."""
+    base_dir = Path(base_dir) if base_dir else Path.home() / "gentlyos" / "sessions"
+    cols = StampColumns.load_or_build(base_dir)
+    results = []
+    for row in _rows(Query(text).run(cols)):
+        ref = cols.refs[row]
+        path, _, off = ref.rpartition('#')
+        stamp = Stamp.load(path, int(off)) if off.isdigit() and path.endswith('.log') else Stamp.load(ref)
+        results.append({'file': ref, 'stamp': stamp, 'type': 'stamp'})
+    return results
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(0)
+    base = Path(sys.argv[2]) if len(sys.argv) > 2 else None
+    for r in query_stamps(sys.argv[1], base):
+        print(f"{r['stamp'].compact()}  {r['file']}")
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+stamp_server.py - streaming search over a local socket
+Keeps one Python process (and its indexes and sidecars) warm for the
+Electron side instead of spawning a search per keystroke. Speaks
+newline-delimited JSON over a Unix socket; results stream back as soon
+as each file is read (stamp.asearch_stamps).
+
+REQUESTS (one JSON object per line):
+  {"id": 7, "op": "search", "query": "jpeg", "top_k": 50,
+   "branch": ..., "project": ..., "since": ..., "until": ...,
+   "replace": true}          replace: cancel this connection's other searches
+  {"id": 7, "op": "cancel"}
+  {"op": "ping"}
+
+RESPONSES:
+  {"id": 7, "hit": {...}}    a search_stamps result; stamps carry to_dict
+                             and compact instead of a Stamp object
+  {"id": 7, "done": true, "count": 12}    or {"id": 7, "cancelled": true}
+                                          or {"id": 7, "error": "..."}
+  {"pong": true}
+
+Searches on one connection run concurrently; a debounced search box sends
+each new query with "replace": true so the stale one stops reading files.
+
+Usage:
+  python3 stamp_server.py [SOCKET] [DIR]     serve (default ~/gentlyos/search.sock)
+  python3 stamp_server.py --ask QUERY [SOCKET]
+  python3 stamp_server.py --demo             concurrent + cancelled queries
+"""
+
+import asyncio
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from stamp import Stamp, asearch_stamps
+
+DEFAULT_SOCKET = Path.home() / "gentlyos" / "search.sock"
+SEARCH_KEYS = ('top_k', 'branch', 'project', 'since', 'until')
+
+
+def hit_json(hit):
+    if hit.get('type') == 'stamp':
+        return {'type': 'stamp', 'file': hit['file'], 'stamp': hit['stamp'].to_dict(),
+                'compact': hit['stamp'].compact()}
+    return hit
+
+
+class SearchServer:
+    def __init__(self, base_dir=None, workers=8):
+        self.base_dir = base_dir
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+
+    async def _search(self, rid, req, send):
+        count = 0
+        try:
+            kw = {k: req[k] for k in SEARCH_KEYS if req.get(k) is not None}
+            async for hit in asearch_stamps(req.get('query', ''), self.base_dir,
+                                            executor=self.executor, **kw):
+                await send({'id': rid, 'hit': hit_json(hit)})
+                count += 1
+            await send({'id': rid, 'done': True, 'count': count})
+        except Exception as e:
+            await send({'id': rid, 'error': str(e), 'count': count})
+
+    @staticmethod
+    def _finished(tasks, rid, task, send):
+        if tasks.get(rid) is task:
+            del tasks[rid]
+        if task.cancelled():
+            # May never have started, so the reply is sent from here.
+            asyncio.ensure_future(send({'id': rid, 'cancelled': True}))
+
+    async def handle(self, reader, writer):
+        tasks = {}
+        lock = asyncio.Lock()
+
+        async def send(msg):
+            async with lock:
+                if writer.is_closing():
+                    return
+                writer.write(json.dumps(msg, ensure_ascii=False).encode('utf-8') + b"\n")
+                await writer.drain()
+
+        try:
+            while line := await reader.readline():
+                try:
+                    req = json.loads(line)
+                except ValueError:
+                    await send({'error': "bad json"})
+                    continue
+                op, rid = req.get('op'), req.get('id')
+                if op == 'ping':
+                    await send({'pong': True})
+                elif op == 'cancel':
+                    task = tasks.pop(rid, None)
+                    if task:
+                        task.cancel()
+                elif op == 'search':
+                    if req.get('replace'):
+                        for task in tasks.values():
+                            task.cancel()
+                        tasks.clear()
+                    task = tasks[rid] = asyncio.create_task(self._search(rid, req, send))
+                    task.add_done_callback(lambda t, rid=rid: self._finished(tasks, rid, t, send))
+                else:
+                    await send({'id': rid, 'error': f"unknown op {op!r}"})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            for task in tasks.values():
+                task.cancel()
+            writer.close()
+
+    async def serve(self, path=DEFAULT_SOCKET):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if path.exists():
+            path.unlink()
+        server = await asyncio.start_unix_server(self.handle, path=str(path))
+        os.chmod(path, 0o600)
+        async with server:
+            await server.serve_forever()
+
+
+async def ask(query, path=DEFAULT_SOCKET, **kw):
+    """Client helper: yield hits for one query from a running server."""
+    reader, writer = await asyncio.open_unix_connection(str(path))
+    try:
+        writer.write(json.dumps({'id': 1, 'op': 'search', 'query': query, **kw}).encode() + b"\n")
+        await writer.drain()
+        while line := await reader.readline():
+            msg = json.loads(line)
+            if 'hit' in msg:
+                yield msg['hit']
+            elif msg.get('id') == 1:
+                return
+    finally:
+        writer.close()
+
+
+async def demo(n=3000):
+    import tempfile
+    with tempfile.TemporaryDirectory() as tmp:
+        base = Path(tmp) / "sessions"
+        base.mkdir()
+        for i in range(n):
+            Stamp(branch=f"olo-guard/b{i % 10}", depth=i % 12,
+                  pin=f"{'jpeg kills blue' if i % 3 == 0 else 'png keeps blue'} {i}").save(base / f"{i}.stamp.json")
+        sock = Path(tmp) / "search.sock"
+        server = SearchServer(base)
+        serving = asyncio.create_task(server.serve(sock))
+        while not sock.exists():
+            await asyncio.sleep(0.01)
+        reader, writer = await asyncio.open_unix_connection(str(sock))
+
+        def send(msg):
+            writer.write(json.dumps(msg).encode() + b"\n")
+
+        t0 = time.perf_counter()
+        send({'id': 1, 'op': 'search', 'query': "jpeg"})
+        send({'id': 2, 'op': 'search', 'query': "png keeps", 'branch': "olo-guard/b3"})
+        send({'id': 3, 'op': 'search', 'query': "blue"})
+        send({'id': 3, 'op': 'cancel'})
+        first, counts, ends = {}, {}, {}
+        while len(ends) < 3:
+            msg = json.loads(await reader.readline())
+            rid = msg['id']
+            if 'hit' in msg:
+                first.setdefault(rid, time.perf_counter() - t0)
+                counts[rid] = counts.get(rid, 0) + 1
+            else:
+                ends[rid] = ('cancelled' if msg.get('cancelled') else 'done', time.perf_counter() - t0)
+        for rid in sorted(ends):
+            state, dt = ends[rid]
+            ttfb = f"{first[rid] * 1000:6.1f} ms" if rid in first else "     -   "
+            print(f"  query {rid}: {counts.get(rid, 0):5d} hits, first {ttfb}, {state} at {dt * 1000:6.1f} ms")
+        writer.close()
+        await writer.wait_closed()
+        await asyncio.sleep(0.05)  # let the handler see EOF
+        serving.cancel()
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if args[:1] == ["--demo"]:
+        asyncio.run(demo())
+    elif args[:1] == ["--ask"] and len(args) > 1:
+        async def _print():
+            async for hit in ask(args[1], args[2] if len(args) > 2 else DEFAULT_SOCKET):
+                print(hit.get('compact') or f"{hit['file']}: {hit.get('context', '')}")
+        asyncio.run(_print())
+    else:
+        sock = args[0] if args else DEFAULT_SOCKET
+        print(f"Serving search on {sock}")
+        asyncio.run(SearchServer(args[1] if len(args) > 1 else None).serve(sock))
@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+stamp_shards.py - sharded sessions layout
+Partitions saved stamps by project, branch and day so a search scoped to
+one branch or time range only walks the shard directories it needs:
+
+  sessions/shards/<project>/<branch>/<YYYY-MM-DD>/<time>-d<depth>.stamp.json
+  sessions/shards/manifest.json   {shard relpath: {project, branches, date}}
+
+"olo-guard/blue-channel" is project olo-guard, branch blue-channel; a
+branch without "/" lives in <project>/master. Directory names escape
+every byte outside [A-Za-z0-9_.-] (and a leading ".") as %XX, so
+distinct names never share a shard; overlong names are cut and get a
+hash suffix. Stamps saved outside shards/ are still searched. The
+manifest is only rewritten when a save opens a new shard or brings a
+new branch name into one.
+
+migrate() tells every index holding stamp file refs where the files
+went: attached ones through stamp.MOVE_HOOKS, and the fuzzy index,
+timeline and columns saved under the sessions dir on disk.
+
+Usage:
+  python3 stamp_shards.py --migrate [DIR]      move a flat tree into shards
+  python3 stamp_shards.py --bench [N] [DIR]    scoped vs unscoped search
+"""
+
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+SHARDS_DIR = "shards"
+MANIFEST_NAME = "manifest.json"
+_ESCAPE_RE = re.compile(r"[^A-Za-z0-9_.-]|^\.")
+MAX_NAME = 120
+
+
+def _escape(name):
+    """Injective, filesystem-safe directory name for a project or branch."""
+    out = _ESCAPE_RE.sub(lambda m: "".join(f"%{b:02X}" for b in m.group().encode()), name) or "%"
+    if len(out) > MAX_NAME:
+        out = f"{out[:MAX_NAME - 17]}~{hashlib.sha1(name.encode()).hexdigest()[:16]}"
+    return out
+
+
+def split_branch(branch):
+    project, _, rest = branch.partition('/')
+    return project or "_unscoped", rest or "master"
+
+
+def _day(timestamp, fallback=None):
+    try:
+        return datetime.fromisoformat(timestamp).date().isoformat()
+    except (TypeError, ValueError):
+        return datetime.fromtimestamp(fallback or time.time()).date().isoformat()
+
+
+class ShardManifest:
+    def __init__(self, base_dir):
+        self.base_dir = Path(base_dir)
+        self.root = self.base_dir / SHARDS_DIR
+        self.path = self.root / MANIFEST_NAME
+        self.shards = {}
+        if self.path.exists():
+            self.shards = json.loads(self.path.read_text())
+
+    def exists(self):
+        return self.path.exists()
+
+    def save(self):
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}-{threading.get_ident()}.tmp")
+        tmp.write_text(json.dumps(self.shards, indent=1, ensure_ascii=False, sort_keys=True))
+        os.replace(tmp, self.path)
+
+    def shard_for(self, branch, timestamp, fallback=None):
+        """(shard relpath, whether the manifest changed) for a stamp."""
+        project, sub = split_branch(branch)
+        day = _day(timestamp, fallback)
+        rel = f"{_escape(project)}/{_escape(sub)}/{day}"
+        entry = self.shards.get(rel)
+        changed = entry is None
+        if changed:
+            entry = self.shards[rel] = {'project': project, 'branches': [], 'date': day}
+        if 'branch' in entry:    # manifests written before 'branches'
+            entry['branches'] = [entry.pop('branch')]
+            changed = True
+        if branch not in entry['branches']:
+            entry['branches'].append(branch)    # "p" and "p/master" share a shard
+            changed = True
+        return rel, changed
+
+    def select(self, branch=None, project=None, since=None, until=None):
+        """Shard dirs matching the scope; dates are YYYY-MM-DD strings or datetimes."""
+        since = since.date().isoformat() if isinstance(since, datetime) else since
+        until = until.date().isoformat() if isinstance(until, datetime) else until
+        out = []
+        for rel, e in sorted(self.shards.items()):
+            if branch is not None and branch not in e.get('branches', [e.get('branch')]):
+                continue
+            if project is not None and e['project'] != project:
+                continue
+            if since is not None and e['date'] < since[:10]:
+                continue
+            if until is not None and e['date'] > until[:10]:
+                continue
+            out.append(self.root / rel)
+        return out
+
+
+def _free_name(shard, stem):
+    path = shard / f"{stem}.stamp.json"
+    n = 1
+    while path.exists():
+        n += 1
+        path = shard / f"{stem}-{n}.stamp.json"
+    return path
+
+
+def save_sharded(stamp, base_dir, manifest=None):
+    """Save a Stamp into its shard, recording a new shard or branch in the
+    manifest; returns the path."""
+    manifest = manifest or ShardManifest(base_dir)
+    stamp.touch()    # the shard and file name come from the save time
+    rel, changed = manifest.shard_for(stamp.branch, stamp.timestamp)
+    shard = manifest.root / rel
+    shard.mkdir(parents=True, exist_ok=True)
+    ts = stamp.timestamp[11:19].replace(':', '') if len(stamp.timestamp) >= 19 else "000000"
+    path = _free_name(shard, f"{ts}-d{stamp.depth}")
+    stamp.save(path, touch=False)
+    if changed:
+        manifest.save()
+    return path
+
+
+def migrate(base_dir, dry_run=False):
+    """Move every flat *.stamp.json under base_dir into the sharded layout,
+    and re-point the indexes at the new paths."""
+    base_dir = Path(base_dir)
+    manifest = ShardManifest(base_dir)
+    moves = {}
+    moved = 0
+    for sf in sorted(base_dir.rglob("*.stamp.json")):
+        if manifest.root in sf.parents:
+            continue
+        try:
+            d = json.loads(sf.read_text())
+        except ValueError:
+            continue
+        rel, _ = manifest.shard_for(d.get('branch', ''), d.get('timestamp', ''), sf.stat().st_mtime)
+        shard = manifest.root / rel
+        moved += 1
+        if dry_run:
+            continue
+        shard.mkdir(parents=True, exist_ok=True)
+        dest = _free_name(shard, sf.name[:-len(".stamp.json")])
+        os.replace(sf, dest)
+        moves[str(sf)] = str(dest)
+    if not dry_run:
+        manifest.save()
+        if moves:
+            relocate(base_dir, moves)
+    return moved
+
+
+def relocate(base_dir, moves):
+    """Point indexes at moved stamp files, moves {old path: new path}:
+    attached ones via stamp.MOVE_HOOKS, then the ones saved in base_dir."""
+    import stamp
+    from stamp_fuzzy import FUZZY_NAME, FuzzyIndex
+    from stamp_query import StampColumns
+    from stamp_timeline import Timeline
+    for hook in stamp.MOVE_HOOKS:
+        hook(moves)
+    base_dir = Path(base_dir)
+    if (base_dir / FUZZY_NAME).exists():
+        FuzzyIndex(base_dir / FUZZY_NAME).move(moves)
+    Timeline(base_dir).move(moves)
+    StampColumns.relocate(base_dir, moves)
+
+
+def unsharded_files(base_dir):
+    """*.stamp.json files under base_dir outside the shards directory."""
+    for root, dirs, names in os.walk(base_dir):
+        if root == str(base_dir) and SHARDS_DIR in dirs:
+            dirs.remove(SHARDS_DIR)
+        for name in names:
+            if name.endswith(".stamp.json"):
+                yield Path(root) / name
+
+
+def scoped_files(base_dir, branch=None, project=None, since=None, until=None, others=None):
+    """*.stamp.json files inside the shards selected by the scope, then the
+    stamps outside shards/ (Stamp.save can still write anywhere), taken from
+    others (paths under base_dir) or a walk. Callers filter those by content."""
+    manifest = ShardManifest(base_dir)
+    for shard in manifest.select(branch, project, since, until):
+        yield from shard.glob("*.stamp.json")
+    if others is None:
+        yield from unsharded_files(manifest.base_dir)
+    else:
+        prefix = str(manifest.root) + os.sep
+        yield from (sf for sf in others if not str(sf).startswith(prefix))
+
+
+# ============================================================
+# BENCHMARK
+# ============================================================
+
+def bench(n=20000, base_dir=None):
+    import tempfile
+    from stamp import Stamp, search_stamps
+    tmp = None
+    if base_dir is None:
+        tmp = tempfile.TemporaryDirectory()
+        base_dir = tmp.name
+    base_dir = Path(base_dir)
+    flat = base_dir / "flat"
+    flat.mkdir(parents=True, exist_ok=True)
+    print(f"  writing {n:,} flat stamps (8 projects x 10 branches x 30 days) ...")
+    for i in range(n):
+        Stamp(branch=f"proj{i % 8}/b{i % 10}", depth=i % 12, pin=f"finding {i}",
+              timestamp=f"2026-09-{1 + i % 30:02d}T12:00:00").save(flat / f"{i}.stamp.json", touch=False)
+    for label, fn in [
+        ("unscoped (flat rglob)", lambda: search_stamps("finding", base_dir, use_index=False)),
+    ]:
+        t0 = time.perf_counter()
+        hits = len(fn())
+        print(f"  {label:34s} {(time.perf_counter() - t0) * 1000:8.1f} ms  {hits} hits")
+    t0 = time.perf_counter()
+    migrate(base_dir)
+    print(f"  migrate                            {(time.perf_counter() - t0) * 1000:8.1f} ms")
+    for label, kw in [
+        ("scoped: one branch", {'branch': "proj3/b3"}),
+        ("scoped: one project, one week", {'project': "proj2", 'since': "2026-09-08", 'until': "2026-09-14"}),
+        ("unscoped (sharded rglob)", {}),
+    ]:
+        t0 = time.perf_counter()
+        hits = len(search_stamps("finding", base_dir, use_index=False, **kw))
+        print(f"  {label:34s} {(time.perf_counter() - t0) * 1000:8.1f} ms  {hits} hits")
+    if tmp:
+        tmp.cleanup()
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if args[:1] == ["--migrate"]:
+        base = Path(args[1]) if len(args) > 1 else Path.home() / "gentlyos" / "sessions"
+        print(f"Moved {migrate(base)} stamps into {base / SHARDS_DIR}")
+    elif args[:1] == ["--bench"]:
+        bench(int(args[1]) if len(args) > 1 else 20000, args[2] if len(args) > 2 else None)
+    else:
+        print(__doc__)
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+stamp_zdict.py - per-record stamp compression with a trained dictionary
+A single stamp is a few hundred bytes of JSON that deflate alone can
+barely shrink: there is nothing earlier in the record to refer back to.
+Nearly all of it (keys, emoji markers, branch names, gate questions,
+state words) repeats across stamps, so a preset dictionary (zlib zdict)
+built from our own history gives every record something to refer to,
+and each record still inflates on its own.
+
+  zdict = train(history_dicts)             # or train_from_history(base_dir)
+  write_archive("old.oloz", stamps, zdict)
+  arc = ZArchive("old.oloz"); arc[1234]    # one record, one inflate
+
+TRAINING: records are split into JSON fields; fields seen at least twice
+are ranked by bytes saved (count x length) and packed into DICT_BYTES,
+most valuable last, since deflate reaches the end of the dictionary with
+the shortest distances.
+
+ARCHIVE (.oloz):
+  b"OLOZ" u8 version | u32 dict length | dict
+  records: raw deflate (no zlib header) of compact to_dict JSON
+  index: u64 offset per record | u64 index offset | u32 count
+"""
+
+import json
+import re
+import struct
+import sys
+import time
+import zlib
+from array import array
+from collections import Counter
+from pathlib import Path
+
+from stamp import Stamp
+
+MAGIC = b"OLOZ"
+VERSION = 1
+DICT_BYTES = 32 << 10
+LEVEL = 9
+WBITS = -15
+DICT_LEN = struct.Struct('<I')
+FOOTER = struct.Struct('<QI')
+_FIELD_RE = re.compile(rb'"[^"\\]*(?:\\.[^"\\]*)*":(?:"[^"\\]*(?:\\.[^"\\]*)*"|[^,{}\[\]]*)|[{}\[\],]+')
+
+
+def _payload(stamp):
+    d = stamp if isinstance(stamp, dict) else stamp.to_dict()
+    return json.dumps(d, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def train(stamps, size=DICT_BYTES):
+    """Preset dictionary (bytes) from Stamps or to_dict dicts."""
+    counts = Counter()
+    for stamp in stamps:
+        counts.update(_FIELD_RE.findall(_payload(stamp)))
+    ranked = sorted(((n * len(f), f) for f, n in counts.items() if n > 1), reverse=True)
+    picked, used = [], 0
+    for _, f in ranked:
+        if used + len(f) > size:
+            continue
+        picked.append(f)
+        used += len(f)
+    return b"".join(reversed(picked))
+
+
+def train_from_history(base_dir=None, size=DICT_BYTES, limit=20000):
+    """Dictionary from the newest `limit` saved stamps and journal records."""
+    from stamp_journal import StampJournal
+    base_dir = Path(base_dir) if base_dir else Path.home() / "gentlyos" / "sessions"
+    files = sorted(base_dir.rglob("*.stamp.json"), key=lambda p: p.stat().st_mtime)[-limit:]
+    dicts = [json.loads(p.read_text()) for p in files]
+    journal = base_dir / "journal"
+    if journal.exists():
+        dicts += [d for _, _, d in StampJournal(journal, read_only=True).records()][-limit:]
+    return train(dicts, size)
+
+
+class RecordCodec:
+    """Compress/inflate single records against one preset dictionary."""
+
+    def __init__(self, zdict=b""):
+        self.zdict = zdict
+        self._c = zlib.compressobj(LEVEL, zlib.DEFLATED, WBITS, 9, zlib.Z_DEFAULT_STRATEGY, zdict) \
+            if zdict else zlib.compressobj(LEVEL, zlib.DEFLATED, WBITS, 9)
+        self._d = zlib.decompressobj(WBITS, zdict) if zdict else zlib.decompressobj(WBITS)
+
+    def compress(self, data):
+        c = self._c.copy()  # primed with the dictionary once, not per record
+        return c.compress(data) + c.flush()
+
+    def decompress(self, data):
+        d = self._d.copy()
+        return d.decompress(data) + d.flush()
+
+
+def write_archive(path, stamps, zdict=None):
+    """Write stamps to a .oloz archive (training a dictionary from them if
+    zdict is None); returns (records, payload bytes, archive bytes)."""
+    payloads = [_payload(s) for s in stamps]
+    if zdict is None:
+        zdict = train(json.loads(p) for p in payloads)
+    codec = RecordCodec(zdict)
+    offsets = array('Q')
+    with open(path, 'wb') as f:
+        f.write(MAGIC + bytes([VERSION]) + DICT_LEN.pack(len(zdict)) + zdict)
+        for p in payloads:
+            offsets.append(f.tell())
+            f.write(codec.compress(p))
+        index_at = f.tell()
+        offsets.tofile(f)
+        f.write(FOOTER.pack(index_at, len(offsets)))
+        size = f.tell()
+    return len(payloads), sum(map(len, payloads)), size
+
+
+class ZArchive:
+    def __init__(self, path):
+        self.buf = Path(path).read_bytes()
+        if self.buf[:4] != MAGIC or self.buf[4] != VERSION:
+            raise ValueError(f"{path}: not a compressed stamp archive")
+        n_dict = DICT_LEN.unpack_from(self.buf, 5)[0]
+        self.zdict = self.buf[9:9 + n_dict]
+        index_at, count = FOOTER.unpack_from(self.buf, len(self.buf) - FOOTER.size)
+        self.offsets = array('Q', self.buf[index_at:index_at + count * 8])
+        self.offsets.append(index_at)
+        self.codec = RecordCodec(self.zdict)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def raw(self, i):
+        return self.codec.decompress(self.buf[self.offsets[i]:self.offsets[i + 1]])
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        return json.loads(self.raw(i))
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def stamp(self, i):
+        return Stamp.from_dict(self[i])
+
+
+# ============================================================
+# BENCHMARK
+# ============================================================
+
+def _history(n, seed=11):
+    import random
+    from stamp import CONV_STATES, GATE_STATES, Gate
+    rng = random.Random(seed)
+    symbols = list(GATE_STATES.values())
+    words = ["blue", "channel", "jpeg", "kills", "png", "webp", "temporal", "fragment", "gematria",
+             "verified", "subsampling", "4:2:0", "lossless", "hidden", "ux", "cost", "boustrophedon"]
+    questions = ['Blue channel for verification?', 'JPEG as kill mechanism?', 'Temporal fragmentation?',
+                 'Gematria visible or hidden?', 'Boustrophedon UX cost?', 'Ship it?']
+    out = []
+    for i in range(n):
+        k = rng.randint(2, 6)
+        gates = [Gate(chr(65 + j), questions[j], rng.choice(symbols)) for j in range(k)]
+        out.append(Stamp(branch=f"olo-guard/{rng.choice(words)}-{rng.randint(1, 30)}",
+                         depth=rng.randint(0, 14), max_depth=14, parent=rng.choice(["jpeg-base", "", "main"]),
+                         parent_depth=rng.randint(0, 6), state=rng.choice(CONV_STATES), gates=gates,
+                         pin=" ".join(rng.choice(words) for _ in range(rng.randint(2, 6))),
+                         look=",".join(rng.choice(["blue-base", "jpeg-v2", "png-v1", "core"]) for _ in range(2)),
+                         chain=f"core{rng.randint(1, 5)}->",
+                         timestamp=f"2026-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T"
+                                   f"{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:00").to_dict())
+    return out
+
+
+def bench(n=50000):
+    import tempfile
+    train_set, history = _history(5000, seed=1), _history(n)
+    t0 = time.perf_counter()
+    zdict = train(train_set)
+    print(f"  trained {len(zdict):,} B dictionary on {len(train_set):,} stamps in "
+          f"{(time.perf_counter() - t0) * 1000:.0f} ms")
+    payloads = [_payload(d) for d in history]
+    raw = sum(map(len, payloads))
+    plain = RecordCodec()
+    no_dict = sum(len(plain.compress(p)) for p in payloads)
+    whole = len(zlib.compress(b"\n".join(payloads), LEVEL))
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "history.oloz"
+        t0 = time.perf_counter()
+        _, _, size = write_archive(path, history, zdict)
+        t_w = time.perf_counter() - t0
+        arc = ZArchive(path)
+        t0 = time.perf_counter()
+        for i in range(len(arc)):
+            arc.raw(i)
+        t_raw = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        same = list(arc) == history
+        t_dict = time.perf_counter() - t0
+        rec = size - len(zdict) - 13 - 8 * n - FOOTER.size
+    print(f"  {n:,} stamps, {raw / n:.0f} B JSON each (round-trip {'OK' if same else 'FAIL'})")
+    print(f"  per record, no dict   {no_dict / n:7.1f} B  ratio {raw / no_dict:5.2f}x")
+    print(f"  per record, zdict     {rec / n:7.1f} B  ratio {raw / rec:5.2f}x   "
+          f"(archive {size:,} B incl. dict + index, {raw / size:.2f}x)")
+    print(f"  whole file, no dict   {whole / n:7.1f} B  ratio {raw / whole:5.2f}x   (no random access)")
+    print(f"  encode {n / t_w:10,.0f} rec/s   inflate {n / t_raw:10,.0f} rec/s "
+          f"({raw / t_raw / 2**20:.0f} MB/s)   inflate+parse {n / t_dict:,.0f} rec/s")
+
+
+if __name__ == "__main__":
+    bench(int(sys.argv[1]) if len(sys.argv) > 1 else 50000)
@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+"""
+dom_archive.py - block-compressed dom-saves archive
+An old save is rewritten as <save>.html.olz: the HTML and its plaintext
+(dom_text) split into independent zlib blocks plus a block index, so any
+byte range of either is read by inflating only the blocks that cover it.
+A search scans the text, as it would the plain save's sidecar, inflating
+only the text blocks whose Bloom filter (stamp_bloom) admits the query,
+and maps hits back to the HTML through the stored text map.
+
+FORMAT (version 2):
+  b"OLDZ" | u32 version | u32 block bytes
+  blocks: zlib(html[i * block : (i + 1) * block]), then the same for the
+          text, then each text block's filter bits, then the text map:
+          zlib(deltas of its text offsets, then deltas of its html offsets)
+  index : (u64 block off, u32 block len, u32 raw len,
+           u64 filter off, u32 filter bits, u32 filter k) per html block,
+          then per text block (HTML blocks carry no filter)
+  footer: u64 index off | u64 html size | u32 html blocks | u64 text size |
+          u32 text blocks | u64 map off | u64 map len | b"OLDZ"
+
+A block's filter also covers the first BLOOM_OVERLAP bytes of the next
+block, so matches that straddle a boundary are never ruled out. Version 1
+archives (filtered HTML blocks, footer u64 index off | u64 raw size |
+u32 blocks | b"OLDZ") are still read; having no text, they are searched
+through the markup.
+
+Usage:
+  python3 dom_archive.py --convert [DIR] [DAYS]   archive saves older than DAYS (7)
+  python3 dom_archive.py --bench [MB]             size, random access and search
+"""
+
+import re
+import struct
+import sys
+import time
+import zlib
+from array import array
+from itertools import accumulate
+from collections import OrderedDict
+from pathlib import Path
+
+import dom_text
+import stamp_bloom
+from stamp_bloom import BloomFilter
+
+MAGIC = b"OLDZ"
+VERSION = 2
+BLOCK_BYTES = 1 << 20
+BLOOM_OVERLAP = 4096
+LEVEL = 6
+SUFFIX = ".olz"
+HEAD = struct.Struct('<4sII')
+ENTRY = struct.Struct('<QIIQII')
+FOOTER = struct.Struct('<QQIQIQQ4s')
+FOOTER_V1 = struct.Struct('<QQI4s')
+_TAG_RE = re.compile(r"<[^>]*>|<[^>]*$|^[^<]*>")
+_WS_RE = re.compile(r"\s+")
+_MASK = (1 << 64) - 1
+
+
+def _clean(context):
+    return _WS_RE.sub(" ", _TAG_RE.sub(" ", context))
+
+
+def _pack_map(raw):
+    """dom_text .map entries -> per-column deltas, which zlib shrinks ~100x."""
+    entries = array('Q')
+    entries.frombytes(raw)
+    cols = []
+    for col in (entries[0::2], entries[1::2]):
+        cols.append(array('Q', [(x - y) & _MASK for x, y in zip(col, [0, *col[:-1]])]).tobytes())
+    return zlib.compress(b"".join(cols), LEVEL)
+
+
+def _unpack_map(data):
+    deltas = array('Q')
+    deltas.frombytes(zlib.decompress(data))
+    n = len(deltas) // 2
+    entries = array('Q', bytes(len(deltas) * deltas.itemsize))
+    entries[0::2] = array('Q', accumulate(deltas[:n], lambda a, b: (a + b) & _MASK))
+    entries[1::2] = array('Q', accumulate(deltas[n:], lambda a, b: (a + b) & _MASK))
+    return dom_text.TextMap(entries)
+
+
+def _write_blocks(src, out, block_bytes, filters):
+    """Write src as zlib blocks; returns (index entries, filter bits)."""
+    entries, blooms = [], []
+    block = src.read(block_bytes)
+    while block:
+        nxt = src.read(block_bytes)
+        comp = zlib.compress(block, LEVEL)
+        entry = [out.tell(), len(comp), len(block), 0, 0, 0]
+        if filters:
+            bloom = BloomFilter.of(stamp_bloom.grams_of(block + nxt[:BLOOM_OVERLAP]))
+            entry[4:] = bloom.m, bloom.k
+            blooms.append(bloom.bits)
+        entries.append(entry)
+        out.write(comp)
+        block = nxt
+    return entries, blooms
+
+
+def convert(html_path, block_bytes=BLOCK_BYTES, remove=True):
+    """Write <html_path>.olz; with remove, drop the save and its sidecars."""
+    html_path = Path(html_path)
+    out_path = html_path.with_name(html_path.name + SUFFIX)
+    tmp = out_path.with_name(out_path.name + ".tmp")
+    txt = dom_text.ensure(html_path)
+    _, mp = dom_text.sidecars(html_path)
+    with open(html_path, 'rb') as f, open(txt, 'rb') as t, open(mp, 'rb') as m, open(tmp, 'wb') as out:
+        out.write(HEAD.pack(MAGIC, VERSION, block_bytes))
+        entries, _ = _write_blocks(f, out, block_bytes, filters=False)
+        text_entries, blooms = _write_blocks(t, out, block_bytes, filters=True)
+        for entry, bits in zip(text_entries, blooms):
+            entry[3] = out.tell()
+            out.write(bits)
+        m.seek(dom_text.HEADER.size)
+        tmap = _pack_map(m.read())
+        map_off = out.tell()
+        out.write(tmap)
+        index_off = out.tell()
+        for entry in entries + text_entries:
+            out.write(ENTRY.pack(*entry))
+        out.write(FOOTER.pack(index_off, sum(e[2] for e in entries), len(entries),
+                              sum(e[2] for e in text_entries), len(text_entries),
+                              map_off, len(tmap), MAGIC))
+    tmp.replace(out_path)
+    if remove:
+        for side in (html_path.name + ".txt", html_path.name + ".map",
+                     html_path.name + ".bloom", html_path.name + ".txt.bloom"):
+            html_path.with_name(side).unlink(missing_ok=True)
+        html_path.unlink()
+    return out_path
+
+
+def convert_dir(dom_dir, older_than_days=7):
+    """Archive every save not modified for older_than_days; returns (n, before, after)."""
+    cutoff = time.time() - older_than_days * 86400
+    n = before = after = 0
+    for hf in sorted(Path(dom_dir).glob("*.html")):
+        st = hf.stat()
+        if st.st_mtime > cutoff:
+            continue
+        before += st.st_size
+        after += convert(hf).stat().st_size
+        n += 1
+    return n, before, after
+
+
+class DomArchive:
+    CACHE_BLOCKS = 4
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._f = open(self.path, 'rb')
+        magic, version, self.block_bytes = HEAD.unpack(self._f.read(HEAD.size))
+        footer = FOOTER if version == VERSION else FOOTER_V1
+        self._f.seek(-footer.size, 2)
+        fields = footer.unpack(self._f.read(footer.size))
+        if magic != MAGIC or fields[-1] != MAGIC or version not in (1, VERSION):
+            raise ValueError(f"{self.path} is not a dom archive")
+        self.text_entries = None
+        if version == VERSION:
+            index_off, self.size, n, self.text_size, n_text, self._map_off, self._map_len, _ = fields
+        else:
+            (index_off, self.size, n, _), n_text = fields, 0
+        self._f.seek(index_off)
+        raw = self._f.read((n + n_text) * ENTRY.size)
+        entries = [ENTRY.unpack_from(raw, i * ENTRY.size) for i in range(n + n_text)]
+        self.entries = entries[:n]
+        if version == VERSION:
+            self.text_entries = entries[n:]
+        self._cache = OrderedDict()
+        self._map = None
+        self.blocks_read = 0
+
+    def close(self):
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def has_text(self):
+        return self.text_entries is not None
+
+    def _block(self, entries, i):
+        key = (entries is self.text_entries, i)
+        data = self._cache.get(key)
+        if data is None:
+            off, length = entries[i][:2]
+            self._f.seek(off)
+            data = self._cache[key] = zlib.decompress(self._f.read(length))
+            self.blocks_read += 1
+            if len(self._cache) > self.CACHE_BLOCKS:
+                self._cache.popitem(last=False)
+        else:
+            self._cache.move_to_end(key)
+        return data
+
+    def block(self, i):
+        return self._block(self.entries, i)
+
+    def _read(self, entries, size, offset, length):
+        end = min(offset + length, size)
+        out = []
+        while offset < end:
+            i, rel = divmod(offset, self.block_bytes)
+            piece = self._block(entries, i)[rel:rel + end - offset]
+            out.append(piece)
+            offset += len(piece)
+        return b"".join(out)
+
+    def read(self, offset, size):
+        """HTML bytes [offset, offset + size), inflating only the covering blocks."""
+        return self._read(self.entries, self.size, offset, size)
+
+    def read_text(self, offset, size):
+        """Plaintext bytes [offset, offset + size), as in the save's .txt sidecar."""
+        return self._read(self.text_entries, self.text_size, offset, size)
+
+    def text_map(self):
+        """The save's dom_text.TextMap (text offset -> HTML offset)."""
+        if self._map is None:
+            self._f.seek(self._map_off)
+            self._map = _unpack_map(self._f.read(self._map_len))
+        return self._map
+
+    def bloom(self, i, entries=None):
+        _, _, _, off, m, k = (entries or self.text_entries or self.entries)[i]
+        self._f.seek(off)
+        return BloomFilter(m, k, bytearray(self._f.read((m + 7) // 8)))
+
+    def scan(self, query, max_hits=None, cancel=None, bloom=True, stats=stamp_bloom.STATS, text=True):
+        """Yield (offset, context) for every hit, like dom_search.scan_file.
+
+        With text (and a version 2 archive) the plaintext is scanned and
+        offsets are text offsets; otherwise the HTML is, with markup
+        stripped from the contexts.
+        """
+        from dom_search import CONTEXT_BYTES, _context, matcher
+        if not query:
+            return
+        text = text and self.has_text
+        entries, size = (self.text_entries, self.text_size) if text else (self.entries, self.size)
+        find, overlap = matcher(query)
+        filtered = entries[0][4] if entries else 0
+        grams = stamp_bloom.query_grams(query) if bloom and filtered and overlap < BLOOM_OVERLAP else None
+        n = 0
+        for i, entry in enumerate(entries):
+            if cancel is not None and cancel.is_set():
+                return
+            if grams and not all(g in self.bloom(i, entries) for g in grams):
+                stats.add(bytes_skipped=entry[2])
+                continue
+            start = i * self.block_bytes
+            lo = max(0, start - CONTEXT_BYTES)
+            buf = self._read(entries, size, lo, start + entry[2] + overlap + CONTEXT_BYTES - lo)
+            pre = start - lo
+            for s, e in find(buf):
+                if s < pre:
+                    continue
+                if s >= pre + entry[2]:
+                    break
+                ctx = _context(buf, s, e)
+                yield lo + s, ctx if text else _clean(ctx)
+                n += 1
+                if max_hits is not None and n >= max_hits:
+                    return
+
+
+def archive_result(path, query, max_hits=None, cancel=None, bloom=True, text=True):
+    """dom_result for an archived save: the hits the plain save would give."""
+    with DomArchive(path) as arc:
+        text = text and arc.has_text
+        hits = [{'offset': off, 'context': ctx}
+                for off, ctx in arc.scan(query, max_hits, cancel, bloom, text=text)]
+        if text and hits:
+            tmap = arc.text_map()
+            for h in hits:
+                h['text_offset'], h['offset'] = h['offset'], tmap.to_html(h['offset'])
+    if not hits:
+        return None
+    return {'file': str(path), 'context': hits[0]['context'], 'hits': hits, 'type': 'dom'}
+
+
+# ============================================================
+# BENCHMARK
+# ============================================================
+
+def bench(total_mb=256):
+    import random
+    import tempfile
+    from dom_search import _make_saves, search_dom_saves
+    with tempfile.TemporaryDirectory() as tmp:
+        dom_dir = Path(tmp) / "dom-saves"
+        files = _make_saves(dom_dir, total_mb)
+        saves = sorted(dom_dir.glob("*.html"))
+        plain = search_dom_saves("jpeg kills blue", dom_dir)
+        t0 = time.perf_counter()
+        n, before, after = convert_dir(dom_dir, older_than_days=0)
+        dt = time.perf_counter() - t0
+        print(f"  convert     {dt:7.2f}s  {n}/{files} saves  {before / 2**20:.0f} MB -> "
+              f"{after / 2**20:.1f} MB  ({before / after:.1f}x)")
+        arcs = [DomArchive(s.with_name(s.name + SUFFIX)) for s in saves]
+        text = sum(a.text_size for a in arcs)
+        rng = random.Random(1)
+        t0 = time.perf_counter()
+        for _ in range(1000):
+            arc = rng.choice(arcs)
+            arc.read(rng.randrange(arc.size - 4096), 4096)
+        dt = time.perf_counter() - t0
+        print(f"  random read {dt / 1000 * 1e3:7.3f} ms per 4 KB  "
+              f"({sum(a.blocks_read for a in arcs)} blocks inflated for 1000 reads)")
+        archived = search_dom_saves("jpeg kills blue", dom_dir)
+        same = [r['hits'] for r in plain] == [r['hits'] for r in archived]
+        print(f"  plain save search: {sum(len(r['hits']) for r in plain)} hits, archive identical: {same}")
+        for q in ("jpeg kills blue", "rainbow unicorn"):
+            stamp_bloom.STATS.reset()
+            t0 = time.perf_counter()
+            hits = sum(len(r['hits']) for r in search_dom_saves(q, dom_dir))
+            dt = time.perf_counter() - t0
+            print(f"  search {q!r:18s} {dt:6.2f}s  {hits} hits, "
+                  f"{stamp_bloom.STATS.bytes_skipped / 2**20:.0f}/{text / 2**20:.0f} MB text never inflated")
+        for a in arcs:
+            a.close()
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if args[:1] == ["--convert"]:
+        base = Path(args[1]) if len(args) > 1 else Path.home() / "gentlyos" / "sessions" / "dom-saves"
+        n, before, after = convert_dir(base, float(args[2]) if len(args) > 2 else 7)
+        print(f"Archived {n} saves: {before:,} B -> {after:,} B")
+    elif args[:1] == ["--bench"]:
+        bench(int(args[1]) if len(args) > 1 else 256)
+    else:
+        print(__doc__)
@@ -4,11 +4,23 @@ stamp.py - OLO Stamp Protocol engine
 Every prompt carries its own GPS coordinates in the thought-tree.
 """
 
+import asyncio
 import json
+import os
+import re
 import sys
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 from pathlib import Path
 from dataclasses import dataclass, field
+from functools import lru_cache
+
+from dom_search import dom_result, save_files, search_dom_saves
+from stamp_index import StampIndex
+from stamp_journal import StampJournal, read_record
+from stamp_shards import SHARDS_DIR, ShardManifest, scoped_files, split_branch
 
 GATE_STATES = {
     'open': '\u25CB', 'half': '\u25D0', 'yes': '\u25CF',
@@ -17,12 +29,24 @@ GATE_STATES = {
 GATE_CYCLE = ['\u25CB', '\u25D0', '\u25CF', '\u2715']
 CONV_STATES = ['OPEN', 'GATE', 'DONE', 'FORK', 'HOLD', 'DEAD']
 
-@dataclass
+# Called as hook(ref, stamp) after every Stamp.save; indexes subscribe here.
+SAVE_HOOKS = []
+# Called as hook(moves), moves {old ref: new ref}, when saved stamp files
+# are moved (stamp_shards.migrate); indexes holding file refs follow them.
+MOVE_HOOKS = []
+
+@dataclass(slots=True)
 class Gate:
     letter: str
     question: str
     state: str = '\u25CB'
 
+    def __post_init__(self):
+        # Questions repeat on every stamp of a project; share one copy.
+        self.letter = sys.intern(self.letter)
+        self.question = sys.intern(self.question)
+        self.state = sys.intern(self.state)
+
     def cycle(self):
         idx = GATE_CYCLE.index(self.state) if self.state in GATE_CYCLE else 0
         self.state = GATE_CYCLE[(idx + 1) % len(GATE_CYCLE)]
@@ -33,8 +57,14 @@ class Gate:
     def display(self):
         return f"[{self.letter}{self.state}]"
 
-@dataclass
-class Stamp:
+class _CompactCache:
+    # The compact() cache lives in a slot outside the dataclass fields, so
+    # fields(), asdict(), replace() and pickling never see it.
+    __slots__ = ('_compact',)
+
+
+@dataclass(slots=True)
+class Stamp(_CompactCache):
     branch: str = ""
     depth: int = 0
     max_depth: int = 0
@@ -47,8 +77,32 @@ class Stamp:
     chain: str = ""
     timestamp: str = ""
 
+    def __post_init__(self):
+        self.branch = sys.intern(self.branch)
+        self.parent = sys.intern(self.parent)
+        self.state = sys.intern(self.state)
+        self.look = sys.intern(self.look)
+        self.chain = sys.intern(self.chain)
+        if not self.timestamp:
+            self.timestamp = datetime.now().isoformat(timespec='seconds')
+
+    def __setattr__(self, name, value):
+        object.__setattr__(self, name, value)
+        if name != '_compact':
+            object.__setattr__(self, '_compact', None)
+
     def compact(self):
-        ts = datetime.now().strftime("%m%dT%H%M")
+        # Cached until a field is assigned or the gates render differently.
+        key = tuple((g.letter, g.state) for g in self.gates)
+        cached = getattr(self, '_compact', None)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        out = self._render_compact()
+        object.__setattr__(self, '_compact', (key, out))
+        return out
+
+    def _render_compact(self):
+        ts = _compact_time(self.timestamp)
         gate_str = "".join(g.compact() for g in self.gates)
         parent_str = f"{self.parent}@d{self.parent_depth}" if self.parent else ""
         pin_short = self.pin[:30].replace(" ", "-") if self.pin else ""
@@ -62,7 +116,7 @@ class Stamp:
             f"\U0001F4CC{pin_short}" if pin_short else "",
             f"\U0001F441{self.look}" if self.look else "",
             f"\U0001F517{self.chain}" if self.chain else "",
-            f"\u23F1{ts}",
+            f"\u23F1{ts}" if ts else "",
         ]
         return "[" + "|".join(p for p in parts if p) + "]"
 
@@ -86,47 +140,30 @@ class Stamp:
             lines.append(f"|  \U0001F441  look:   {self.look}")
         if self.chain:
             lines.append(f"|  \U0001F517 chain:  {self.chain}")
-        lines.append(f"|  \u23F1  time:   {datetime.now().isoformat()[:19]}")
+        if self.timestamp:
+            lines.append(f"|  \u23F1  time:   {self.timestamp[:19]}")
         lines.append("+" + "=" * 52 + "+")
         return "\n".join(lines)
 
-    def rehydrate(self, tree_state=None, findings=None):
-        block = ["[OLO REHYDRATE]"]
-        project = self.branch.split('/')[0] if '/' in self.branch else self.branch
-        block.append(f"PROJECT: {project}")
-        block.append(f"ACTIVE BRANCH: {self.branch} (depth {self.depth}/{self.max_depth})")
-        block.append(f"STATE: {self.state}")
-        block.append("")
-        if self.gates:
-            block.append("DECISION GATES:")
-            state_labels = {
-                '\u25CF': 'YES (confirmed)', '\u25CB': 'OPEN (undecided)',
-                '\u25D0': 'PARTIAL (exploring)', '\u2715': 'NO (rejected)',
-                '\u25C8': 'BLOCKED (waiting)', '\u21BA': 'REVISIT (reopened)',
-            }
-            for g in self.gates:
-                label = state_labels.get(g.state, g.state)
-                block.append(f"  {g.letter}: {g.question}")
-                block.append(f"     -> {g.state} {label}")
-            block.append("")
-        if self.pin:
-            block.append(f"LAST FINDING: {self.pin}")
-            block.append("")
-        if findings:
-            block.append("KEY FINDINGS FROM ALL BRANCHES:")
-            for bname, finding in findings.items():
-                block.append(f"  \U0001F4CC {bname}: \"{finding}\"")
-            block.append("")
-        if tree_state:
-            block.append("TREE:")
-            block.append(tree_state)
-            block.append("")
-        if self.look:
-            block.append(f"CONTEXT: {self.look}")
-        block.append("")
-        block.append("Continue from this state. Gates show decisions. Findings are cherry-picked.")
-        block.append("[/OLO REHYDRATE]")
-        return "\n".join(block)
+    def rehydrate(self, tree_state=None, findings=None, budget=None, max_tokens=None):
+        """Context-reset block. Memoized on (stamp, tree_state, findings).
+
+        budget caps the block at that many characters (max_tokens at
+        ~CHARS_PER_TOKEN chars each) by dropping trailing findings, then
+        trailing tree lines. The stamp sections themselves are never cut.
+        """
+        if max_tokens is not None:
+            tok_budget = max_tokens * CHARS_PER_TOKEN
+            budget = tok_budget if budget is None else min(budget, tok_budget)
+        key = (self.branch, self.depth, self.max_depth, self.state,
+               tuple((g.letter, g.question, g.state) for g in self.gates), self.pin, self.look)
+        findings = tuple(findings.items()) if findings else ()
+        try:
+            hash(findings)
+        except TypeError:
+            # Finding values that are lists or dicts can't key the caches.
+            return _rehydrate.__wrapped__(key, tree_state or "", findings, budget, _finding_lines.__wrapped__)
+        return _rehydrate(key, tree_state or "", findings, budget)
 
     def to_dict(self):
         return {
@@ -134,11 +171,29 @@ class Stamp:
             'parent': self.parent, 'parent_depth': self.parent_depth, 'state': self.state,
             'gates': [{'letter': g.letter, 'question': g.question, 'state': g.state} for g in self.gates],
             'pin': self.pin, 'look': self.look, 'chain': self.chain,
-            'timestamp': datetime.now().isoformat(),
+            'timestamp': self.timestamp,
         }
 
-    def save(self, path):
-        Path(path).write_text(json.dumps(self.to_dict(), indent=2, ensure_ascii=False))
+    def touch(self):
+        """Set timestamp to now; save() does this so each record carries its save time."""
+        self.timestamp = datetime.now().isoformat()
+
+    def save(self, path, touch=True):
+        if touch:
+            self.touch()
+        if isinstance(path, StampJournal):
+            ref = path.append(self)
+        else:
+            # Replace, not rewrite in place: the directory mtime then changes
+            # on every save, which is what StampIndex.refresh watches.
+            path = Path(path)
+            tmp = path.with_name(f"{path.name}.{os.getpid()}-{threading.get_ident()}.tmp")
+            tmp.write_text(json.dumps(self.to_dict(), indent=2, ensure_ascii=False))
+            os.replace(tmp, path)
+            ref = str(path)
+        for hook in SAVE_HOOKS:
+            hook(ref, self)
+        return ref
 
     @classmethod
     def from_dict(cls, d):
@@ -149,76 +204,403 @@ class Stamp:
             pin=d.get('pin', ''), look=d.get('look', ''), chain=d.get('chain', ''),
         )
         stamp.gates = [Gate(g['letter'], g['question'], g['state']) for g in d.get('gates', [])]
+        # A record without a time stays without one (not "now").
+        stamp.timestamp = d.get('timestamp', '')
         return stamp
 
     @classmethod
-    def load(cls, path):
+    def load(cls, path, offset=None):
+        if offset is not None:
+            return cls.from_dict(read_record(path, offset))
         return cls.from_dict(json.loads(Path(path).read_text()))
 
     @classmethod
     def parse_compact(cls, line):
         if not line.startswith('[OLO|') or not line.endswith(']'):
             return None
-        inner = line[1:-1]
-        parts = inner.split('|')
-        stamp = cls()
-        for part in parts:
-            if part == 'OLO':
+        return cls.from_dict(_parse_fields(line[1:-1]))
+
+    @classmethod
+    def parse_many(cls, source, as_dict=False):
+        """Lazily yield every [OLO|...] stamp embedded anywhere in source.
+
+        source is a str of text, a path, an open file, or any iterable of
+        lines. Malformed stamps are skipped. as_dict yields field dicts in
+        to_dict layout instead of Stamp objects.
+        """
+        for line in _iter_lines(source):
+            if '[OLO|' not in line:
                 continue
-            elif part.startswith('\U0001F33F'):
-                stamp.branch = part[1:]
-            elif part.startswith('\U0001F4CD'):
-                nums = part[1:].split('/')
-                stamp.depth = int(nums[0])
-                stamp.max_depth = int(nums[1]) if len(nums) > 1 else 0
-            elif part.startswith('\u2B06'):
-                ref = part[1:]
-                if '@d' in ref:
-                    name, dp = ref.rsplit('@d', 1)
-                    stamp.parent = name
-                    stamp.parent_depth = int(dp)
-                else:
-                    stamp.parent = ref
-            elif part.startswith('\u26A1'):
-                stamp.state = part[1:]
-            elif part.startswith('\U0001F512'):
-                gs = part[1:]
-                i = 0
-                while i + 1 < len(gs):
-                    stamp.gates.append(Gate(gs[i], "", gs[i + 1]))
-                    i += 2
-            elif part.startswith('\U0001F4CC'):
-                stamp.pin = part[1:].replace('-', ' ')
-            elif part.startswith('\U0001F441'):
-                stamp.look = part[1:]
-            elif part.startswith('\U0001F517'):
-                stamp.chain = part[1:]
-            elif part.startswith('\u23F1'):
-                stamp.timestamp = part[1:]
-        return stamp
+            for m in _EMBEDDED_RE.finditer(line):
+                try:
+                    d = _parse_fields(m.group()[1:-1])
+                except ValueError:
+                    continue
+                yield d if as_dict else cls.from_dict(d)
+
+
+def _compact_time(ts):
+    """Stored timestamp in compact MMDDTHHMM form (ISO or already compact)."""
+    try:
+        return datetime.fromisoformat(ts).strftime("%m%dT%H%M")
+    except ValueError:
+        return ts
+
+
+CHARS_PER_TOKEN = 4
+REHYDRATE_LABELS = {
+    '\u25CF': 'YES (confirmed)', '\u25CB': 'OPEN (undecided)',
+    '\u25D0': 'PARTIAL (exploring)', '\u2715': 'NO (rejected)',
+    '\u25C8': 'BLOCKED (waiting)', '\u21BA': 'REVISIT (reopened)',
+}
+REHYDRATE_FOOTER = (
+    "",
+    "Continue from this state. Gates show decisions. Findings are cherry-picked.",
+    "[/OLO REHYDRATE]",
+)
+
+
+# Each rehydrate section is cached on its own inputs, so a block whose
+# findings changed still reuses the stamp and tree sections verbatim.
+@lru_cache(maxsize=256)
+def _rehydrate_head(branch, depth, max_depth, state, gates, pin):
+    block = ["[OLO REHYDRATE]"]
+    project = branch.split('/')[0] if '/' in branch else branch
+    block.append(f"PROJECT: {project}")
+    block.append(f"ACTIVE BRANCH: {branch} (depth {depth}/{max_depth})")
+    block.append(f"STATE: {state}")
+    block.append("")
+    if gates:
+        block.append("DECISION GATES:")
+        for letter, question, gstate in gates:
+            block.append(f"  {letter}: {question}")
+            block.append(f"     -> {gstate} {REHYDRATE_LABELS.get(gstate, gstate)}")
+        block.append("")
+    if pin:
+        block.append(f"LAST FINDING: {pin}")
+        block.append("")
+    return tuple(block)
+
+
+@lru_cache(maxsize=256)
+def _finding_lines(findings):
+    return tuple(f"  \U0001F4CC {bname}: \"{finding}\"" for bname, finding in findings)
+
+
+@lru_cache(maxsize=64)
+def _tree_lines(tree_state):
+    return tuple(tree_state.split("\n")) if tree_state else ()
+
+
+def _fit(lines, room, what):
+    """Keep a prefix of lines within room chars; note how many were cut."""
+    cost = [len(line) + 1 for line in lines]
+    rest = sum(cost)
+    kept = []
+    for i, line in enumerate(lines):
+        if rest <= room:
+            return kept + list(lines[i:]), room - rest
+        marker = f"  ... {len(lines) - i} more {what}"
+        if room - cost[i] < len(marker) + 1:
+            return kept + [marker], room - len(marker) - 1
+        kept.append(line)
+        room -= cost[i]
+        rest -= cost[i]
+    return kept, room
+
+
+def _fit_section(lines, room, title, what):
+    if not lines:
+        return lines, room
+    kept, left = _fit(lines, room - len(title) - 2, what)
+    if left < 0:
+        return (), room  # not even the marker fits; drop the section
+    return tuple(kept), left
+
+
+@lru_cache(maxsize=256)
+def _rehydrate(key, tree_state, findings, budget, finding_lines=_finding_lines):
+    branch, depth, max_depth, state, gates, pin, look = key
+    head = _rehydrate_head(branch, depth, max_depth, state, gates, pin)
+    tail = ((f"CONTEXT: {look}",) if look else ()) + REHYDRATE_FOOTER
+    flines, tlines = finding_lines(findings), _tree_lines(tree_state)
+    if budget is not None:
+        room = budget - len("\n".join(head + tail))
+        flines, room = _fit_section(flines, room, "KEY FINDINGS FROM ALL BRANCHES:", "findings")
+        tlines, room = _fit_section(tlines, room, "TREE:", "tree lines")
+    block = list(head)
+    if flines:
+        block.append("KEY FINDINGS FROM ALL BRANCHES:")
+        block.extend(flines)
+        block.append("")
+    if tlines:
+        block.append("TREE:")
+        block.extend(tlines)
+        block.append("")
+    block.extend(tail)
+    return "\n".join(block)
+
+
+def _parse_depth(d, v):
+    nums = v.split('/')
+    d['depth'] = int(nums[0])
+    d['max_depth'] = int(nums[1]) if len(nums) > 1 else 0
+
+
+def _parse_parent(d, v):
+    if '@d' in v:
+        name, dp = v.rsplit('@d', 1)
+        d['parent'] = name
+        d['parent_depth'] = int(dp)
+    else:
+        d['parent'] = v
+
+
+def _parse_gates(d, v):
+    d['gates'] = [{'letter': v[i], 'question': "", 'state': v[i + 1]}
+                  for i in range(0, len(v) - 1, 2)]
 
 
-def search_stamps(query, base_dir=None):
+def _set(key):
+    def setter(d, v):
+        d[key] = v
+    return setter
+
+
+def _parse_pin(d, v):
+    d['pin'] = v.replace('-', ' ')
+
+
+# Field marker (first code point of each |-part) -> parser.
+_FIELD_PARSERS = {
+    '\U0001F33F': _set('branch'),
+    '\U0001F4CD': _parse_depth,
+    '\u2B06': _parse_parent,
+    '\u26A1': _set('state'),
+    '\U0001F512': _parse_gates,
+    '\U0001F4CC': _parse_pin,
+    '\U0001F441': _set('look'),
+    '\U0001F517': _set('chain'),
+    '\u23F1': _set('timestamp'),
+}
+_EMBEDDED_RE = re.compile(r"\[OLO\|[^\[\]\r\n]*\]")
+
+
+def _parse_fields(inner):
+    d = {}
+    for part in inner.split('|'):
+        parse = _FIELD_PARSERS.get(part[:1])
+        if parse:
+            parse(d, part[1:])
+    return d
+
+
+def _iter_lines(source):
+    if isinstance(source, Path):
+        with source.open(encoding='utf-8', errors='replace') as f:
+            yield from f
+    elif isinstance(source, str):
+        yield from source.splitlines()
+    else:
+        yield from source
+
+
+def _sessions_dir(base_dir):
     if base_dir is None:
-        base_dir = Path.home() / "gentlyos" / "sessions"
+        return Path.home() / "gentlyos" / "sessions"
+    return Path(base_dir)
+
+
+def _scope(branch=None, project=None, since=None, until=None):
+    scope = {'branch': branch, 'project': project, 'since': since, 'until': until}
+    return {k: v for k, v in scope.items() if v is not None}
+
+
+def _in_scope(d, scope):
+    if 'branch' in scope and d.get('branch') != scope['branch']:
+        return False
+    if 'project' in scope and split_branch(d.get('branch', ''))[0] != scope['project']:
+        return False
+    day = d.get('timestamp', '')[:10]
+    if 'since' in scope and day < str(scope['since'])[:10]:
+        return False
+    if 'until' in scope and day > str(scope['until'])[:10]:
+        return False
+    return True
+
+
+def _stamp_files(base_dir, query, use_index, scope=None):
+    sharded = scope and ShardManifest(base_dir).exists()
+    if use_index:
+        index = StampIndex(base_dir)
+        # A scoped search reads its shards straight from the manifest, so
+        # the index only has to be current outside shards/.
+        index.refresh(skip=(SHARDS_DIR,) if sharded else ())
+        files = index.candidates(query)
+        return scoped_files(base_dir, others=files, **scope) if sharded else files
+    if sharded:
+        return scoped_files(base_dir, **scope)
+    return base_dir.rglob("*.stamp.json")
+
+
+def _match_stamp(sf, query, cancel=None, scope=None):
+    if cancel is not None and cancel.is_set():
+        return None
+    data = sf.read_text()
+    if query.lower() in data.lower():
+        d = json.loads(data)
+        if scope and not _in_scope(d, scope):
+            return None
+        return {'file': str(sf), 'stamp': Stamp.from_dict(d), 'type': 'stamp'}
+    return None
+
+
+def _match_journal(journal_dir, query, cancel=None, scope=None):
     results = []
-    for sf in base_dir.rglob("*.stamp.json"):
-        data = sf.read_text()
-        if query.lower() in data.lower():
-            results.append({'file': str(sf), 'stamp': Stamp.from_dict(json.loads(data)), 'type': 'stamp'})
+    for ref, d in StampJournal(journal_dir, read_only=True).search(query):
+        if cancel is not None and cancel.is_set():
+            break
+        if scope and not _in_scope(d, scope):
+            continue
+        results.append({'file': str(journal_dir / ref), 'stamp': Stamp.from_dict(d), 'type': 'stamp'})
+    return results
+
+
+def search_stamps(query, base_dir=None, use_index=True, branch=None, project=None, since=None, until=None):
+    """Substring search over saved stamps, the journal and dom-saves.
+
+    branch/project/since/until scope the search to matching stamps. With
+    a sharded layout (stamp_shards) only the selected shard directories
+    and stamps saved outside shards/ are read; dom-saves carry no branch,
+    so scoped searches skip them.
+    """
+    base_dir = _sessions_dir(base_dir)
+    scope = _scope(branch, project, since, until)
+    results = []
+    for sf in _stamp_files(base_dir, query, use_index, scope):
+        r = _match_stamp(sf, query, scope=scope)
+        if r:
+            results.append(r)
+    journal_dir = base_dir / "journal"
+    if journal_dir.exists():
+        results.extend(_match_journal(journal_dir, query, scope=scope))
     dom_dir = base_dir / "dom-saves"
-    if dom_dir.exists():
-        for hf in dom_dir.glob("*.html"):
-            content = hf.read_text()
-            if query.lower() in content.lower():
-                idx = content.lower().find(query.lower())
-                ctx = content[max(0, idx - 60):min(len(content), idx + len(query) + 60)]
-                results.append({'file': str(hf), 'context': f"...{ctx.replace(chr(10), ' ')}...", 'type': 'dom'})
+    if dom_dir.exists() and not scope:
+        results.extend(search_dom_saves(query, dom_dir))
     return results
 
 
+def iter_search_stamps(query, base_dir=None, use_index=True, workers=8, top_k=None, cancel=None,
+                       branch=None, project=None, since=None, until=None):
+    """Parallel search_stamps: yields results in completion order.
+
+    Files fan out over a thread pool. Stops after top_k results, when
+    cancel (a threading.Event) is set, or when the generator is closed;
+    cancel is set on exit so in-flight workers stop at their next check.
+    """
+    base_dir = _sessions_dir(base_dir)
+    scope = _scope(branch, project, since, until)
+    cancel = cancel if cancel is not None else threading.Event()
+    journal_dir = base_dir / "journal"
+    dom_dir = base_dir / "dom-saves"
+    pool = ThreadPoolExecutor(max_workers=workers)
+    try:
+        futures = [pool.submit(_match_stamp, sf, query, cancel, scope)
+                   for sf in _stamp_files(base_dir, query, use_index, scope)]
+        if journal_dir.exists():
+            futures.append(pool.submit(_match_journal, journal_dir, query, cancel, scope))
+        if dom_dir.exists() and not scope:
+            futures += [pool.submit(dom_result, hf, query, None, cancel)
+                        for hf in save_files(dom_dir)]
+        found = 0
+        for fut in as_completed(futures):
+            if cancel.is_set():
+                break
+            r = fut.result()
+            for hit in (r if isinstance(r, list) else [r] if r else []):
+                yield hit
+                found += 1
+                if top_k is not None and found >= top_k:
+                    return
+    finally:
+        cancel.set()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+ASYNC_BATCH = 64
+
+
+def _match_stamps(files, query, cancel=None, scope=None):
+    return [r for r in (_match_stamp(sf, query, cancel, scope) for sf in files) if r]
+
+
+async def asearch_stamps(query, base_dir=None, use_index=True, top_k=None, executor=None,
+                         branch=None, project=None, since=None, until=None):
+    """asyncio search_stamps: an async generator yielding results as reads finish.
+
+    File reads run in executor (the loop's default if None), ASYNC_BATCH
+    stamp files per job, so several queries can share one loop. Cancelling
+    the consuming task or closing the generator drops queued jobs and stops
+    running ones at their next cancel check.
+    """
+    loop = asyncio.get_running_loop()
+    base_dir = _sessions_dir(base_dir)
+    scope = _scope(branch, project, since, until)
+    cancel = threading.Event()
+    journal_dir = base_dir / "journal"
+    dom_dir = base_dir / "dom-saves"
+    futures = []
+
+    def run(fn, *args):
+        fut = loop.run_in_executor(executor, fn, *args)
+        futures.append(fut)
+        return fut
+
+    try:
+        files = await loop.run_in_executor(executor, lambda: list(_stamp_files(base_dir, query, use_index, scope)))
+        for i in range(0, len(files), ASYNC_BATCH):
+            run(_match_stamps, files[i:i + ASYNC_BATCH], query, cancel, scope)
+        if journal_dir.exists():
+            run(_match_journal, journal_dir, query, cancel, scope)
+        if dom_dir.exists() and not scope:
+            for hf in save_files(dom_dir):
+                run(dom_result, hf, query, None, cancel)
+        found = 0
+        for fut in asyncio.as_completed(list(futures)):
+            r = await fut
+            for hit in (r if isinstance(r, list) else [r] if r else []):
+                yield hit
+                found += 1
+                if top_k is not None and found >= top_k:
+                    return
+    finally:
+        cancel.set()
+        for fut in futures:
+            fut.cancel()
+
+def bench_parse_many(n_lines=200000):
+    gates = [Gate(c, "", st) for c, st in zip("ABCDE", GATE_CYCLE + ['\u21BA'])]
+    stamp = Stamp(branch="olo-guard/blue-channel", depth=7, max_depth=12,
+                  parent="jpeg-base", parent_depth=4, gates=gates,
+                  pin="blue dies in JPEG 4:2:0", look="blue-base,jpeg-v2", chain="core3->")
+    filler = "Sure - here is the breakdown of the channel loss you asked about, step by step."
+    lines = []
+    for i in range(n_lines):
+        stamp.depth = i % 12
+        lines.append(f"{filler} {stamp.compact()} {filler}" if i % 4 == 0 else filler)
+    for label, as_dict in [("Stamp", False), ("dict", True)]:
+        t0 = time.perf_counter()
+        found = sum(1 for _ in Stamp.parse_many(lines, as_dict=as_dict))
+        dt = time.perf_counter() - t0
+        print(f"  parse_many -> {label:5s} {n_lines / dt:12,.0f} lines/s  ({found} stamps, {dt:.2f}s)")
+
+
 # ============================================================
 if __name__ == "__main__":
+    if sys.argv[1:2] == ["--bench-parse"]:
+        bench_parse_many(int(sys.argv[2]) if len(sys.argv) > 2 else 200000)
+        sys.exit(0)
+
     print("=" * 60)
     print("  OLO STAMP PROTOCOL -- DEMO")
     print("=" * 60)
@@ -286,6 +668,12 @@ if __name__ == "__main__":
     print(f"  gates:  {len(stamp.gates)} -> {len(p.gates)} {'OK' if len(stamp.gates) == len(p.gates) else 'FAIL'}")
     print()
 
+    print("EMBEDDED EXTRACTION:")
+    transcript = f"user: {c} what about WebP?\nassistant: ok\nuser: see {c} and [OLO|\U0001F4CDx]"
+    found = list(Stamp.parse_many(transcript))
+    print(f"  {len(found)} stamps found in transcript {'OK' if len(found) == 2 else 'FAIL'}")
+    print()
+
     print("STAMPED PROMPT (what Claude sees):")
     print()
     print(f"  {stamp.compact()}")
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+stamp_bloom.py - per-file Bloom filters for negative lookups
+Each DOM save and each closed journal segment gets a sidecar
+<file>.bloom holding the trigrams of its (ASCII-lowercased) word tokens.
+A substring query can only match inside a file if every trigram of each
+word run in the query is present, so a filter miss means the file is
+skipped without reading it; there are no false negatives.
+
+SIDECAR: b"OLBF" | u64 size | u64 mtime_ns | u32 k | u32 m bits | bits
+  A sidecar whose size/mtime no longer match its file is rebuilt.
+
+STATS counts files checked/skipped, bytes skipped and observed false
+positives (filter said maybe, scan found nothing); searches run in
+thread pools, so counters are bumped with STATS.add(...) under a lock.
+"""
+
+import hashlib
+import math
+import os
+import re
+import struct
+import sys
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+
+MAGIC = b"OLBF"
+HEADER = struct.Struct('<4sQQII')
+TARGET_FPR = 0.01
+CHUNK_BYTES = 8 << 20
+MAX_CARRY = 1 << 20
+_WORD_RE = re.compile(rb"\w+")
+# ASCII word bytes lowercased, everything else a separator (same split as _WORD_RE).
+_WORDS = bytes(c if chr(c).isalnum() or c == 95 else 32 for c in range(128)).lower() + b" " * 128
+# Non-ASCII chars whose str.lower() is ASCII (journal search lowercases
+# decoded text); indexed under both spellings.
+_FOLDS = ((b"\xe2\x84\xaa", b"k"), (b"\xc4\xb0", b"i"))
+
+
+class BloomFilter:
+    def __init__(self, m_bits, k, bits=None):
+        self.m = max(8, m_bits)
+        self.k = k
+        self.bits = bits if bits is not None else bytearray((self.m + 7) // 8)
+
+    @classmethod
+    def for_items(cls, n, fpr=TARGET_FPR):
+        n = max(1, n)
+        m = int(-n * math.log(fpr) / (math.log(2) ** 2))
+        return cls(m, max(1, round(m / n * math.log(2))))
+
+    @classmethod
+    def of(cls, items):
+        bloom = cls.for_items(len(items))
+        for item in items:
+            bloom.add(item)
+        return bloom
+
+    def _positions(self, item):
+        h = hashlib.blake2b(item, digest_size=16).digest()
+        h1, h2 = int.from_bytes(h[:8], 'little'), int.from_bytes(h[8:], 'little') | 1
+        return ((h1 + i * h2) % self.m for i in range(self.k))
+
+    def add(self, item):
+        for p in self._positions(item):
+            self.bits[p >> 3] |= 1 << (p & 7)
+
+    def __contains__(self, item):
+        return all(self.bits[p >> 3] >> (p & 7) & 1 for p in self._positions(item))
+
+    def estimated_fpr(self):
+        fill = sum(bin(b).count('1') for b in self.bits) / self.m
+        return fill ** self.k
+
+
+@dataclass
+class BloomStats:
+    files_checked: int = 0
+    files_skipped: int = 0
+    bytes_skipped: int = 0
+    false_positives: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def add(self, **counts):
+        """Bump counters, e.g. add(files_skipped=1, bytes_skipped=n)."""
+        with self._lock:
+            for name, n in counts.items():
+                setattr(self, name, getattr(self, name) + n)
+
+    def fpr(self):
+        """Observed rate: maybes that turned out empty / all non-matching files."""
+        negatives = self.files_skipped + self.false_positives
+        return self.false_positives / negatives if negatives else 0.0
+
+    def reset(self):
+        with self._lock:
+            self.files_checked = self.files_skipped = self.bytes_skipped = self.false_positives = 0
+
+
+STATS = BloomStats()
+
+
+def _grams(token):
+    return {token[i:i + 3] for i in range(len(token) - 2)}
+
+
+def _tokens(data):
+    """Lowercased word tokens of a buffer, plus the _FOLDS spellings."""
+    tokens = set(data.translate(_WORDS).split())
+    for raw, ascii_ in _FOLDS:
+        if raw in data:
+            tokens.update(data.replace(raw, ascii_).translate(_WORDS).split())
+    return tokens
+
+
+def _trigrams(tokens):
+    grams = set()
+    for t in tokens:
+        if len(t) >= 3:
+            grams |= _grams(t)
+    return grams
+
+
+def file_grams(path):
+    """Trigrams of every word token in path, streamed in bounded chunks;
+    the same set grams_of() gives for the whole file in memory."""
+    tokens = set()
+    carry = b""
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(CHUNK_BYTES)
+            window = carry + chunk
+            cut = len(window)
+            if chunk:
+                # Carry the trailing token, which may continue in the next
+                # chunk, with any non-ASCII bytes (a folded char) before it.
+                cut = window.translate(_WORDS).rfind(b" ") + 1
+                while cut and window[cut - 1] >= 0x80:
+                    cut -= 1
+                if len(window) - cut > MAX_CARRY:
+                    cut = len(window)
+            tokens |= _tokens(window[:cut])
+            carry = window[cut:]
+            if not chunk:
+                break
+    return _trigrams(tokens)
+
+
+def grams_of(data):
+    """Trigrams of the word tokens in one in-memory buffer."""
+    return _trigrams(_tokens(data))
+
+
+def query_grams(query):
+    """Trigrams every matching file must contain. Empty = filter can't help."""
+    grams = set()
+    for run in _WORD_RE.findall(query.encode('utf-8').lower()):
+        grams |= _grams(run)
+    return grams
+
+
+def _sidecar(path):
+    return path.with_name(path.name + ".bloom")
+
+
+def build(path):
+    path = Path(path)
+    st = path.stat()
+    bloom = BloomFilter.of(file_grams(path))
+    side = _sidecar(path)
+    tmp = side.with_name(f"{side.name}.{os.getpid()}-{threading.get_ident()}.tmp")
+    try:
+        tmp.write_bytes(HEADER.pack(MAGIC, st.st_size, st.st_mtime_ns, bloom.k, bloom.m) + bloom.bits)
+        os.replace(tmp, side)
+    except OSError:
+        pass  # read-only archive: use the filter without persisting it
+    return bloom
+
+
+def load(path, rebuild=True):
+    """The file's filter, rebuilding a missing or stale sidecar (or None)."""
+    path = Path(path)
+    side = _sidecar(path)
+    st = path.stat()
+    if side.exists():
+        raw = side.read_bytes()
+        if len(raw) >= HEADER.size:
+            magic, size, mtime_ns, k, m = HEADER.unpack_from(raw)
+            if magic == MAGIC and size == st.st_size and mtime_ns == st.st_mtime_ns:
+                return BloomFilter(m, k, bytearray(raw[HEADER.size:]))
+    return build(path) if rebuild else None
+
+
+def may_contain(path, query, stats=STATS, grams=None):
+    """False only when path definitely lacks query; counts skips in stats."""
+    grams = query_grams(query) if grams is None else grams
+    if not grams:
+        return True
+    stats.add(files_checked=1)
+    bloom = load(path)
+    if all(g in bloom for g in grams):
+        return True
+    stats.add(files_skipped=1, bytes_skipped=Path(path).stat().st_size)
+    return False
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print("usage: python3 stamp_bloom.py QUERY FILE...")
+        sys.exit(0)
+    q = sys.argv[1]
+    for name in sys.argv[2:]:
+        bloom = load(name)
+        print(f"{name}: {'maybe' if may_contain(name, q) else 'no'}  "
+              f"({len(bloom.bits):,} B filter, est. FPR {bloom.estimated_fpr():.4f})")
+    print(STATS)
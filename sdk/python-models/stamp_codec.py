@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+stamp_codec.py - compact binary encoding for stamps
+Round-trips with to_dict/from_dict but drops everything JSON repeats:
+every string (branch, gate question, pin, look, chain) is interned in a
+per-archive string table, conv and gate states are u8 codes, and the
+timestamp is an integer. Decoding is lossless: a timestamp is packed
+only if it reads back to the identical ISO string, otherwise it goes to
+the string table.
+
+RECORD (little endian):
+  head   branch u32, depth i32, max_depth i32, parent u32, parent_depth i32
+         state, n_gates                                   u8  x2
+         pin, look, chain                                 u32 x3
+         timestamp: wall-clock µs since 1970-01-01        i64
+                    UTC offset in minutes, or NAIVE /     i16
+                    NO_TIME / ESCAPED_TIME (see extras)
+  gates  letter u32, question u32, state u8               x n_gates
+  extras u32 string ids for any state/timestamp that is not in the
+         fixed tables (code ESCAPE), in field order
+
+The wall clock is stored as written, never converted through the local
+zone, so an archive reads back the same under any TZ.
+
+ARCHIVE (.olob):
+  b"OLOB" u8 version | [u32 length][record]... | table | u64 table offset
+  The table is a JSON list of strings written at close.
+"""
+
+import json
+import struct
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from stamp import CONV_STATES, GATE_STATES, Stamp
+
+MAGIC = b"OLOB"
+VERSION = 2
+ESCAPE = 0xFF
+HEAD = struct.Struct('<IiiIiBBIIIqh')
+NO_TIME, ESCAPED_TIME, NAIVE = -32768, -32767, -32766
+_EPOCH = datetime(1970, 1, 1)
+_MINUTE = timedelta(minutes=1)
+LENGTH = struct.Struct('<I')
+FOOTER = struct.Struct('<Q')
+GATE_SYMBOLS = list(GATE_STATES.values())
+_CONV_CODES = {s: i for i, s in enumerate(CONV_STATES)}
+_GATE_CODES = {s: i for i, s in enumerate(GATE_SYMBOLS)}
+
+
+class StringTable:
+    def __init__(self, strings=None):
+        self.strings = list(strings) if strings else [""]
+        self.ids = {s: i for i, s in enumerate(self.strings)}
+
+    def intern(self, s):
+        i = self.ids.get(s)
+        if i is None:
+            i = self.ids[s] = len(self.strings)
+            self.strings.append(s)
+        return i
+
+    def __getitem__(self, i):
+        return self.strings[i]
+
+    def __len__(self):
+        return len(self.strings)
+
+
+def _unpack_time(us, code):
+    dt = _EPOCH + timedelta(microseconds=us)
+    if code != NAIVE:
+        dt = dt.replace(tzinfo=timezone(code * _MINUTE))
+    return dt.isoformat()
+
+
+def _pack_time(ts):
+    """(wall-clock µs, offset minutes or flag) that _unpack_time turns back into ts."""
+    if not ts:
+        return 0, NO_TIME
+    try:
+        dt = datetime.fromisoformat(ts)
+    except ValueError:
+        return 0, ESCAPED_TIME
+    off = dt.utcoffset()
+    if off is not None and off % _MINUTE:
+        return 0, ESCAPED_TIME
+    wall = dt.replace(tzinfo=None) - _EPOCH
+    us = (wall.days * 86400 + wall.seconds) * 10**6 + wall.microseconds
+    code = NAIVE if off is None else off // _MINUTE
+    if _unpack_time(us, code) != ts:    # e.g. "Z", a space separator, fewer digits
+        return 0, ESCAPED_TIME
+    return us, code
+
+
+class StampCodec:
+    def __init__(self, table=None):
+        self.table = table if table is not None else StringTable()
+        self._gate_structs = {}
+        self._enc_ts, self._enc_time = None, None
+        self._dec_time, self._dec_ts = None, ""
+
+    def _gates_struct(self, n):
+        st = self._gate_structs.get(n)
+        if st is None:
+            st = self._gate_structs[n] = struct.Struct('<' + 'IIB' * n)
+        return st
+
+    def encode(self, stamp):
+        """Encode a Stamp or to_dict dict. Stamps go through to_dict first."""
+        d = stamp if isinstance(stamp, dict) else stamp.to_dict()
+        t = self.table.intern
+        extras = []
+        state = d.get('state', 'OPEN')
+        state_code = _CONV_CODES.get(state, ESCAPE)
+        if state_code == ESCAPE:
+            extras.append(t(state))
+        gates = d.get('gates', [])
+        flat = []
+        for g in gates:
+            code = _GATE_CODES.get(g['state'], ESCAPE)
+            if code == ESCAPE:
+                extras.append(t(g['state']))
+            flat += (t(g['letter']), t(g['question']), code)
+        ts = d.get('timestamp', '')
+        if ts != self._enc_ts:
+            self._enc_ts, self._enc_time = ts, _pack_time(ts)
+        us, code = self._enc_time
+        if code == ESCAPED_TIME:
+            extras.append(t(ts))
+        out = HEAD.pack(
+            t(d.get('branch', '')), d.get('depth', 0), d.get('max_depth', 0),
+            t(d.get('parent', '')), d.get('parent_depth', 0), state_code, len(gates),
+            t(d.get('pin', '')), t(d.get('look', '')), t(d.get('chain', '')), us, code,
+        )
+        if gates:
+            out += self._gates_struct(len(gates)).pack(*flat)
+        if extras:
+            out += struct.pack(f'<{len(extras)}I', *extras)
+        return out
+
+    def decode(self, buf, offset=0):
+        """Decode one record into a to_dict-layout dict."""
+        s = self.table.strings
+        (branch, depth, max_depth, parent, parent_depth, state_code, n,
+         pin, look, chain, us, code) = HEAD.unpack_from(buf, offset)
+        pos = offset + HEAD.size
+        flat = ()
+        if n:
+            st = self._gates_struct(n)
+            flat = st.unpack_from(buf, pos)
+            pos += st.size
+        n_extra = (state_code == ESCAPE) + (code == ESCAPED_TIME) + flat[2::3].count(ESCAPE)
+        extras = (s[i] for i in struct.unpack_from(f'<{n_extra}I', buf, pos)) if n_extra else None
+        state = CONV_STATES[state_code] if state_code != ESCAPE else next(extras)
+        gates = [{'letter': s[flat[i]], 'question': s[flat[i + 1]],
+                  'state': GATE_SYMBOLS[flat[i + 2]] if flat[i + 2] != ESCAPE else next(extras)}
+                 for i in range(0, 3 * n, 3)]
+        if code == NO_TIME:
+            ts = ""
+        elif code == ESCAPED_TIME:
+            ts = next(extras)
+        else:
+            if (us, code) != self._dec_time:
+                self._dec_time, self._dec_ts = (us, code), _unpack_time(us, code)
+            ts = self._dec_ts
+        return {
+            'branch': s[branch], 'depth': depth, 'max_depth': max_depth,
+            'parent': s[parent], 'parent_depth': parent_depth, 'state': state,
+            'gates': gates, 'pin': s[pin], 'look': s[look], 'chain': s[chain],
+            'timestamp': ts,
+        }
+
+    def decode_stamp(self, buf, offset=0):
+        return Stamp.from_dict(self.decode(buf, offset))
+
+
+def write_archive(path, stamps):
+    """Write stamps (Stamp or dict) to a .olob archive; returns the record count."""
+    codec = StampCodec()
+    n = 0
+    with open(path, 'wb') as f:
+        f.write(MAGIC + bytes([VERSION]))
+        for stamp in stamps:
+            rec = codec.encode(stamp)
+            f.write(LENGTH.pack(len(rec)) + rec)
+            n += 1
+        table_at = f.tell()
+        f.write(json.dumps(codec.table.strings, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+        f.write(FOOTER.pack(table_at))
+    return n
+
+
+def read_archive(path, as_dict=False):
+    """Yield every record of a .olob archive as a Stamp (or dict)."""
+    buf = Path(path).read_bytes()
+    if buf[:4] != MAGIC:
+        raise ValueError(f"{path}: not a stamp archive")
+    if buf[4] != VERSION:
+        raise ValueError(f"{path}: stamp archive version {buf[4]}, expected {VERSION}")
+    table_at = FOOTER.unpack_from(buf, len(buf) - FOOTER.size)[0]
+    codec = StampCodec(StringTable(json.loads(buf[table_at:len(buf) - FOOTER.size])))
+    pos = 5
+    while pos < table_at:
+        length = LENGTH.unpack_from(buf, pos)[0]
+        d = codec.decode(buf, pos + LENGTH.size)
+        yield d if as_dict else Stamp.from_dict(d)
+        pos += LENGTH.size + length
+
+
+# ============================================================
+# BENCHMARK: binary codec vs to_dict JSON
+# ============================================================
+
+def bench(n=100000):
+    import tempfile
+    from stamp import Gate
+    questions = ['Blue channel for verification?', 'JPEG as kill mechanism?',
+                 'Temporal fragmentation?', 'Gematria visible or hidden?', 'Boustrophedon UX cost?']
+    dicts = []
+    for i in range(n):
+        gates = [Gate(chr(65 + j), q, GATE_SYMBOLS[(i + j) % 4]) for j, q in enumerate(questions)]
+        stamp = Stamp(branch=f"olo-guard/b{i % 40}", depth=i % 12, max_depth=12,
+                      parent="jpeg-base", parent_depth=4, gates=gates,
+                      pin=f"blue dies in JPEG 4:2:0 run {i % 200}", look="blue-base,jpeg-v2", chain="core3->")
+        dicts.append(stamp.to_dict())
+    with tempfile.TemporaryDirectory() as tmp:
+        jpath, bpath = Path(tmp) / "stamps.jsonl", Path(tmp) / "stamps.olob"
+        t0 = time.perf_counter()
+        with open(jpath, 'w') as f:
+            for d in dicts:
+                f.write(json.dumps(d, ensure_ascii=False) + "\n")
+        t_jw = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        write_archive(bpath, dicts)
+        t_bw = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        with open(jpath) as f:
+            jd = [json.loads(line) for line in f]
+        t_jr = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        bd = list(read_archive(bpath, as_dict=True))
+        t_br = time.perf_counter() - t0
+        same = jd == bd
+
+        js, bs = jpath.stat().st_size, bpath.stat().st_size
+        print(f"  {n} stamps, 5 gates each (round-trip {'OK' if same else 'FAIL'})")
+        print(f"  {'':8s} {'bytes':>12s} {'B/stamp':>8s} {'encode/s':>12s} {'decode/s':>12s}")
+        print(f"  {'json':8s} {js:12,d} {js / n:8.1f} {n / t_jw:12,.0f} {n / t_jr:12,.0f}")
+        print(f"  {'binary':8s} {bs:12,d} {bs / n:8.1f} {n / t_bw:12,.0f} {n / t_br:12,.0f}")
+        print(f"  size ratio {js / bs:.1f}x, decode speedup {t_jr / t_br:.2f}x")
+
+
+if __name__ == "__main__":
+    bench(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+stamp_delta.py - stamp delta protocol
+Consecutive stamps on a branch usually differ in depth, one gate or the
+time. Instead of re-sending the full stamp, send a patch:
+
+  patch = diff(old, new)        # {field: value, 'gate_states': {letter: state}}
+  new   = apply(old, patch)     # to_dict-layout dict
+
+A DeltaStream turns a sequence of stamps into keyframes (full to_dict)
+and deltas, with a keyframe every KEYFRAME_EVERY records so any index
+is rebuilt from at most that many patches.
+
+WIRE (for the content script), same markers as compact():
+  keyframe  [OLO|...]           a normal compact stamp
+  delta     [OLOΔ|📍8/12|🔒B●]   only the changed parts; an empty part
+                                ("📌") clears that field; gates update by
+                                letter
+"""
+
+import json
+import sys
+
+from stamp import Stamp, _compact_time, _parse_fields
+
+KEYFRAME_EVERY = 32
+FIELDS = ('branch', 'depth', 'max_depth', 'parent', 'parent_depth', 'state',
+          'pin', 'look', 'chain', 'timestamp')
+DELTA_PREFIX = '[OLOΔ|'
+
+
+def _as_dict(stamp):
+    return stamp if isinstance(stamp, dict) else stamp.to_dict()
+
+
+def _copy(d):
+    """A to_dict-layout dict sharing nothing mutable with d."""
+    d = dict(d)
+    d['gates'] = [dict(g) for g in d.get('gates', [])]
+    return d
+
+
+def diff(old, new):
+    """Minimal patch turning old into new (Stamps or to_dict dicts)."""
+    a, b = _as_dict(old), _as_dict(new)
+    patch = {f: b.get(f) for f in FIELDS if a.get(f) != b.get(f)}
+    if 'parent' in patch or 'parent_depth' in patch:
+        # The wire form carries "name@dN" as one part.
+        patch['parent'], patch['parent_depth'] = b.get('parent', ''), b.get('parent_depth', 0)
+    ga, gb = a.get('gates', []), b.get('gates', [])
+    if ga != gb:
+        layout_a = [(g['letter'], g['question']) for g in ga]
+        layout_b = [(g['letter'], g['question']) for g in gb]
+        letters = [g['letter'] for g in gb]
+        if layout_a == layout_b and len(set(letters)) == len(letters):
+            patch['gate_states'] = {g['letter']: g['state'] for g, h in zip(gb, ga) if g['state'] != h['state']}
+        else:
+            patch['gates'] = [dict(g) for g in gb]
+    return patch
+
+
+def apply(base, patch):
+    """Return a new to_dict-layout dict: base with patch applied."""
+    d = _copy(_as_dict(base))
+    for f in FIELDS:
+        if f in patch:
+            d[f] = patch[f]
+    if 'gates' in patch:
+        d['gates'] = [dict(g) for g in patch['gates']]
+    for letter, state in patch.get('gate_states', {}).items():
+        for g in d['gates']:
+            if g['letter'] == letter:
+                g['state'] = state
+                break
+        else:
+            d['gates'].append({'letter': letter, 'question': "", 'state': state})
+    return d
+
+
+class DeltaStream:
+    def __init__(self, keyframe_every=KEYFRAME_EVERY):
+        self.keyframe_every = keyframe_every
+        self.records = []
+        self._last = None
+        self._since_key = 0
+
+    def push(self, stamp):
+        """Append a stamp; returns {'k': dict} (keyframe) or {'d': patch}.
+        The stream keeps its own copy, so the caller may reuse the dict."""
+        d = _copy(_as_dict(stamp))
+        patch = diff(self._last, d) if self._last is not None else None
+        if patch is None or 'gates' in patch or self._since_key >= self.keyframe_every - 1:
+            rec = {'k': d}
+            self._since_key = 0
+        else:
+            rec = {'d': patch}
+            self._since_key += 1
+        self.records.append(rec)
+        self._last = d
+        return rec
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self.records)
+        if not 0 <= i < len(self.records):
+            raise IndexError(i)
+        k = i
+        while 'k' not in self.records[k]:
+            k -= 1
+        d = _copy(self.records[k]['k'])
+        for rec in self.records[k + 1:i + 1]:
+            d = apply(d, rec['d'])
+        return d
+
+    def stamp(self, i):
+        return Stamp.from_dict(self[i])
+
+
+# ============================================================
+# WIRE FORMAT
+# ============================================================
+
+def to_wire(rec):
+    """Compact text for a stream record (keyframe or delta)."""
+    if 'k' in rec:
+        return Stamp.from_dict(rec['k']).compact()
+    patch = rec['d']
+    if 'gates' in patch:
+        raise ValueError("gate layout changed; send a keyframe")
+    parts = []
+    if 'branch' in patch:
+        parts.append(f"\U0001F33F{patch['branch']}")
+    if 'depth' in patch or 'max_depth' in patch:
+        parts.append(f"\U0001F4CD{patch.get('depth', '')}/{patch.get('max_depth', '')}")
+    if 'parent' in patch or 'parent_depth' in patch:
+        parent = patch.get('parent', '')
+        parts.append(f"⬆{parent}@d{patch.get('parent_depth', 0)}" if parent else "⬆")
+    if 'state' in patch:
+        parts.append(f"⚡{patch['state']}")
+    if patch.get('gate_states'):
+        parts.append("\U0001F512" + "".join(f"{l}{s}" for l, s in patch['gate_states'].items()))
+    if 'pin' in patch:
+        parts.append(f"\U0001F4CC{patch['pin'][:30].replace(' ', '-')}")
+    if 'look' in patch:
+        parts.append(f"\U0001F441{patch['look']}")
+    if 'chain' in patch:
+        parts.append(f"\U0001F517{patch['chain']}")
+    if 'timestamp' in patch:
+        parts.append(f"⏱{_compact_time(patch['timestamp'])}")
+    return DELTA_PREFIX + "|".join(parts) + "]"
+
+
+def from_wire(line):
+    """Parse a delta line into a patch (None if it is not a delta)."""
+    if not line.startswith(DELTA_PREFIX) or not line.endswith(']'):
+        return None
+    inner = line[len(DELTA_PREFIX):-1]
+    parts = inner.split('|') if inner else []
+    patch = {}
+    for part in parts:
+        marker, value = part[:1], part[1:]
+        if marker == '\U0001F4CD':
+            # May carry only one side ("📍8/"); the other keeps the base value.
+            depth, _, max_depth = value.partition('/')
+            if depth:
+                patch['depth'] = int(depth)
+            if max_depth:
+                patch['max_depth'] = int(max_depth)
+        elif marker == '⬆' and not value:
+            patch['parent'], patch['parent_depth'] = "", 0
+        elif marker == '\U0001F512':
+            patch['gate_states'] = {value[i]: value[i + 1] for i in range(0, len(value) - 1, 2)}
+        elif value:
+            patch.update(_parse_fields(part))
+        elif marker in _WIRE_FIELDS:
+            patch[_WIRE_FIELDS[marker]] = ""
+    return patch
+
+
+_WIRE_FIELDS = {
+    '\U0001F33F': 'branch', '⚡': 'state', '\U0001F4CC': 'pin',
+    '\U0001F441': 'look', '\U0001F517': 'chain', '⏱': 'timestamp',
+}
+
+
+if __name__ == "__main__":
+    from stamp import Gate
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    stamp = Stamp(branch="olo-guard/blue-channel", depth=0, max_depth=12,
+                  parent="jpeg-base", parent_depth=4,
+                  gates=[Gate(c, q) for c, q in zip("ABCDE", ["Blue channel?", "JPEG kill?",
+                                                            "Temporal?", "Gematria?", "UX cost?"])],
+                  pin="blue dies in JPEG 4:2:0", look="blue-base,jpeg-v2", chain="core3->")
+    stream = DeltaStream()
+    full_bytes = wire_bytes = json_full = json_delta = 0
+    snapshots = []
+    for i in range(n):
+        stamp.depth = i % 12
+        stamp.timestamp = f"2026-10-16T{10 + i // 60 % 12:02d}:{i % 60:02d}:00"
+        if i % 7 == 0:
+            stamp.gates[i % 5].cycle()
+        if i % 50 == 0:
+            stamp.pin = f"finding {i}"
+        rec = stream.push(stamp)
+        snapshots.append(stamp.to_dict())
+        full_bytes += len(stamp.compact().encode())
+        wire_bytes += len(to_wire(rec).encode())
+        json_full += len(json.dumps(stamp.to_dict(), ensure_ascii=False).encode())
+        json_delta += len(json.dumps(rec, ensure_ascii=False).encode())
+    ok = all(stream[i] == snapshots[i] for i in range(n))
+    print(f"  {n} stamps, keyframe every {stream.keyframe_every} (reconstruct {'OK' if ok else 'FAIL'})")
+    print(f"  wire  : {full_bytes / n:6.1f} B/prompt full  -> {wire_bytes / n:6.1f} B/prompt delta")
+    print(f"  json  : {json_full / n:6.1f} B/record full  -> {json_delta / n:6.1f} B/record delta")
+    last = to_wire(stream.records[-1])
+    print(f"  e.g. {last}  ->  {from_wire(last)}")
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+stamp_history.py - packed in-memory stamp history
+Holds a long project history as parallel arrays instead of one Stamp
+and one Gate object per record. Strings are ids into a shared
+StringTable; gates are flattened into three arrays addressed by a
+per-stamp offset.
+
+  history = StampHistory()
+  history.append(stamp)            # Stamp or to_dict dict
+  history[i]                       # a regular Stamp (compact/full/rehydrate)
+  history.compact(i)               # shortcut for history[i].compact()
+
+python3 stamp_history.py [N] compares memory against plain objects.
+"""
+
+import sys
+import time
+from array import array
+
+from stamp import Gate, Stamp
+from stamp_codec import StringTable
+
+_STR_FIELDS = ('branch', 'parent', 'state', 'pin', 'look', 'chain', 'timestamp')
+_INT_FIELDS = ('depth', 'max_depth', 'parent_depth')
+
+
+class StampHistory:
+    def __init__(self, table=None):
+        self.table = table if table is not None else StringTable()
+        # String ids are unsigned; depths are plain ints and may be negative.
+        self.cols = {f: array('I') for f in _STR_FIELDS}
+        self.cols.update({f: array('q') for f in _INT_FIELDS})
+        self.gate_start = array('I', [0])
+        self.gate_letter = array('I')
+        self.gate_question = array('I')
+        self.gate_state = array('I')
+
+    def __len__(self):
+        return len(self.gate_start) - 1
+
+    def append(self, stamp):
+        if isinstance(stamp, dict):
+            stamp = Stamp.from_dict(stamp)
+        intern = self.table.intern
+        for f in _STR_FIELDS:
+            self.cols[f].append(intern(getattr(stamp, f)))
+        for f in _INT_FIELDS:
+            self.cols[f].append(getattr(stamp, f))
+        for g in stamp.gates:
+            self.gate_letter.append(intern(g.letter))
+            self.gate_question.append(intern(g.question))
+            self.gate_state.append(intern(g.state))
+        self.gate_start.append(len(self.gate_letter))
+        return len(self) - 1
+
+    def extend(self, stamps):
+        for stamp in stamps:
+            self.append(stamp)
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        s = self.table.strings
+        kw = {f: s[self.cols[f][i]] for f in _STR_FIELDS}
+        kw.update({f: self.cols[f][i] for f in _INT_FIELDS})
+        lo, hi = self.gate_start[i], self.gate_start[i + 1]
+        kw['gates'] = [Gate(s[self.gate_letter[j]], s[self.gate_question[j]], s[self.gate_state[j]])
+                       for j in range(lo, hi)]
+        stamp = Stamp(**kw)
+        if not kw['timestamp']:
+            stamp.timestamp = ""   # keep a record without time as stored, not "now"
+        return stamp
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def compact(self, i):
+        return self[i].compact()
+
+    def full(self, i):
+        return self[i].full()
+
+    def rehydrate(self, i, tree_state=None, findings=None):
+        return self[i].rehydrate(tree_state=tree_state, findings=findings)
+
+    def nbytes(self):
+        arrays = list(self.cols.values()) + [self.gate_start, self.gate_letter,
+                                             self.gate_question, self.gate_state]
+        return sum(a.itemsize * len(a) for a in arrays)
+
+
+# ============================================================
+# BENCHMARK
+# ============================================================
+
+def bench(n=1000000):
+    import tracemalloc
+    from dataclasses import dataclass, field
+
+    @dataclass
+    class PlainGate:
+        letter: str
+        question: str
+        state: str
+
+    @dataclass
+    class PlainStamp:
+        branch: str = ""
+        depth: int = 0
+        max_depth: int = 0
+        parent: str = ""
+        parent_depth: int = 0
+        state: str = "OPEN"
+        gates: list = field(default_factory=list)
+        pin: str = ""
+        look: str = ""
+        chain: str = ""
+        timestamp: str = ""
+
+    questions = ['Blue channel for verification?', 'JPEG as kill mechanism?',
+                 'Temporal fragmentation?', 'Gematria visible or hidden?', 'Boustrophedon UX cost?']
+    symbols = ['○', '◐', '●', '✕']
+
+    def fresh(x):
+        # json.loads hands back a new str object per record; mimic that.
+        return (x + '.')[:-1]
+
+    def records():
+        for i in range(n):
+            yield (f"olo-guard/b{i % 40}", i % 12, [(chr(65 + j), fresh(q), symbols[(i + j) % 4])
+                                                    for j, q in enumerate(questions)],
+                   f"pin {i % 500}", f"2026-10-{1 + i % 28:02d}T12:{i % 60:02d}:00")
+
+    def measure(label, build):
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        keep = build()
+        dt = time.perf_counter() - t0
+        size, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"  {label:28s} {size / 2**20:9.1f} MB  {size / n:7.1f} B/stamp  ({dt:.1f}s)")
+        return keep
+
+    print(f"  {n:,} stamps, 5 gates each")
+    measure("plain dataclasses", lambda: [
+        PlainStamp(branch=fresh(b), depth=d, max_depth=12, gates=[PlainGate(*g) for g in gs], pin=p, timestamp=t)
+        for b, d, gs, p, t in records()])
+    measure("slotted + interned Stamp", lambda: [
+        Stamp(branch=fresh(b), depth=d, max_depth=12, gates=[Gate(*g) for g in gs], pin=p, timestamp=t)
+        for b, d, gs, p, t in records()])
+
+    def packed():
+        h = StampHistory()
+        for b, d, gs, p, t in records():
+            h.append({'branch': b, 'depth': d, 'max_depth': 12, 'pin': p, 'timestamp': t,
+                      'gates': [{'letter': g[0], 'question': g[1], 'state': g[2]} for g in gs]})
+        return h
+    h = measure("StampHistory (arrays)", packed)
+    t0 = time.perf_counter()
+    line = h.compact(n // 2)
+    print(f"  history.compact(i): {line} ({(time.perf_counter() - t0) * 1e6:.0f} us)")
+
+
+if __name__ == "__main__":
+    bench(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
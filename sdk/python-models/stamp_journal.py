@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""
+stamp_journal.py - append-only segmented stamp journal
+Replaces one pretty-printed JSON file per save with length-prefixed
+records appended to rolled segment files.
+
+SEGMENT (seg-NNNNNN.log), one record after another:
+  [u32 length][u64 epoch ms][payload: compact to_dict JSON][u32 length]
+  The trailing length lets tail reads walk backwards without an index.
+
+SPARSE INDEX (seg-NNNNNN.idx):
+  [u64 epoch ms][u64 offset] for the first record and every
+  INDEX_EVERY-th record after it. Record times never go backwards (an
+  explicit ts earlier than the last record is rejected; the clock is
+  held at the last time if it steps back), so a time-range query is two
+  bisects plus a short forward scan.
+
+BLOOM (seg-NNNNNN.log.bloom): token trigram filter of a closed
+  segment (stamp_bloom), so search() skips segments without the query.
+
+A record is addressed by a ref "seg-NNNNNN.log#offset";
+Stamp.load(path, offset) and Stamp.from_dict work on journal records.
+
+Only the writer repairs a torn tail. StampJournal(root, read_only=True)
+is for searches and index builds: it never creates, truncates or
+rewrites anything, and stops at the first incomplete record, which may
+be one a writer is still appending.
+"""
+
+import bisect
+import json
+import os
+import struct
+import time
+from datetime import datetime
+from pathlib import Path
+
+import stamp_bloom
+
+HEADER = struct.Struct('>IQ')
+TRAILER = struct.Struct('>I')
+INDEX_ENTRY = struct.Struct('>QQ')
+SEGMENT_BYTES = 16 << 20
+INDEX_EVERY = 64
+
+
+def _segment_name(seg_id):
+    return f"seg-{seg_id:06d}.log"
+
+
+def _epoch_ms(t):
+    if t is None:
+        return None
+    if isinstance(t, datetime):
+        return int(t.timestamp() * 1000)
+    return int(t * 1000)
+
+
+def parse_ref(ref):
+    name, _, off = str(ref).rpartition('#')
+    return name, int(off)
+
+
+def _read_at(f, offset):
+    """Return (ts_ms, payload bytes, next offset) or None on a torn record."""
+    f.seek(offset)
+    head = f.read(HEADER.size)
+    if len(head) < HEADER.size:
+        return None
+    length, ts = HEADER.unpack(head)
+    body = f.read(length + TRAILER.size)
+    if len(body) < length + TRAILER.size or TRAILER.unpack(body[length:])[0] != length:
+        return None
+    return ts, body[:length], offset + HEADER.size + length + TRAILER.size
+
+
+def read_record(path, offset):
+    """Decode the record at offset in a segment file into a to_dict dict."""
+    with open(path, 'rb') as f:
+        rec = _read_at(f, offset)
+    if rec is None:
+        raise ValueError(f"no journal record at {path}#{offset}")
+    return json.loads(rec[1])
+
+
+class StampJournal:
+    def __init__(self, root, segment_bytes=SEGMENT_BYTES, index_every=INDEX_EVERY, read_only=False):
+        self.root = Path(root)
+        self.read_only = read_only
+        if not read_only:
+            self.root.mkdir(parents=True, exist_ok=True)
+        self.segment_bytes = segment_bytes
+        self.index_every = index_every
+        self.segments = sorted(int(p.stem[4:]) for p in self.root.glob("seg-*.log"))
+        self._index = {}
+        self._heads = {}
+        if read_only:
+            return
+        if not self.segments:
+            self.segments.append(1)
+            self._path(1).touch()
+        self._recover()
+
+    def _path(self, seg_id, ext='.log'):
+        return self.root / _segment_name(seg_id).replace('.log', ext)
+
+    def index(self, seg_id):
+        entries = self._index.get(seg_id)
+        if entries is None:
+            raw = self._path(seg_id, '.idx').read_bytes() if self._path(seg_id, '.idx').exists() else b""
+            raw = raw[:len(raw) - len(raw) % INDEX_ENTRY.size]
+            entries = [INDEX_ENTRY.unpack_from(raw, i) for i in range(0, len(raw), INDEX_ENTRY.size)]
+            self._index[seg_id] = entries
+        return entries
+
+    def _scan_tail(self, seg):
+        """(end of the last complete record, records since the last index
+        entry, last record time) for a segment."""
+        entries = self.index(seg)
+        pos = entries[-1][1] if entries else 0
+        count = 0
+        last_ts = entries[-1][0] if entries else 0
+        with open(self._path(seg), 'rb') as f:
+            while True:
+                rec = _read_at(f, pos)
+                if rec is None:
+                    break
+                last_ts, _, pos = rec
+                count += 1
+        return pos, count, last_ts
+
+    def _recover(self):
+        """Writer only: validate the active segment's tail and drop any torn record."""
+        seg = self.segments[-1]
+        entries = self.index(seg)
+        pos, count, last_ts = self._scan_tail(seg)
+        if self._path(seg).stat().st_size != pos:
+            os.truncate(self._path(seg), pos)
+        valid = [e for e in entries if e[1] < pos]
+        if len(valid) != len(entries):
+            self._path(seg, '.idx').write_bytes(b"".join(INDEX_ENTRY.pack(*e) for e in valid))
+            self._index[seg] = valid
+            count = 0
+        if pos == 0 and len(self.segments) > 1:
+            last_ts = self._scan_tail(self.segments[-2])[2]   # rolled, nothing written yet
+        self._size = pos
+        self._since_index = count % self.index_every if valid else 0
+        self._last_ts = last_ts
+
+    def _roll(self):
+        seg = self.segments[-1] + 1
+        self.segments.append(seg)
+        self._path(seg).touch()
+        self._index[seg] = []
+        self._size = 0
+        self._since_index = 0
+
+    def append(self, stamp, ts=None):
+        """Append a Stamp (or to_dict dict) and return its ref. ts (epoch
+        seconds or datetime, default now) must not precede the last record."""
+        if self.read_only:
+            raise PermissionError(f"{self.root} was opened read-only")
+        if ts is None:
+            ts_ms = max(int(time.time() * 1000), self._last_ts)
+        else:
+            ts_ms = _epoch_ms(ts)
+            if ts_ms < self._last_ts:
+                raise ValueError(f"ts {ts_ms} ms precedes the last record ({self._last_ts} ms)")
+        d = stamp if isinstance(stamp, dict) else stamp.to_dict()
+        payload = json.dumps(d, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        if self._size and self._size + len(payload) > self.segment_bytes:
+            self._roll()
+        seg = self.segments[-1]
+        offset = self._size
+        with open(self._path(seg), 'ab') as f:
+            f.write(HEADER.pack(len(payload), ts_ms) + payload + TRAILER.pack(len(payload)))
+        if self._since_index == 0:
+            with open(self._path(seg, '.idx'), 'ab') as f:
+                f.write(INDEX_ENTRY.pack(ts_ms, offset))
+            self.index(seg).append((ts_ms, offset))
+        self._since_index = (self._since_index + 1) % self.index_every
+        self._size = offset + HEADER.size + len(payload) + TRAILER.size
+        self._last_ts = ts_ms
+        ref = f"{_segment_name(seg)}#{offset}"
+        if d.get('branch'):
+            self._heads[d['branch']] = ref
+        return ref
+
+    def read(self, ref):
+        name, offset = parse_ref(ref)
+        return read_record(self.root / name, offset)
+
+    def records(self, start=None, end=None):
+        """Yield (ref, epoch ms, dict) for records with start <= time <= end."""
+        lo, hi = _epoch_ms(start), _epoch_ms(end)
+        firsts = [self.index(s)[0][0] if self.index(s) else float('inf') for s in self.segments]
+        i = max(0, bisect.bisect_left(firsts, lo) - 1) if lo is not None else 0
+        for seg in self.segments[i:]:
+            entries = self.index(seg)
+            pos = 0
+            if lo is not None and entries:
+                j = bisect.bisect_left(entries, (lo,)) - 1
+                pos = entries[j][1] if j >= 0 else 0
+            with open(self._path(seg), 'rb') as f:
+                while True:
+                    rec = _read_at(f, pos)
+                    if rec is None:
+                        break
+                    ts, payload, nxt = rec
+                    if hi is not None and ts > hi:
+                        return
+                    if lo is None or ts >= lo:
+                        yield f"{_segment_name(seg)}#{pos}", ts, json.loads(payload)
+                    pos = nxt
+
+    def records_after(self, ends):
+        """Yield (ref, epoch ms, dict) for records past ends[segment name]
+        (0 for segments not in ends), in journal order. ends is updated to
+        the end of the last complete record of each segment read."""
+        for seg in self.segments:
+            name = _segment_name(seg)
+            pos = ends.get(name, 0)
+            with open(self._path(seg), 'rb') as f:
+                while True:
+                    rec = _read_at(f, pos)
+                    if rec is None:
+                        break
+                    ts, payload, nxt = rec
+                    yield f"{name}#{pos}", ts, json.loads(payload)
+                    pos = nxt
+            ends[name] = pos
+
+    def _backwards(self, seg):
+        with open(self._path(seg), 'rb') as f:
+            pos = f.seek(0, os.SEEK_END)
+            if seg == self.segments[-1]:
+                # The tail may be torn (or mid-append); walk back from the last whole record.
+                pos = self._size if not self.read_only else self._scan_tail(seg)[0]
+            while pos > 0:
+                f.seek(pos - TRAILER.size)
+                length = TRAILER.unpack(f.read(TRAILER.size))[0]
+                start = pos - TRAILER.size - length - HEADER.size
+                f.seek(start + HEADER.size)
+                yield start, f.read(length)
+                pos = start
+
+    def latest(self, branch):
+        """Most recent record for branch, read from the tail backwards."""
+        ref = self._heads.get(branch)
+        if ref:
+            return self.read(ref)
+        marker = json.dumps(branch, ensure_ascii=False).encode('utf-8')
+        needle = b'"branch":' + marker
+        for seg in reversed(self.segments):
+            for offset, payload in self._backwards(seg):
+                if needle in payload:
+                    d = json.loads(payload)
+                    if d.get('branch') == branch:
+                        self._heads[branch] = f"{_segment_name(seg)}#{offset}"
+                        return d
+        return None
+
+    def search(self, query, bloom=True):
+        """Yield (ref, dict) for records whose payload contains query (case-insensitive).
+
+        Closed segments carry a Bloom sidecar and are skipped when it rules
+        the query out; the active segment is always scanned.
+        """
+        q = query.lower()
+        grams = stamp_bloom.query_grams(query) if bloom else None
+        for seg in self.segments:
+            closed = grams and seg != self.segments[-1]
+            if closed and not stamp_bloom.may_contain(self._path(seg), query, grams=grams):
+                continue
+            found = False
+            with open(self._path(seg), 'rb') as f:
+                pos = 0
+                while True:
+                    rec = _read_at(f, pos)
+                    if rec is None:
+                        break
+                    _, payload, nxt = rec
+                    text = payload.decode('utf-8')
+                    if q in text.lower():
+                        found = True
+                        yield f"{_segment_name(seg)}#{pos}", json.loads(text)
+                    pos = nxt
+            if closed and not found:
+                stamp_bloom.STATS.add(false_positives=1)
+
+
+if __name__ == "__main__":
+    import sys
+    import tempfile
+    from stamp import Stamp, Gate
+
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    with tempfile.TemporaryDirectory() as tmp:
+        journal = StampJournal(Path(tmp) / "journal", segment_bytes=1 << 20)
+        stamp = Stamp(branch="olo-guard/blue-channel", max_depth=12,
+                      gates=[Gate('A', 'Blue channel for verification?', '●')],
+                      pin="blue dies in JPEG 4:2:0")
+        base = int(time.time()) - n
+        t0 = time.perf_counter()
+        for i in range(n):
+            stamp.depth = i % 12
+            stamp.branch = f"olo-guard/b{i % 50}"
+            journal.append(stamp, ts=base + i)
+        dt = time.perf_counter() - t0
+        print(f"append:  {n / dt:10,.0f} stamps/s  ({len(journal.segments)} segments)")
+
+        t0 = time.perf_counter()
+        hits = list(journal.records(base + n // 2, base + n // 2 + 99))
+        print(f"range:   {len(hits)} records in {(time.perf_counter() - t0) * 1000:.2f} ms")
+
+        reopened = StampJournal(Path(tmp) / "journal")
+        t0 = time.perf_counter()
+        head = reopened.latest("olo-guard/b7")
+        print(f"latest:  depth={head['depth']} in {(time.perf_counter() - t0) * 1000:.2f} ms")
+
+        ref = hits[0][0]
+        name, off = parse_ref(ref)
+        loaded = Stamp.load(reopened.root / name, off)
+        print(f"load:    {ref} -> {loaded.branch} d{loaded.depth}")
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+stamp_refs.py - lineage graph over parent, look and chain references
+A stamp points upstream three ways:
+
+  parent  "jpeg-base"             the branch it forked from
+  look    "blue-base,jpeg-v2"     context it was told to look at
+  chain   "core2->core3->"        exploration order; the stamp follows
+                                  core3, which follows core2
+
+Every branch (and every referenced name that is not a saved branch, e.g.
+a checkpoint) is a node. A reference resolves to a branch by full name,
+else by its last path segment when exactly one branch ends that way
+("blue-channel" -> "olo-guard/blue-channel"), else stays a plain name.
+
+The graph is compiled once after changes: strongly connected components
+(reference cycles) are collapsed and each node gets its upstream and
+downstream closure as a bitmap, built bottom-up so shared ancestry is
+computed once. Lookups are then a bitmap read.
+
+  graph = RefGraph.build(base_dir)       # or RefGraph() + attach()
+  graph.upstream("olo-guard/blue-channel")   # nearest first
+  graph.downstream("blue-base")
+  graph.stamps_downstream("blue-base")   # refs of affected saves
+"""
+
+import json
+import sys
+import time
+from pathlib import Path
+
+import stamp as stamp_mod
+from stamp_query import _rows
+
+
+def parse_refs(stamp):
+    """{kind: [name, ...]} for a Stamp or to_dict dict; chain edges as (from, to) pairs."""
+    get = stamp.get if isinstance(stamp, dict) else lambda k, default='': getattr(stamp, k, default)
+    links = [p.strip() for p in get('chain', '').split('->') if p.strip()]
+    return {
+        'parent': [get('parent', '')] if get('parent', '') else [],
+        'look': [p.strip() for p in get('look', '').split(',') if p.strip()],
+        'chain': links[-1:],
+        'chain_links': list(zip(links[1:], links)),
+    }
+
+
+class RefGraph:
+    def __init__(self):
+        self.raw = {}          # name -> {(kind, target name), ...}
+        self.stamps = {}       # branch -> [stamp ref, ...]
+        self._compiled = None
+
+    # -- building ----------------------------------------------------
+
+    def add(self, ref, stamp):
+        refs = parse_refs(stamp)
+        branch = stamp['branch'] if isinstance(stamp, dict) else stamp.branch
+        links = [(branch, (kind, name)) for kind in ('parent', 'look', 'chain') for name in refs[kind]]
+        links += [(later, ('chain', earlier)) for later, earlier in refs['chain_links']]
+        # Most saves repeat their branch's edges; only a new node, edge or
+        # branch (which can change the alias map) needs a recompile.
+        changed = branch not in self.stamps or branch not in self.raw
+        self.raw.setdefault(branch, set())
+        for node, edge in links:
+            edges = self.raw.setdefault(node, set())
+            if edge not in edges:
+                edges.add(edge)
+                changed = True
+            if edge[1] not in self.raw:
+                self.raw[edge[1]] = set()
+                changed = True
+        self.stamps.setdefault(branch, []).append(ref)
+        if changed:
+            self._compiled = None
+
+    def _hook(self, ref, stamp):
+        self.add(ref, stamp)
+
+    def move(self, moves):
+        """Re-point stamp refs of moved stamps, moves {old ref: new ref}."""
+        for refs in self.stamps.values():
+            refs[:] = [moves.get(r, r) for r in refs]
+
+    def attach(self):
+        """Add every subsequent Stamp.save, and follow moved stamps."""
+        if self._hook not in stamp_mod.SAVE_HOOKS:
+            stamp_mod.SAVE_HOOKS.append(self._hook)
+            stamp_mod.MOVE_HOOKS.append(self.move)
+
+    def detach(self):
+        if self._hook in stamp_mod.SAVE_HOOKS:
+            stamp_mod.SAVE_HOOKS.remove(self._hook)
+            stamp_mod.MOVE_HOOKS.remove(self.move)
+
+    @classmethod
+    def build(cls, base_dir=None):
+        from stamp_journal import StampJournal
+        base_dir = Path(base_dir) if base_dir else Path.home() / "gentlyos" / "sessions"
+        graph = cls()
+        for sf in sorted(base_dir.rglob("*.stamp.json")):
+            graph.add(str(sf), json.loads(sf.read_text()))
+        journal = base_dir / "journal"
+        if journal.exists():
+            for ref, _, d in StampJournal(journal, read_only=True).records():
+                graph.add(str(journal / ref), d)
+        return graph
+
+    # -- compiling ---------------------------------------------------
+
+    def resolve(self, name):
+        """Canonical node name for a reference."""
+        return self._compile()['alias'].get(name, name)
+
+    def _compile(self):
+        if self._compiled is not None:
+            return self._compiled
+        branches = set(self.stamps)
+        tails = {}
+        for b in branches:
+            tails.setdefault(b.rsplit('/', 1)[-1], []).append(b)
+        alias = {t: bs[0] for t, bs in tails.items() if len(bs) == 1 and t not in branches}
+        names = sorted({alias.get(n, n) for n in self.raw})
+        ids = {n: i for i, n in enumerate(names)}
+        up = [set() for _ in names]
+        for n, edges in self.raw.items():
+            src = ids[alias.get(n, n)]
+            for _, target in edges:
+                dst = ids[alias.get(target, target)]
+                if dst != src:
+                    up[src].add(dst)
+        comp, order = _scc(up)          # order: components, sinks (roots) first
+        rank = [0] * len(names)
+        for pos, members in enumerate(order):
+            for v in members:
+                rank[v] = pos
+        cup = [0] * len(order)          # component -> upstream node bitmap
+        for c, members in enumerate(order):
+            bits = 0
+            for v in members:
+                for w in up[v]:
+                    bits |= cup[comp[w]] | (1 << w)
+            if len(members) > 1:        # a cycle reaches all of its members
+                for v in members:
+                    bits |= 1 << v
+            cup[c] = bits
+        down = [set() for _ in names]
+        for v, targets in enumerate(up):
+            for w in targets:
+                down[w].add(v)
+        cdown = [0] * len(order)
+        for c in range(len(order) - 1, -1, -1):
+            bits = 0
+            for v in order[c]:
+                for w in down[v]:
+                    bits |= cdown[comp[w]] | (1 << w)
+            if len(order[c]) > 1:
+                for v in order[c]:
+                    bits |= 1 << v
+            cdown[c] = bits
+        self._compiled = {'alias': alias, 'names': names, 'ids': ids, 'comp': comp,
+                          'rank': rank, 'up': cup, 'down': cdown}
+        return self._compiled
+
+    # -- queries -----------------------------------------------------
+
+    def _closure(self, name, key, nearest_first):
+        g = self._compile()
+        i = g['ids'].get(g['alias'].get(name, name))
+        if i is None:
+            return []
+        out = _rows(g[key][g['comp'][i]] & ~(1 << i))
+        out.sort(key=lambda v: g['rank'][v], reverse=nearest_first)
+        return [g['names'][v] for v in out]
+
+    def upstream(self, name):
+        """Everything name (a branch, alias or Stamp) depends on, nearest first."""
+        if isinstance(name, stamp_mod.Stamp):
+            name = name.branch
+        return self._closure(name, 'up', True)
+
+    def downstream(self, name):
+        """Every node that depends on name, directly or transitively, nearest first."""
+        return self._closure(name, 'down', False)
+
+    def stamps_downstream(self, name):
+        return [ref for n in self.downstream(name) for ref in self.stamps.get(n, ())]
+
+    def edges(self, name):
+        """Direct references of name: {kind: [resolved name, ...]}."""
+        node = self.resolve(name)
+        out = {}
+        for n, edges in self.raw.items():
+            if self.resolve(n) == node:
+                for kind, target in sorted(edges):
+                    out.setdefault(kind, []).append(self.resolve(target))
+        return out
+
+
+def _scc(graph):
+    """Tarjan, iterative. Returns (component of each node, components in
+    reverse topological order: a component comes after everything it reaches)."""
+    n = len(graph)
+    index = [-1] * n
+    low = [0] * n
+    on_stack = [False] * n
+    comp = [-1] * n
+    stack, order, counter = [], [], 0
+    adj = [list(s) for s in graph]
+    for root in range(n):
+        if index[root] != -1:
+            continue
+        work = [(root, 0)]
+        index[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack[root] = True
+        while work:
+            v, i = work[-1]
+            if i < len(adj[v]):
+                work[-1] = (v, i + 1)
+                w = adj[v][i]
+                if index[w] == -1:
+                    index[w] = low[w] = counter
+                    counter += 1
+                    stack.append(w)
+                    on_stack[w] = True
+                    work.append((w, 0))
+                elif on_stack[w]:
+                    low[v] = min(low[v], index[w])
+                continue
+            work.pop()
+            if work:
+                low[work[-1][0]] = min(low[work[-1][0]], low[v])
+            if low[v] == index[v]:
+                members = []
+                while True:
+                    w = stack.pop()
+                    on_stack[w] = False
+                    comp[w] = len(order)
+                    members.append(w)
+                    if w == v:
+                        break
+                order.append(members)
+    return comp, order
+
+
+def bench(n_branches=5000, saves_per=4):
+    import random
+    rng = random.Random(7)
+    graph = RefGraph()
+    names = [f"proj{i % 20}/b{i}" for i in range(n_branches)]
+    t0 = time.perf_counter()
+    for i, b in enumerate(names):
+        for k in range(saves_per):
+            parents = names[max(0, i - 50):i]
+            graph.add(f"{b}#{k}", {
+                'branch': b,
+                'parent': rng.choice(parents).rsplit('/', 1)[-1] if parents else "",
+                'look': ",".join(rng.choice(parents) for _ in range(2)) if parents else "",
+                'chain': f"core{i // 100}->",
+            })
+    print(f"  add {n_branches * saves_per:,} stamps     {(time.perf_counter() - t0) * 1000:8.1f} ms")
+    t0 = time.perf_counter()
+    graph._compile()
+    print(f"  compile              {(time.perf_counter() - t0) * 1000:8.1f} ms  ({len(graph._compiled['names']):,} nodes)")
+    last = {'branch': names[-1], 'parent': names[-2], 'look': names[-3], 'chain': "core1->core2->"}
+    graph.add(f"{names[-1]}#r", last)
+    graph.upstream(names[-1])
+    t0 = time.perf_counter()
+    for k in range(1000):
+        graph.add(f"{names[-1]}#r{k}", last)
+        graph.upstream(names[-1])
+    print(f"  1k re-saves + query  {(time.perf_counter() - t0) * 1000:8.1f} ms  (same edges, no recompile)")
+    for label, fn in [("upstream(last)", lambda: graph.upstream(names[-1])),
+                      ("downstream(first)", lambda: graph.downstream(names[0])),
+                      ("upstream(mid)", lambda: graph.upstream(names[n_branches // 2]))]:
+        t0 = time.perf_counter()
+        out = fn()
+        print(f"  {label:20s} {(time.perf_counter() - t0) * 1000:8.2f} ms  {len(out):,} nodes")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if args[:1] == ["--bench"]:
+        bench(int(args[1]) if len(args) > 1 else 5000)
+    elif args:
+        g = RefGraph.build(args[1] if len(args) > 1 else None)
+        print(f"{g.resolve(args[0])}")
+        print(f"  edges:      {g.edges(args[0])}")
+        print(f"  upstream:   {' <- '.join(g.upstream(args[0])) or '-'}")
+        print(f"  downstream: {', '.join(g.downstream(args[0])) or '-'}")
+    else:
+        print(__doc__)
@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""
+stamp_timeline.py - incremental per-branch timeline aggregates
+Dashboards chart depth and gate progress per branch. Rather than loading
+every stamp, a Timeline folds each saved stamp into running aggregates:
+
+  depth        [(epoch, depth), ...] in time order
+  transitions  {"B ○→●": count, ...}   gate state changes between saves
+  state_time   {CONV_STATE: seconds}    time spent in each state, closed
+               at the next save on the branch (the current state runs on
+               from 'since')
+
+  timeline = Timeline(base_dir)
+  timeline.attach()                 # fold every Stamp.save from now on
+  timeline.series("olo-guard/blue-channel")
+
+Points are placed at the save time: the hook folds with the clock at
+Stamp.save, backfill with the journal record time, or with the stamp's
+own timestamp for stamp files.
+
+PERSISTENCE: each fold appends one short row to the current log,
+.stamp-timeline-<gen>.jsonl (as does a move of folded stamp files,
+[null, {old path: new path}]); .stamp-timeline.json is a checkpoint of
+the aggregates and of every save folded so far (stamp file path and
+mtime, or journal ref), so backfill never folds a save twice. A
+checkpoint starts a new log and deletes the old one. It is taken once
+the log holds CHECKPOINT_EVERY rows or a quarter of all folds, whichever
+is more, so opening replays a bounded share of the history while
+checkpoint cost per fold stays constant.
+
+Usage:
+  python3 stamp_timeline.py --backfill [DIR]   fold existing stamps once
+  python3 stamp_timeline.py --bench [N]
+  python3 stamp_timeline.py BRANCH [DIR]
+"""
+
+import bisect
+import json
+import os
+import re
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+import stamp as stamp_mod
+
+TIMELINE_NAME = ".stamp-timeline"
+CHECKPOINT_EVERY = 1000
+STAMP_JOURNAL_REF = re.compile(r"seg-\d+\.log#\d+")
+
+
+def _epoch(ts):
+    try:
+        return datetime.fromisoformat(ts).timestamp()
+    except (TypeError, ValueError):
+        return time.time()
+
+
+class BranchAggregate:
+    __slots__ = ('count', 'depth', 'transitions', 'state_time', 'state', 'since', 'gates')
+
+    def __init__(self):
+        self.count = 0
+        self.depth = []           # [[epoch, depth], ...]
+        self.transitions = {}
+        self.state_time = {s: 0.0 for s in stamp_mod.CONV_STATES}
+        self.state = None
+        self.since = None         # epoch of the latest save
+        self.gates = {}           # letter -> state at the latest save
+
+    def fold(self, t, depth, state, gates):
+        self.count += 1
+        point = [t, depth]
+        if not self.depth or t >= self.depth[-1][0]:
+            self.depth.append(point)
+        else:
+            bisect.insort(self.depth, point)
+        if self.since is not None and t < self.since:
+            return  # late arrival: it is in the depth series, not the state clock
+        if self.state is not None:
+            self.state_time[self.state] = self.state_time.get(self.state, 0.0) + t - self.since
+        for letter, s in gates.items():
+            old = self.gates.get(letter)
+            if old is not None and old != s:
+                key = f"{letter} {old}→{s}"
+                self.transitions[key] = self.transitions.get(key, 0) + 1
+        self.gates = gates
+        self.state, self.since = state, t
+
+    def to_json(self):
+        return {k: getattr(self, k) for k in self.__slots__}
+
+    @classmethod
+    def from_json(cls, d):
+        agg = cls()
+        for k in cls.__slots__:
+            setattr(agg, k, d[k])
+        return agg
+
+
+class Timeline:
+    def __init__(self, base_dir=None):
+        self.branches = {}
+        self.folded = {}          # save key -> file mtime_ns (0 for journal records)
+        self.rows = 0             # rows in the current log
+        self.base_dir = self.log = self.checkpoint_path = None
+        self._offset = 0
+        self._gen = 0
+        self._total = 0
+        if base_dir is not None:
+            self.base_dir = Path(base_dir)
+            self.log = self.base_dir / f"{TIMELINE_NAME}.jsonl"
+            self.checkpoint_path = self.base_dir / f"{TIMELINE_NAME}.json"
+            self._open()
+
+    def _open(self):
+        if self.checkpoint_path.exists():
+            try:
+                data = json.loads(self.checkpoint_path.read_text())
+                self.branches = {b: BranchAggregate.from_json(d) for b, d in data['branches'].items()}
+                self._offset = data['offset']
+                self.folded = data.get('folded', {})
+                self._gen = data.get('gen', 0)
+                self.log = self.base_dir / data.get('log', self.log.name)
+            except (ValueError, KeyError):
+                self.branches, self.folded, self._offset = {}, {}, 0
+        self._total = sum(a.count for a in self.branches.values())
+        if self.log.exists():
+            with self.log.open('rb') as f:
+                f.seek(self._offset)
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break  # torn last row
+                    row = json.loads(line)
+                    if row[0] is None:
+                        self._move(row[1])
+                    else:
+                        self._fold(*row)
+                    self._offset += len(line)
+                    self.rows += 1
+        for old in self.base_dir.glob(f"{TIMELINE_NAME}*.jsonl"):
+            if old != self.log:
+                old.unlink(missing_ok=True)   # covered by the checkpoint
+
+    def _fold(self, branch, t, depth, state, gates, key=None, mtime=0):
+        agg = self.branches.get(branch)
+        if agg is None:
+            agg = self.branches[branch] = BranchAggregate()
+        agg.fold(t, depth, state, gates)
+        self._total += 1
+        if key is not None:
+            self.folded[key] = mtime
+
+    @staticmethod
+    def _key(ref):
+        """(key, mtime_ns) identifying one save: a journal ref, or a stamp
+        file's absolute path plus its mtime (a rewrite is a new save)."""
+        ref = str(ref)
+        if STAMP_JOURNAL_REF.fullmatch(ref.rpartition('/')[2]):
+            return ref.rpartition('/')[2], 0
+        path = os.path.abspath(ref)
+        try:
+            return path, os.stat(path).st_mtime_ns
+        except OSError:
+            return path, 0
+
+    def add(self, stamp, t=None, ref=None):
+        """Fold one save made at epoch t (default: the stamp's timestamp).
+        With ref, a save already folded is skipped; returns whether it folded."""
+        key, mtime = self._key(ref) if ref is not None else (None, 0)
+        if key is not None and self.folded.get(key) == mtime:
+            return False
+        t = _epoch(stamp.timestamp) if t is None else t
+        row = [stamp.branch, t, stamp.depth, stamp.state,
+               {g.letter: g.state for g in stamp.gates}]
+        if key is not None:
+            row += [key, mtime]
+        self._fold(*row)
+        self._append(row)
+        return True
+
+    def _append(self, row):
+        if self.log is None:
+            return
+        line = (json.dumps(row, ensure_ascii=False, separators=(',', ':')) + "\n").encode('utf-8')
+        with self.log.open('ab') as f:
+            f.write(line)
+        self._offset += len(line)
+        self.rows += 1
+        # Checkpoints rewrite every aggregate, so space them out as the
+        # aggregates grow: their cost per row stays constant.
+        if self.rows >= max(CHECKPOINT_EVERY, self._total // 4):
+            self.checkpoint()
+
+    def _move(self, moved):
+        for old, new in moved.items():
+            if old in self.folded:
+                self.folded[new] = self.folded.pop(old)
+
+    def move(self, moves):
+        """Follow moved stamp files, moves {old ref: new ref}, so backfill
+        does not fold them again under their new paths."""
+        moved = {os.path.abspath(old): os.path.abspath(new) for old, new in moves.items()
+                 if os.path.abspath(old) in self.folded}
+        if moved:
+            self._move(moved)
+            self._append([None, moved])
+
+    def checkpoint(self):
+        """Write the aggregates and start a fresh log; the old one is dropped."""
+        self._gen += 1
+        log = self.base_dir / f"{TIMELINE_NAME}-{self._gen}.jsonl"
+        tmp = self.checkpoint_path.with_name(f"{self.checkpoint_path.name}.{os.getpid()}-{threading.get_ident()}.tmp")
+        tmp.write_text(json.dumps({'gen': self._gen, 'log': log.name, 'offset': 0, 'folded': self.folded,
+                                   'branches': {b: a.to_json() for b, a in self.branches.items()}},
+                                  ensure_ascii=False, separators=(',', ':')))
+        os.replace(tmp, self.checkpoint_path)
+        old, self.log = self.log, log
+        old.unlink(missing_ok=True)
+        self._offset = self.rows = 0
+
+    def _hook(self, ref, stamp):
+        self.add(stamp, time.time(), ref)
+
+    def attach(self):
+        """Fold every subsequent Stamp.save, and follow moved stamps."""
+        if self._hook not in stamp_mod.SAVE_HOOKS:
+            stamp_mod.SAVE_HOOKS.append(self._hook)
+            stamp_mod.MOVE_HOOKS.append(self.move)
+
+    def detach(self):
+        if self._hook in stamp_mod.SAVE_HOOKS:
+            stamp_mod.SAVE_HOOKS.remove(self._hook)
+            stamp_mod.MOVE_HOOKS.remove(self.move)
+
+    def backfill(self, base_dir):
+        """Fold every stamp under base_dir not folded yet (oldest first);
+        safe to run again, and after attach(). Returns the number folded."""
+        from stamp_journal import StampJournal
+        base_dir = Path(base_dir)
+        saves = []
+        for sf in base_dir.rglob("*.stamp.json"):
+            key, mtime = self._key(sf)
+            if self.folded.get(key) == mtime:
+                continue
+            d = json.loads(sf.read_text())
+            saves.append((_epoch(d.get('timestamp', '')), d, sf))
+        journal = base_dir / "journal"
+        if journal.exists():
+            saves += [(ts / 1000, d, ref) for ref, ts, d in StampJournal(journal, read_only=True).records()
+                      if ref not in self.folded]
+        saves.sort(key=lambda save: save[0])
+        n = sum(self.add(stamp_mod.Stamp.from_dict(d), t, ref) for t, d, ref in saves)
+        if self.log is not None:
+            self.checkpoint()
+        return n
+
+    def series(self, branch, now=None):
+        """Chart data for one branch (None if it was never saved)."""
+        agg = self.branches.get(branch)
+        if agg is None:
+            return None
+        state_time = dict(agg.state_time)
+        if agg.state is not None:
+            state_time[agg.state] = state_time.get(agg.state, 0.0) + max(0.0, (now or time.time()) - agg.since)
+        return {'count': agg.count, 'depth': agg.depth, 'transitions': dict(agg.transitions),
+                'state_time': state_time, 'state': agg.state, 'since': agg.since}
+
+
+def bench(n=100000):
+    import tempfile
+    from stamp import Gate, Stamp
+    with tempfile.TemporaryDirectory() as tmp:
+        base = Path(tmp)
+        timeline = Timeline(base)
+        stamp = Stamp(gates=[Gate(c, "?") for c in "ABCDE"])
+        t0 = time.perf_counter()
+        for i in range(n):
+            stamp.branch = f"olo-guard/b{i % 20}"
+            stamp.depth = i % 12
+            stamp.state = stamp_mod.CONV_STATES[i // 7 % len(stamp_mod.CONV_STATES)]
+            if i % 3 == 0:
+                stamp.gates[i % 5].cycle()
+            timeline.add(stamp, 1790000000 + i * 60)
+        dt = time.perf_counter() - t0
+        print(f"  fold {n:,} saves      {dt:6.2f}s  ({dt / n * 1e6:.1f} µs each, incl. log append)")
+        t0 = time.perf_counter()
+        reopened = Timeline(base)
+        print(f"  reopen               {(time.perf_counter() - t0) * 1000:6.1f} ms  "
+              f"(replayed {reopened.rows} rows past the checkpoint)")
+        t0 = time.perf_counter()
+        s = reopened.series("olo-guard/b7")
+        print(f"  series(b7)           {(time.perf_counter() - t0) * 1e6:6.1f} µs  "
+              f"{len(s['depth'])} points, {sum(s['transitions'].values())} transitions")
+        m = min(n, 5000)
+        for i in range(m):
+            stamp.branch = "olo-guard/b7"
+            stamp.save(base / f"{i}.stamp.json")
+        t0 = time.perf_counter()
+        loaded = [Stamp.load(p) for p in base.glob("*.stamp.json")]
+        dt = time.perf_counter() - t0
+        print(f"  Stamp.load replay    {dt * 1000:6.1f} ms for {len(loaded):,} files "
+              f"(~{dt / len(loaded) * n:.1f}s for {n:,})")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    default = Path.home() / "gentlyos" / "sessions"
+    if args[:1] == ["--bench"]:
+        bench(int(args[1]) if len(args) > 1 else 100000)
+    elif args[:1] == ["--backfill"]:
+        base = Path(args[1]) if len(args) > 1 else default
+        print(f"Folded {Timeline(base).backfill(base)} stamps")
+    elif args:
+        print(json.dumps(Timeline(Path(args[1]) if len(args) > 1 else default).series(args[0]),
+                         indent=1, ensure_ascii=False))
+    else:
+        print(__doc__)